@@ -0,0 +1,80 @@
+# bench_instruments.py
+"""
+Cold-start benchmark: time and peak memory of turning the instrument master list into the
+lookup structures (instrument_dump, symbol_map, criteria_map) on a full-size synthetic dump.
+
+    python bench_instruments.py                       # report
+    python bench_instruments.py --legacy              # also time the old iterrows() build
+    python bench_instruments.py --max-seconds 3 --max-mb 600   # fail (exit 1) on regression
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+import pandas as pd
+
+import smart_trader
+from mock_broker import MockKiteConnect
+
+def prepare_dump(instruments):
+    """Same DataFrame preparation as smart_trader.fetch_instruments."""
+    df = pd.DataFrame(instruments)
+    expiry = pd.to_datetime(df['expiry'], errors='coerce')
+    df['expiry_str'] = expiry.dt.strftime('%Y-%m-%d')
+    df['expiry_date'] = expiry.dt.date
+    return df
+
+def legacy_build(df):
+    """Row-by-row build the vectorized version replaced (reference only)."""
+    exchange_priority = {'NFO': 0, 'MCX': 1, 'CDS': 2, 'NSE': 3, 'BSE': 4, 'BFO': 5}
+    temp_df = df.copy()
+    temp_df['priority'] = temp_df['exchange'].map(exchange_priority).fillna(99)
+    temp_df.sort_values('priority', inplace=True, kind='stable')
+    unique_symbols = temp_df.drop_duplicates(subset=['tradingsymbol'])
+    symbol_map = unique_symbols.set_index('tradingsymbol').to_dict('index')
+    criteria_map = {}
+    for _, row in unique_symbols.dropna(subset=['name', 'expiry_str', 'instrument_type']).iterrows():
+        s_val = float(row['strike']) if row['strike'] else 0.0
+        criteria_map[(row['name'], row['expiry_str'], row['instrument_type'], s_val)] = row['tradingsymbol']
+    return symbol_map, criteria_map
+
+def measure(label, fn, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {label:<22} {elapsed:8.3f}s   peak {peak / 1e6:8.1f} MB")
+    return result, elapsed, peak / 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description="Instrument lookup build benchmark")
+    parser.add_argument("--legacy", action="store_true", help="also run the old iterrows() build")
+    parser.add_argument("--max-seconds", type=float, help="fail if the total build exceeds this")
+    parser.add_argument("--max-mb", type=float, help="fail if peak traced memory exceeds this")
+    args = parser.parse_args()
+
+    instruments = MockKiteConnect(full_universe=True).mock_instruments
+    print(f"📊 Instruments: {len(instruments):,}")
+
+    df, t_prep, m_prep = measure("prepare dump", prepare_dump, instruments)
+    (symbol_map, criteria_map), t_build, m_build = measure("build_lookup_maps", smart_trader.build_lookup_maps, df)
+    print(f"  symbol_map: {len(symbol_map):,}   criteria_map: {len(criteria_map):,}")
+
+    if args.legacy:
+        (old_symbols, old_criteria), t_old, _ = measure("legacy iterrows", legacy_build, df)
+        same = old_criteria == criteria_map and old_symbols.keys() == symbol_map.keys()
+        print(f"  speedup: {t_old / t_build:.1f}x   identical maps: {'✅' if same else '❌'}")
+        if not same: return 1
+
+    total, peak = t_prep + t_build, max(m_prep, m_build)
+    failed = False
+    if args.max_seconds is not None and total > args.max_seconds:
+        print(f"❌ Build time {total:.3f}s exceeds {args.max_seconds}s"); failed = True
+    if args.max_mb is not None and peak > args.max_mb:
+        print(f"❌ Peak memory {peak:.1f} MB exceeds {args.max_mb} MB"); failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -19,3 +19,46 @@ if uri.startswith("postgres://"):
 SQLALCHEMY_DATABASE_URI = uri
 SQLALCHEMY_TRACK_MODIFICATIONS = False
 SQLALCHEMY_ENGINE_OPTIONS = {'connect_args': {'options': '-c timezone=Asia/Kolkata'}} if "postgresql" in uri else {}
+
+# Write-behind interval (seconds) for active/closed trade rows. Exits & SL moves flush immediately.
+TRADE_FLUSH_INTERVAL = float(os.getenv("TRADE_FLUSH_INTERVAL", 1.0))
+
+# Broker order dispatcher: worker threads placing orders off the tick thread (per-trade ordering kept)
+ORDER_WORKERS = int(os.getenv("ORDER_WORKERS", 4))
+
+# Telegram outbox sender: global messages/second and minimum seconds between messages to one chat
+TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", 25))
+TELEGRAM_CHAT_INTERVAL = float(os.getenv("TELEGRAM_CHAT_INTERVAL", 1.0))
+TELEGRAM_MAX_ATTEMPTS = int(os.getenv("TELEGRAM_MAX_ATTEMPTS", 8))
+
+# Vectorized (NumPy) pre-screening of SL / target / trailing / activation thresholds in on_ticks
+VECTOR_RISK = os.getenv("VECTOR_RISK", "0") == "1"
+
+# Dashboard push rates (frames/second per channel) and unacked frames before a client is skipped
+FEED_FPS_POSITIONS = float(os.getenv("FEED_FPS_POSITIONS", 4))
+FEED_FPS_CLOSED = float(os.getenv("FEED_FPS_CLOSED", 2))
+FEED_FPS_INDICES = float(os.getenv("FEED_FPS_INDICES", 2))
+FEED_MAX_INFLIGHT = int(os.getenv("FEED_MAX_INFLIGHT", 2))
+
+# Index ticker: tick age after which /api/sync falls back to one shared REST quote, and its minimum interval
+INDEX_STALE_AFTER = float(os.getenv("INDEX_STALE_AFTER", 10))
+INDEX_REST_INTERVAL = float(os.getenv("INDEX_REST_INTERVAL", 5))
+
+# Max age (seconds) of a streamed/cached LTP before smart_trader falls back to a REST quote
+LTP_MAX_AGE = float(os.getenv("LTP_MAX_AGE", 2))
+
+# Quote coalescing: window (seconds) over which concurrent kite.quote requests are batched, and wait timeout
+QUOTE_BATCH_WINDOW = float(os.getenv("QUOTE_BATCH_WINDOW", 0.02))
+QUOTE_TIMEOUT = float(os.getenv("QUOTE_TIMEOUT", 10))
+
+# Scheduler cadences (seconds): token poll fallback (changes normally arrive via Redis keyspace
+# notifications), subscription diff publishing and profit-lock evaluation
+TOKEN_POLL_INTERVAL = float(os.getenv("TOKEN_POLL_INTERVAL", 30))
+SUBSCRIPTION_SYNC_INTERVAL = float(os.getenv("SUBSCRIPTION_SYNC_INTERVAL", 2))
+PROFIT_LOCK_INTERVAL = float(os.getenv("PROFIT_LOCK_INTERVAL", 2))
+# Universal square-off: catch-up window (seconds after universal_exit_time) for late starts / retries
+TIME_EXIT_WINDOW = float(os.getenv("TIME_EXIT_WINDOW", 120))
+
+# On-disk instrument master cache (one file per trading day; a new day starts at the refresh time, IST)
+INSTRUMENT_CACHE_DIR = os.getenv("INSTRUMENT_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "instruments"))
+INSTRUMENT_REFRESH_TIME = os.getenv("INSTRUMENT_REFRESH_TIME", "08:30")
@@ -7,13 +7,31 @@ class AppSetting(db.Model):
     data = db.Column(db.Text, nullable=False) # Stores JSON string
 
 class ActiveTrade(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
+    # Trade ID is the primary key, so a single trade can be upserted/deleted in place
+    id = db.Column(db.BigInteger, primary_key=True, autoincrement=False)
     data = db.Column(db.Text, nullable=False) # Stores JSON string
 
 class TradeHistory(db.Model):
     # BigInteger to handle timestamp IDs safely
     id = db.Column(db.BigInteger, primary_key=True)
-    data = db.Column(db.Text, nullable=False) # Stores JSON string
+    data = db.Column(db.Text, nullable=False) # Stores JSON string (full record)
+    
+    # Queryable copies of the JSON fields (kept in sync by persistence on every write)
+    mode = db.Column(db.String(10))
+    symbol = db.Column(db.String(100))
+    instrument_token = db.Column(db.BigInteger)
+    exit_date = db.Column(db.String(10))    # YYYY-MM-DD (IST), from exit_time
+    exit_time = db.Column(db.String(30))
+    pnl = db.Column(db.Float)               # P/L of the quantity closed at exit
+    booked_pnl = db.Column(db.Float)        # P/L realized earlier by partial exits
+    status = db.Column(db.String(30))
+    entry_price = db.Column(db.Float)
+    quantity = db.Column(db.Integer)
+    
+    __table_args__ = (
+        db.Index('ix_trade_history_exit_date_mode', 'exit_date', 'mode'),
+        db.Index('ix_trade_history_token_exit_date', 'instrument_token', 'exit_date'),
+    )
 
 class RiskState(db.Model):
     # Stores persistent state for Profit Locking (High PnL, Global SL)
@@ -26,3 +44,18 @@ class TelegramMessage(db.Model):
     trade_id = db.Column(db.String(50), nullable=False, index=True)
     message_id = db.Column(db.Integer, nullable=False)
     chat_id = db.Column(db.String(50), nullable=False)
+
+# --- Telegram Outbox (persistent send queue, drained by the background sender) ---
+class TelegramOutbox(db.Model):
+    id = db.Column(db.Integer, primary_key=True) # FIFO order per chat
+    chat_id = db.Column(db.String(50), nullable=False, index=True)
+    text = db.Column(db.Text, nullable=False)
+    event_type = db.Column(db.String(20))
+    trade_id = db.Column(db.String(50), index=True)     # Reply threading is resolved at send time
+    channel_key = db.Column(db.String(10))              # main / vip / free / z2h
+    thread_start = db.Column(db.Boolean, default=False) # Message becomes the trade's thread parent
+    reply_to_id = db.Column(db.Integer)                 # Explicit reply target (overrides threading)
+    attempts = db.Column(db.Integer, default=0)
+    next_attempt = db.Column(db.Float, default=0)       # Epoch seconds (backoff / retry_after)
+    status = db.Column(db.String(10), default='PENDING', index=True) # PENDING / FAILED
+    created_at = db.Column(db.Float, nullable=False)
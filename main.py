@@ -14,6 +14,14 @@ from managers import config_manager
 # --- IMPORTS ---
 from managers import persistence, trade_manager, risk_engine, replay_engine, common, broker_ops
 from managers.telegram_manager import bot as telegram_bot
+from managers.trade_store import store as trade_store, closed_today, writer as trade_writer
+from managers.order_dispatcher import dispatcher as order_dispatcher
+from managers.live_feed import live_feed
+from managers.index_feed import index_feed
+from managers.quote_service import quotes
+from managers.versions import versions
+from managers.pnl_ledger import ledger
+from managers.scheduler import scheduler
 import smart_trader
 import settings
 from database import db, AppSetting
@@ -27,11 +35,14 @@ app.config.from_object(config)
 
 # Initialize SocketIO
 socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet')
+live_feed.attach(socketio)
 
 # Initialize Database
 db.init_app(app)
 with app.app_context():
     db.create_all()
+    persistence.migrate_active_trade_ids()
+    persistence.migrate_history_columns()
 
 # --- GATEWAY / REDIS SETUP ---
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
@@ -92,74 +103,97 @@ def sync_with_gateway():
         login_state = "ERROR"
         login_error_msg = str(e)
 
-def background_monitor():
-    global bot_active, login_state, ticker_started
-    
-    last_cleanup_time = 0 
-    
+# --- SCHEDULED JOBS (replace the old 2-second background poll) ---
+def job_gateway_sync():
+    """Token sync (woken by the Redis keyspace notification, polled as a fallback) + ticker start."""
+    global ticker_started
+    sync_with_gateway()
+    if bot_active and not ticker_started:
+        print("🚀 Connecting to Market Data Gateway Stream...")
+        # The 'risk_engine' uses RedisTicker, which talks to the Gateway, so it doesn't
+        # strictly need the api_key for *data*, but we pass what we have.
+        risk_engine.start_ticker(kite.api_key, kite.access_token, kite, app, socketio)
+        ticker_started = True
+
+def job_subscriptions():
+    # Publishes the subscription diff (no-op when the desired token set did not change)
+    if bot_active: risk_engine.update_subscriptions()
+
+def job_profit_lock():
+    if not bot_active: return
+    current_settings = settings.get_settings()
+    risk_engine.check_global_exit_conditions(kite, "PAPER", current_settings['modes']['PAPER'])
+    # LIVE check is valid only if Gateway provided a Real Token (Shadow Mode)
+    risk_engine.check_global_exit_conditions(kite, "LIVE", current_settings['modes']['LIVE'])
+
+def job_time_exit(mode):
+    # False = not done: the scheduler retries until the catch-up window closes
+    if not bot_active: return False
+    return risk_engine.run_time_exit(kite, mode)
+
+def exit_time_of(mode):
+    return settings.get_settings()['modes'][mode].get('universal_exit_time', "15:25")
+
+def watch_gateway_token():
+    """
+    Listens for changes of the token key via Redis keyspace notifications and wakes the
+    gateway sync job. If notifications cannot be enabled, the fallback poll still applies.
+    """
+    try:
+        try:
+            flags = redis_client.config_get('notify-keyspace-events').get('notify-keyspace-events', '')
+            missing = ''.join(c for c in 'K$gx' if c not in flags)
+            if missing: redis_client.config_set('notify-keyspace-events', flags + missing)
+        except Exception as e:
+            print(f"⚠️ Keyspace notifications unavailable ({e}). Token changes are polled every {config.TOKEN_POLL_INTERVAL}s.")
+        db_index = redis_client.connection_pool.connection_kwargs.get('db', 0)
+        pubsub = redis_client.pubsub()
+        pubsub.subscribe(f"__keyspace@{db_index}__:ZERODHA_ACCESS_TOKEN")
+        for message in pubsub.listen():
+            if message['type'] == 'message':
+                scheduler.trigger('gateway_sync')
+    except Exception as e:
+        print(f"❌ Token Watch Error: {e}")
+
+def start_jobs():
     with app.app_context():
         try:
             telegram_bot.notify_system_event("STARTUP", "PaperTrade V1 (Gateway Mode) Started.")
-            print("🖥️ Background Monitor Started (Gateway Mode)")
+            print("🖥️ Scheduler Started (Gateway Mode)")
         except Exception as e:
             print(f"❌ Startup Notification Failed: {e}")
     
-    time.sleep(2) 
-    
-    while True:
-        with app.app_context():
-            try:
-                # --- AUTO-DELETE OLD DATA (Runs once every 24 hours) ---
-                current_time = time.time()
-                if current_time - last_cleanup_time > 86400: 
-                    persistence.cleanup_old_data(days=7)
-                    last_cleanup_time = current_time
-                # -------------------------------------------------------
-
-                # 1. SYNC WITH GATEWAY
-                # We constantly check if the Gateway has fresh tokens
-                sync_with_gateway()
-
-                # 2. Active Bot Logic
-                if bot_active:
-                    try:
-                        # --- WEBSOCKET LOGIC ---
-                        if not ticker_started:
-                            print("🚀 Connecting to Market Data Gateway Stream...")
-                            
-                            # We pass the kite object. The 'risk_engine' is updated to use RedisTicker
-                            # which talks to the Gateway, so it doesn't strictly need the api_key for *data*,
-                            # but we pass what we have.
-                            risk_engine.start_ticker(kite.api_key, kite.access_token, kite, app, socketio)
-                            ticker_started = True
-                        
-                        # 2. Sync Subscriptions (Handles new manual trades)
-                        risk_engine.update_subscriptions()
-                        
-                        # 3. Run Global Checks (Time Exit / Profit Lock)
-                        current_settings = settings.load_settings()
-                        risk_engine.check_global_exit_conditions(kite, "PAPER", current_settings['modes']['PAPER'])
-                        # LIVE check is valid only if Gateway provided a Real Token (Shadow Mode)
-                        risk_engine.check_global_exit_conditions(kite, "LIVE", current_settings['modes']['LIVE'])
-                        
-                    except Exception as e:
-                        print(f"⚠️ Loop Error: {e}")
-                        # If critical error, force re-sync
-                        # bot_active = False 
-
-            except Exception as e:
-                print(f"❌ Monitor Loop Critical Error: {e}")
-            finally:
-                db.session.remove()
-        
-        time.sleep(2.0) 
+    # Long I/O (history cleanup, instrument download on a new token) runs off the timer thread
+    scheduler.every('cleanup', 86400, lambda: persistence.cleanup_old_data(days=7), background=True)
+    scheduler.every('gateway_sync', config.TOKEN_POLL_INTERVAL, job_gateway_sync, background=True)
+    scheduler.every('subscriptions', config.SUBSCRIPTION_SYNC_INTERVAL, job_subscriptions, delay=2)
+    scheduler.every('profit_lock', config.PROFIT_LOCK_INTERVAL, job_profit_lock, delay=2)
+    for mode in ("PAPER", "LIVE"):
+        scheduler.daily(f'time_exit_{mode}', lambda m=mode: exit_time_of(m), lambda m=mode: job_time_exit(m), grace=config.TIME_EXIT_WINDOW)
+    scheduler.start(app)
+    threading.Thread(target=watch_gateway_token, daemon=True).start()
+
+# --- SOCKET.IO: DELTA FEED ---
+@socketio.on('connect')
+def socket_connect():
+    # Versioned snapshot; afterwards the client only receives (coalesced) patches
+    live_feed.add_client(request.sid)
+
+@socketio.on('disconnect')
+def socket_disconnect():
+    live_feed.remove_client(request.sid)
+
+@socketio.on('resync')
+def socket_resync(data=None):
+    # Client detected a sequence gap
+    live_feed.send_snapshot(request.sid, (data or {}).get('channel'))
 
 @app.route('/')
 def home():
     global bot_active, login_state
     
     if bot_active:
-        trades = persistence.load_trades()
+        trades = trade_store.snapshot()
         for t in trades: 
             t['symbol'] = smart_trader.get_display_name(t['symbol'])
         active = [t for t in trades if t['status'] in ['OPEN', 'PROMOTED_LIVE', 'PENDING', 'MONITORING']]
@@ -169,7 +203,8 @@ def home():
 
 @app.route('/api/status')
 def api_status():
-    return jsonify({"active": bot_active, "state": login_state, "login_url": "#"})
+    ticker = risk_engine.kws.stats() if risk_engine.kws and hasattr(risk_engine.kws, 'stats') else None
+    return jsonify({"active": bot_active, "state": login_state, "login_url": "#", "ticker": ticker, "feed": live_feed.stats(), "quotes": quotes.stats(), "jobs": scheduler.stats()})
 
 @app.route('/reset_connection')
 def reset_connection():
@@ -184,6 +219,7 @@ def reset_connection():
     # We delete the local reference, but we DO NOT delete the Redis key 
     # because the Gateway might still be healthy. We just want to re-fetch.
     kite.set_access_token("")
+    scheduler.trigger('gateway_sync')
     
     flash("🔄 Connection Reset. Syncing with Gateway...")
     return redirect('/')
@@ -195,8 +231,8 @@ def api_settings_load():
         from managers.common import IST
         from datetime import datetime
         today_str = datetime.now(IST).strftime("%Y-%m-%d")
-        trades = persistence.load_trades()
-        history = persistence.load_history()
+        trades = trade_store.all()
+        history = persistence.load_history(exit_date=today_str) # Entered today => exited today
         count = 0
         if trades:
             for t in trades:
@@ -212,12 +248,14 @@ def api_settings_load():
 @app.route('/api/settings/save', methods=['POST'])
 def api_settings_save():
     if settings.save_settings_file(request.json):
+        # Square-off timers follow the configured universal_exit_time
+        for mode in ("PAPER", "LIVE"): scheduler.reschedule(f'time_exit_{mode}')
         return jsonify({"status": "success"})
     return jsonify({"status": "error"})
 
 @app.route('/api/positions')
 def api_positions():
-    trades = persistence.load_trades()
+    trades = trade_store.snapshot()
     for t in trades:
         t['lot_size'] = smart_trader.get_lot_size(t['symbol'])
         t['symbol'] = smart_trader.get_display_name(t['symbol'])
@@ -232,7 +270,11 @@ def api_closed_trades():
 
 @app.route('/api/delete_trade/<trade_id>', methods=['POST'])
 def api_delete_trade(trade_id):
+    closed_today.discard(trade_id)
+    row = persistence.history_summary(trade_id)
     if persistence.delete_trade(trade_id):
+        # A deleted row stops counting towards today's realized P&L (max loss / profit lock)
+        if row: ledger.unbook(row['mode'], row['pnl'], row['exit_date'])
         return jsonify({"status": "success"})
     return jsonify({"status": "error"})
 
@@ -254,8 +296,7 @@ def api_manage_trade():
     action = data.get('action')
     lots = int(data.get('lots', 0))
     
-    trades = persistence.load_trades()
-    t = next((x for x in trades if str(x['id']) == str(trade_id)), None)
+    t = trade_store.get(trade_id)
     if t and lots > 0:
         lot_size = smart_trader.get_lot_size(t['symbol'])
         if trade_manager.manage_trade_position(kite, trade_id, action, lot_size, lots):
@@ -266,11 +307,11 @@ def api_manage_trade():
 def api_indices():
     if not bot_active:
         return jsonify({"NIFTY":0, "BANKNIFTY":0, "SENSEX":0})
-    return jsonify(smart_trader.get_indices_ltp(kite))
+    return jsonify(index_feed.get(kite))
 
 @app.route('/api/search')
 def api_search():
-    current_settings = settings.load_settings()
+    current_settings = settings.get_settings()
     allowed = current_settings.get('exchanges', None)
     return jsonify(smart_trader.search_symbols(kite, request.args.get('q', ''), allowed))
 
@@ -350,35 +391,19 @@ def api_import_trade():
             data.get('exit_multiplier', 1), data.get('target_controls'),
             target_channels=target_channels
         )
-        # Handle async notifications for imported trade
+        # Queue notifications for the imported trade (outbox keeps order & rate limits)
         queue = result.get('notification_queue', [])
         trade_ref = result.get('trade_ref', {})
         if queue and trade_ref:
-            def send_seq_notifications():
-                with app.app_context():
-                    msg_ids = telegram_bot.notify_trade_event(trade_ref, "NEW_TRADE")
-                    if msg_ids:
-                        from managers.persistence import load_trades, save_trades, save_to_history_db
-                        trade_id = trade_ref['id']
-                        if isinstance(msg_ids, dict): ids_dict = msg_ids; main_id = msg_ids.get(selected_channel) or msg_ids.get('main')
-                        else: ids_dict = {'main': msg_ids}; main_id = msg_ids
-                        
-                        trades = load_trades()
-                        for t in trades:
-                            if str(t['id']) == str(trade_id):
-                                t['telegram_msg_ids'] = ids_dict; t['telegram_msg_id'] = main_id 
-                                save_trades(trades); break
-                    
-                    for item in queue:
-                        evt = item['event']
-                        if evt == 'NEW_TRADE': continue 
-                        time.sleep(1.0)
-                        t_obj = item.get('trade', trade_ref).copy() 
-                        if 'id' not in t_obj: t_obj['id'] = trade_ref['id']
-                        telegram_bot.notify_trade_event(t_obj, evt, item.get('data'))
-
-            t = threading.Thread(target=send_seq_notifications)
-            t.start()
+            # trade_ref is the stored trade (notify records its thread ids)
+            with trade_store.lock:
+                telegram_bot.notify_trade_event(trade_ref, "NEW_TRADE")
+                for item in queue:
+                    evt = item['event']
+                    if evt == 'NEW_TRADE': continue 
+                    t_obj = item.get('trade', trade_ref).copy() 
+                    if 'id' not in t_obj: t_obj['id'] = trade_ref['id']
+                    telegram_bot.notify_trade_event(t_obj, evt, item.get('data'))
         
         return jsonify(result)
     except Exception as e:
@@ -399,17 +424,36 @@ def api_sync():
         "positions": [], "closed_trades": [], "specific_ltp": 0
     }
     if bot_active:
-        try: response["indices"] = smart_trader.get_indices_ltp(kite)
+        # Shared cache fed by the tick stream (no per-poll quote call)
+        try: response["indices"] = index_feed.get(kite)
         except: pass
     
-    trades = persistence.load_trades()
+    # Version cursors: with a valid `since` only trades changed/removed after it are sent
+    epoch = request.json.get('epoch')
+    response["epoch"], response["version"] = versions.epoch, versions.version
+    pos_delta = versions.changes('positions', request.json.get('since'), epoch)
+    closed_delta = versions.changes('closed', request.json.get('closed_since'), epoch) if request.json.get('include_closed') else None
+    if pos_delta == ([], []) and (closed_delta == ([], []) or not request.json.get('include_closed')):
+        response["unchanged"] = True
+    
+    if pos_delta is None:
+        trades = trade_store.snapshot()
+    else:
+        trades = trade_store.snapshot(pos_delta[0])
+        response["positions_delta"] = True
+        response["removed_positions"] = pos_delta[1]
     for t in trades:
         t['lot_size'] = smart_trader.get_lot_size(t['symbol'])
         t['symbol'] = smart_trader.get_display_name(t['symbol'])
     response["positions"] = trades
 
     if request.json.get('include_closed'):
-        history = persistence.load_history()
+        if closed_delta is None:
+            history = persistence.load_history()
+        else:
+            history = persistence.load_history_rows(closed_delta[0])
+            response["closed_delta"] = True
+            response["removed_closed"] = closed_delta[1]
         for t in history: t['symbol'] = smart_trader.get_display_name(t['symbol'])
         response["closed_trades"] = history
 
@@ -462,7 +506,7 @@ def place_trade():
             flash("❌ Symbol Generation Failed")
             return redirect('/')
 
-        app_settings = settings.load_settings()
+        app_settings = settings.get_settings()
         
         def execute(ex_mode, ex_qty, ex_channels, overrides=None):
             # ... (Simplified for brevity, logic remains identical to original) ...
@@ -531,8 +575,18 @@ def close_trade(trade_id):
     return redirect('/')
 
 if not app.debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
-    t = threading.Thread(target=background_monitor, daemon=True)
-    t.start()
+    # Write-behind flusher for trade rows (flushes on interval, critical transitions and shutdown)
+    trade_writer.start(app)
+    # Broker order workers (tick loop enqueues order intents instead of blocking on HTTP)
+    order_dispatcher.start(app)
+    # Telegram outbox sender (notifications are queued, never sent from request/tick threads)
+    telegram_bot.start(app)
+    # Dashboard broadcaster (coalesced per-client frames at FEED_FPS_* rates)
+    live_feed.start()
+    # Settings cache invalidation on saves by other workers
+    settings.start_sync()
+    # Named jobs: gateway token sync, subscriptions, profit lock, timed square-off, cleanup
+    start_jobs()
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
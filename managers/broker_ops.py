@@ -1,5 +1,8 @@
 from managers.common import log_event, get_time_str
-from managers.persistence import load_trades, save_trades, save_to_history_db
+from managers.persistence import save_to_history_db
+from managers.trade_store import store, closed_today
+from managers.pnl_ledger import ledger
+from managers.order_dispatcher import dispatcher
 import smart_trader
 
 def place_order(kite, symbol, transaction_type, quantity, order_type="MARKET", product="MIS", price=0, trigger_price=0, exchange=None, tag="RD_ALGO"):
@@ -53,7 +56,7 @@ def move_to_history(trade, final_status, exit_price):
     if 'pnl' in trade and trade['pnl'] is not None:
          real_pnl = trade['pnl']
     elif was_active:
-        # Standard calculation (Exit - Entry) * Qty
+        # Standard calculation (Exit - Entry) * Qty; partial exits stay in 'booked_pnl'
         real_pnl = round((exit_price - trade['entry_price']) * trade['quantity'], 2)
         
     trade['pnl'] = real_pnl if was_active else 0
@@ -66,7 +69,16 @@ def move_to_history(trade, final_status, exit_price):
     if "Closed:" not in str(trade.get('logs', [])):
          log_event(trade, f"Closed: {final_status} @ {exit_price} | P/L ₹ {real_pnl:.2f}")
     
+    # Day ledger (partials were booked when they happened); before the DB write, which may seed it
+    ledger.book(trade['mode'], trade['pnl'])
     save_to_history_db(trade)
+    closed_today.add(trade)
+
+def book_partial_exit(trade, qty, price):
+    """Records the realized P/L of a partial exit on the trade and in the day ledger."""
+    amount = round((price - trade['entry_price']) * qty, 2)
+    trade['booked_pnl'] = round((trade.get('booked_pnl', 0) or 0) + amount, 2)
+    ledger.book(trade['mode'], amount)
 
 def manage_broker_sl(kite, trade, qty_to_remove=0, cancel_completely=False):
     """
@@ -107,40 +119,28 @@ def panic_exit_all(kite):
     3. Moves all trades to history with status 'PANIC_EXIT'.
     """
     try:
-        trades = load_trades()
-        if not trades: 
-            return True
-            
-        print(f"🚨 PANIC MODE TRIGGERED: Closing {len(trades)} positions.")
-        
-        for t in trades:
-            # Handle LIVE trades on the broker side
-            if t['mode'] == "LIVE" and t['status'] != 'PENDING':
-                # First, cancel the protection SL to avoid double execution
-                manage_broker_sl(kite, t, cancel_completely=True)
+        with store.lock:
+            trades = store.all()
+            if not trades: 
+                return True
                 
-                # Then place the exit order
-                try: 
-                    place_order(
-                        kite,
-                        symbol=t['symbol'], 
-                        exchange=t['exchange'], 
-                        transaction_type=kite.TRANSACTION_TYPE_SELL, 
-                        quantity=t['quantity'], 
-                        order_type=kite.ORDER_TYPE_MARKET, 
-                        product=kite.PRODUCT_MIS,
-                        tag="PANIC_EXIT"
-                    )
-                except Exception as e: 
-                    print(f"Panic Broker Fail {t['symbol']}: {e}")
+            print(f"🚨 PANIC MODE TRIGGERED: Closing {len(trades)} positions.")
+            
+            for t in trades:
+                # Handle LIVE trades on the broker side
+                if t['mode'] == "LIVE" and t['status'] != 'PENDING':
+                    # Cancel the protection SL first (avoids double execution), then Sell:
+                    # queued on the order dispatcher so the store lock is not held across broker calls
+                    dispatcher.submit(kite, t, 'FULL_EXIT', qty=t['quantity'], tag="PANIC_EXIT")
             
-            # Move to internal history
-            # Use current_ltp if available, else fallback to entry
-            exit_p = t.get('current_ltp', t['entry_price'])
-            move_to_history(t, "PANIC_EXIT", exit_p)
+                # Move to internal history
+                # Use current_ltp if available, else fallback to entry
+                exit_p = t.get('current_ltp', t['entry_price'])
+                move_to_history(t, "PANIC_EXIT", exit_p)
         
-        # Clear active trades list
-        save_trades([])
+            # Clear active trades list
+            store.clear()
+            store.commit(critical=True)
         return True
     except Exception as e:
         print(f"Panic Exit Error: {e}")
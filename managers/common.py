@@ -1,7 +1,7 @@
 import pytz
 from datetime import datetime
 import settings
-from managers.persistence import load_history, load_trades
+from managers.pnl_ledger import ledger
 
 # Global Timezone
 IST = pytz.timezone('Asia/Kolkata')
@@ -43,34 +43,16 @@ def get_day_pnl(mode):
     Includes:
     1. Realized P&L from closed trades today.
     2. Unrealized P&L from currently active trades.
+    Read from the running ledger (O(1), no history scan).
     """
-    today_str = datetime.now(IST).strftime("%Y-%m-%d")
-    total = 0.0
-    
-    # 1. Sum Realized P&L from History
-    history = load_history()
-    for t in history:
-        # Check if exit_time exists and matches today
-        if t.get('exit_time') and t['exit_time'].startswith(today_str) and t['mode'] == mode:
-            total += t.get('pnl', 0)
-            
-    # 2. Sum Unrealized P&L from Active Trades
-    active = load_trades()
-    for t in active:
-        if t['mode'] == mode and t['status'] != 'PENDING':
-            # Use current_ltp if available, else fallback to entry_price (0 PnL)
-            current_price = t.get('current_ltp', t['entry_price'])
-            unrealized = (current_price - t['entry_price']) * t['quantity']
-            total += unrealized
-            
-    return total
+    return ledger.day_pnl(mode)
 
 def can_place_order(mode):
     """
     Checks if a new order is allowed based on Global Risk Settings (Max Daily Loss).
     Returns: (Boolean allowed, String reason)
     """
-    current_settings = settings.load_settings()
+    current_settings = settings.get_settings()
     
     if mode not in current_settings['modes']:
         return True, "OK"
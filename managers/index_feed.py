@@ -0,0 +1,68 @@
+import time
+import threading
+import config
+import smart_trader
+from managers.subscriptions import subscriptions
+from managers.live_feed import live_feed
+
+# Index instruments streamed through the gateway (token -> key used by /api/sync and 'index_update')
+INDEX_TOKENS = {256265: 'NIFTY', 260105: 'BANKNIFTY', 265: 'SENSEX'}
+
+class IndexFeed:
+    """
+    Shared cache of index prices, fed by the tick stream and pushed to dashboards as 'index_update'.
+    HTTP readers get the cached values; only when no index tick arrived recently (gateway down,
+    market closed) is one REST quote made on behalf of all of them.
+    """
+    def __init__(self):
+        self.prices = {name: 0 for name in INDEX_TOKENS.values()}
+        self.updated_at = 0     # Last index tick
+        self._rest_at = 0       # Last REST fallback
+        self._lock = threading.Lock()
+        for token, name in INDEX_TOKENS.items():
+            subscriptions.want(('index', name), token)
+
+    def on_ticks(self, tick_map):
+        """Updates the cache from a tick batch ({token: ltp}) and queues a push if anything moved."""
+        changed = False
+        with self._lock:
+            for token, name in INDEX_TOKENS.items():
+                ltp = tick_map.get(token)
+                if ltp is None: continue
+                self.updated_at = time.time()
+                if ltp != self.prices[name]:
+                    self.prices[name] = ltp
+                    changed = True
+            prices = dict(self.prices)
+        if changed:
+            live_feed.publish_indices(prices)
+
+    def get(self, kite=None):
+        """
+        Cached index prices (REST refresh at most every INDEX_REST_INTERVAL while ticks are stale).
+        The REST call runs outside the lock, so the tick path never waits on it.
+        """
+        with self._lock:
+            now = time.time()
+            stale = now - self.updated_at > config.INDEX_STALE_AFTER
+            fetch = kite and stale and now - self._rest_at >= config.INDEX_REST_INTERVAL
+            if fetch: self._rest_at = now # Claims this refresh; concurrent readers get the cache
+            prices = dict(self.prices)
+        if not fetch:
+            return prices
+        
+        fetched = smart_trader.get_indices_ltp(kite)
+        with self._lock:
+            # Ticks that arrived during the call are newer than the quote
+            if any(fetched.values()) and self.updated_at < now:
+                self.prices.update(fetched)
+                changed = True
+            else:
+                changed = False
+            prices = dict(self.prices)
+        if changed:
+            live_feed.publish_indices(prices)
+        return prices
+
+# Singleton Instance
+index_feed = IndexFeed()
@@ -0,0 +1,128 @@
+import heapq
+import itertools
+
+ACTIVE_STATUSES = ('OPEN', 'PROMOTED_LIVE')
+
+def _token_of(trade):
+    try: return int(trade.get('instrument_token') or 0) or None
+    except (TypeError, ValueError): return None
+
+class RiskLevelIndex:
+    """
+    Per-token heaps of the risk levels of open positions:
+      - sl:     max-heap of stop levels          (crossed when ltp <= sl)
+      - target: min-heap of next unhit targets   (crossed when ltp >= target)
+      - trail:  min-heap of trailing triggers    (crossed when ltp >= sl + 2 * step)
+      - high:   min-heap of highest_ltp          (crossed when ltp > highest)
+    A tick pops only the levels it crossed, so positions whose levels lie outside the move cost nothing.
+    Entries carry a version; re-indexing a trade bumps it and stale entries are dropped lazily.
+    Visited trades must be re-indexed (`on_upsert`) after their handlers ran, since their entries were popped.
+    """
+    def __init__(self, source):
+        self._source = source
+        self._heaps = {}            # token -> {'sl': [], 'target': [], 'trail': [], 'high': []}
+        self._trades = {}           # trade_id -> trade dict (indexed)
+        self._token = {}            # trade_id -> token
+        self._live = {}             # token -> set(trade_id), to size stale-entry compaction
+        self._version = {}          # trade_id -> current entry version
+        self._dirty = {}            # trade_id -> trade dict, re-indexed before the next query
+        self._seq = itertools.count(1)
+        self._built = False
+
+    # --- STORE LISTENER ---
+    def on_upsert(self, trade):
+        self._dirty[int(trade['id'])] = trade
+
+    def on_remove(self, trade_id):
+        key = int(trade_id)
+        self._dirty.pop(key, None)
+        self._trades.pop(key, None)
+        self._version.pop(key, None)
+        token = self._token.pop(key, None)
+        if token is not None:
+            self._live[token].discard(key)
+
+    def on_clear(self):
+        self._heaps.clear()
+        self._trades.clear()
+        self._version.clear()
+        self._dirty.clear()
+        self._token.clear()
+        self._live.clear()
+
+    # --- INDEXING ---
+    def _index(self, t):
+        key = int(t['id'])
+        token = _token_of(t)
+        if t.get('status') not in ACTIVE_STATUSES or token is None:
+            self.on_remove(key)
+            return
+        if self._token.get(key) not in (None, token):
+            self.on_remove(key) # Instrument changed (promotion)
+        version = next(self._seq)
+        self._trades[key] = t
+        self._version[key] = version
+        self._token[key] = token
+        self._live.setdefault(token, set()).add(key)
+
+        heaps = self._heaps.setdefault(token, {'sl': [], 'target': [], 'trail': [], 'high': []})
+        sl = float(t.get('sl') or 0)
+        heapq.heappush(heaps['sl'], (-sl, version, key))
+
+        hit = set(t.get('targets_hit_indices', []))
+        pending = [tgt for i, tgt in enumerate(t.get('targets') or []) if i not in hit]
+        if pending:
+            heapq.heappush(heaps['target'], (min(pending), version, key))
+
+        step = float(t.get('trailing_sl') or 0)
+        if step > 0:
+            heapq.heappush(heaps['trail'], (sl + 2 * step, version, key))
+
+        heapq.heappush(heaps['high'], (float(t.get('highest_ltp', 0) or 0), version, key))
+        self._maybe_compact(token)
+
+    def _maybe_compact(self, token):
+        """Rebuilds a token's heaps once stale entries dominate."""
+        live = self._live.get(token, ())
+        if len(self._heaps[token]['sl']) < 4 * len(live) + 64:
+            return
+        trades = [self._trades[k] for k in live]
+        del self._heaps[token]
+        for t in trades: self._index(t)
+
+    def _sync(self):
+        if not self._built:
+            self.on_clear()
+            for t in self._source(): self._index(t)
+            self._built = True
+        if self._dirty:
+            dirty, self._dirty = self._dirty, {}
+            for t in dirty.values(): self._index(t)
+
+    # --- QUERIES ---
+    def _pop_crossed(self, heap, crossed, out):
+        while heap:
+            level, version, key = heap[0]
+            if self._version.get(key) != version:
+                heapq.heappop(heap)     # Stale
+                continue
+            if not crossed(level):
+                break
+            heapq.heappop(heap)
+            out.add(key)
+
+    def crossed_ids(self, tick_map):
+        """
+        Trade ids of open positions whose SL, next target, trailing trigger or high was crossed
+        by a tick batch ({token: ltp}). Caller must hold the store lock.
+        """
+        self._sync()
+        out = set()
+        for token, ltp in tick_map.items():
+            heaps = self._heaps.get(token)
+            if not heaps: continue
+            self._pop_crossed(heaps['sl'], lambda neg_sl: ltp <= -neg_sl, out)
+            self._pop_crossed(heaps['target'], lambda tgt: ltp >= tgt, out)
+            self._pop_crossed(heaps['trail'], lambda lvl: ltp >= lvl, out)
+            self._pop_crossed(heaps['high'], lambda high: ltp > high, out)
+        return out
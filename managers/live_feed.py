@@ -0,0 +1,262 @@
+import copy
+import time
+import threading
+import config
+import smart_trader
+from managers.trade_store import store, closed_today
+
+# Fields carried by patches (everything else, e.g. logs, only travels in snapshots/upserts)
+# Positions: price / risk state, plus what manual edits change (ADD averaging, protection edits, promotion)
+POSITION_FIELDS = (
+    'current_ltp', 'sl', 'quantity', 'status', 'targets_hit_indices',
+    'entry_price', 'targets', 'target_controls', 'trailing_sl', 'sl_to_entry', 'exit_multiplier', 'mode'
+)
+CLOSED_FIELDS = ('current_ltp', 'made_high', 'virtual_sl_hit')
+
+def _values(t, fields):
+    return tuple(copy.copy(t.get(f)) for f in fields)
+
+def decorate(t):
+    """Copy of a trade as the dashboard expects it (display symbol, lot size)."""
+    d = copy.deepcopy(t)
+    d['lot_size'] = smart_trader.get_lot_size(d['symbol'])
+    d['symbol'] = smart_trader.get_display_name(d['symbol'])
+    return d
+
+class _Channel:
+    """
+    One delta stream (positions or closed). Tracks the last published field values per trade
+    and turns the trades marked dirty into a versioned patch: {from, seq, patches, upserts, removed}.
+    """
+    def __init__(self, name, fields, full_upserts):
+        self.name = name
+        self.fields = fields
+        self.full_upserts = full_upserts  # New trades travel as full (decorated) dicts
+        self.seq = 0
+        self._last = {}         # trade_id -> published field values
+        self._dirty = {}        # trade_id -> live trade dict
+        self._removed = set()
+
+    # --- STORE LISTENER ---
+    def on_upsert(self, trade):
+        self._dirty[int(trade['id'])] = trade
+
+    def on_remove(self, trade_id):
+        key = int(trade_id)
+        self._dirty.pop(key, None)
+        if key in self._last:
+            self._removed.add(key)
+
+    def on_clear(self):
+        self._dirty.clear()
+        self._removed.update(self._last)
+
+    def mark(self, trades):
+        for t in trades: self._dirty[int(t['id'])] = t
+
+    def diff(self):
+        """Builds the next patch from the dirty trades (caller holds the store lock). None if nothing changed."""
+        patches, upserts = {}, []
+        for key, t in self._dirty.items():
+            values = _values(t, self.fields)
+            old = self._last.get(key)
+            if old is None:
+                if self.full_upserts: upserts.append(decorate(t))
+                else: patches[key] = dict(zip(self.fields, values))
+            elif old != values:
+                patches[key] = {f: v for f, v, o in zip(self.fields, values, old) if v != o}
+            else:
+                continue
+            self._last[key] = values
+        removed = sorted(self._removed)
+        for key in removed: self._last.pop(key, None)
+        self._dirty.clear()
+        self._removed.clear()
+
+        if not patches and not upserts and not removed:
+            return None
+        self.seq += 1
+        return {'from': self.seq - 1, 'seq': self.seq, 'patches': patches, 'upserts': upserts, 'removed': removed}
+
+def _merge(into, patch):
+    """Coalesces a channel patch into a client's pending frame (later values win)."""
+    if into is None:
+        into = {'patches': {}, 'upserts': {}, 'removed': set()}
+    for key, fields in patch['patches'].items():
+        if key in into['upserts']:
+            into['upserts'][key].update(fields)     # Not delivered yet: fold into the upsert
+        else:
+            into['patches'].setdefault(key, {}).update(fields)
+    for u in patch['upserts']:
+        key = int(u['id'])
+        into['upserts'][key] = dict(u)
+        into['patches'].pop(key, None)
+        into['removed'].discard(key)
+    for key in patch['removed']:
+        into['patches'].pop(key, None)
+        into['upserts'].pop(key, None)
+        into['removed'].add(key)
+    return into
+
+class _Client:
+    """Per-connection delivery state: own sequence numbers, coalesced pending frames, unacked frames."""
+    def __init__(self, sid):
+        self.sid = sid
+        self.seq = {'positions': 0, 'closed': 0}
+        self.pending = {'positions': None, 'closed': None, 'indices': None}
+        self.inflight = 0
+        self.last_emit = 0
+        self.skipped = 0
+
+class LiveFeed:
+    """
+    Delta protocol for the dashboards:
+      - on connect / resync a client gets a versioned snapshot ('trade_snapshot', 'closed_snapshot')
+      - afterwards only compact per-trade field diffs are pushed ('trade_patch', 'closed_patch')
+        carrying {from, seq}; a client whose seq != from has missed a patch and asks to 'resync'.
+    Patches hold absolute values, so applying one on top of a newer snapshot is harmless.
+    
+    Delivery is decoupled from the tick rate: a broadcaster thread diffs each channel at its own
+    frame rate (positions / closed / indices), coalesces the result into every client's pending
+    frame and sends it. A client with unacknowledged frames is skipped (its frame keeps coalescing),
+    so slow dashboards get fewer, fresher frames instead of a backlog.
+    """
+    def __init__(self):
+        self.socketio = None
+        self.positions = _Channel('positions', POSITION_FIELDS, full_upserts=True)
+        self.closed = _Channel('closed', CLOSED_FIELDS, full_upserts=False)
+        self.rates = {
+            'positions': config.FEED_FPS_POSITIONS,
+            'closed': config.FEED_FPS_CLOSED,
+            'indices': config.FEED_FPS_INDICES,
+        }
+        self._clients = {}          # sid -> _Client
+        self._lock = threading.Lock()
+        self._indices = None        # Latest index prices (set by the tick path)
+        self._thread = None
+
+    def attach(self, socketio):
+        self.socketio = socketio
+
+    # --- PRODUCERS (tick path) ---
+    def mark_positions(self, trades):
+        """Records price-only changes (not reported through the store listener)."""
+        with store.lock: self.positions.mark(trades)
+
+    def mark_closed(self, trades):
+        with store.lock: self.closed.mark(trades)
+
+    def publish_indices(self, prices):
+        """Latest index prices; only the newest value is ever delivered."""
+        with self._lock:
+            self._indices = dict(prices)
+            for c in self._clients.values(): c.pending['indices'] = self._indices
+
+    # --- CLIENTS ---
+    def add_client(self, sid):
+        with self._lock:
+            self._clients[sid] = _Client(sid)
+        self.send_snapshot(sid)
+
+    def remove_client(self, sid):
+        with self._lock:
+            self._clients.pop(sid, None)
+
+    def snapshot(self, channel, client=None):
+        with store.lock:
+            if channel == 'positions':
+                data = {'positions': [decorate(t) for t in store.all()]}
+            else:
+                data = {'trades': [{'id': t['id'], **dict(zip(CLOSED_FIELDS, _values(t, CLOSED_FIELDS)))} for t in closed_today.all()]}
+            with self._lock:
+                # The snapshot supersedes anything still pending for this client
+                if client is not None: client.pending[channel] = None
+                data['seq'] = client.seq[channel] if client is not None else getattr(self, channel).seq
+            return data
+
+    def send_snapshot(self, sid, channel=None):
+        """Sends the snapshot(s) to one client (connect / resync)."""
+        if not self.socketio: return
+        client = self._clients.get(sid)
+        if channel in (None, 'positions'):
+            self.socketio.emit('trade_snapshot', self.snapshot('positions', client), to=sid)
+        if channel in (None, 'closed'):
+            self.socketio.emit('closed_snapshot', self.snapshot('closed', client), to=sid)
+        if channel is None and self._indices:
+            self.socketio.emit('index_update', self._indices, to=sid)
+
+    # --- BROADCASTER ---
+    def start(self):
+        """Starts the broadcaster thread (idempotent)."""
+        if self._thread is not None: return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        periods = {ch: 1.0 / r for ch, r in self.rates.items() if r > 0}
+        due = {ch: 0 for ch in periods}
+        tick = min(periods.values()) if periods else 1.0
+        while True:
+            now = time.time()
+            frame = [ch for ch in periods if now >= due[ch]]
+            for ch in frame: due[ch] = now + periods[ch]
+            if frame:
+                try:
+                    self._broadcast(frame)
+                except Exception as e:
+                    print(f"Socket Broadcast Error: {e}")
+            time.sleep(tick / 2)
+
+    def _broadcast(self, channels):
+        # 1. Diff the trade channels once and coalesce into every client's pending frame
+        with store.lock:
+            diffs = {ch: getattr(self, ch).diff() for ch in channels if ch in ('positions', 'closed')}
+        with self._lock:
+            for ch, patch in diffs.items():
+                if patch is None: continue
+                for c in self._clients.values(): c.pending[ch] = _merge(c.pending[ch], patch)
+            clients = list(self._clients.values())
+        
+        if not self.socketio: return
+        # 2. Send each client its due frames, unless it is backed up
+        now = time.time()
+        for c in clients:
+            if c.inflight >= config.FEED_MAX_INFLIGHT:
+                if now - c.last_emit < 5:
+                    c.skipped += 1
+                    continue
+                c.inflight = 0  # Acks lost (old client / reconnect): resume
+            for ch in channels:
+                self._send_frame(c, ch)
+
+    def _send_frame(self, c, ch):
+        with self._lock:
+            pending = c.pending[ch]
+            if pending is None: return
+            c.pending[ch] = None
+            if ch == 'indices':
+                event, data = 'index_update', pending
+            else:
+                event = 'trade_patch' if ch == 'positions' else 'closed_patch'
+                data = {
+                    'from': c.seq[ch], 'seq': c.seq[ch] + 1,
+                    'patches': pending['patches'], 'upserts': list(pending['upserts'].values()),
+                    'removed': sorted(pending['removed'])
+                }
+                c.seq[ch] += 1
+            c.inflight += 1
+            c.last_emit = time.time()
+        self.socketio.emit(event, data, to=c.sid, callback=lambda *a: self._ack(c))
+
+    def _ack(self, c):
+        with self._lock:
+            c.inflight = max(0, c.inflight - 1)
+
+    def stats(self):
+        with self._lock:
+            return {'clients': len(self._clients), 'skipped': sum(c.skipped for c in self._clients.values())}
+
+# Singleton Instance
+live_feed = LiveFeed()
+store.listeners.append(live_feed.positions)
+closed_today.listeners.append(live_feed.closed)
@@ -0,0 +1,169 @@
+import queue
+import threading
+import config
+from managers.common import log_event
+from managers.trade_store import store, closed_today
+
+class OrderDispatcher:
+    """
+    Asynchronous broker order dispatcher.
+    The tick loop enqueues order intents and moves on; a pool of workers talks to the broker.
+    All intents of one trade go to the same worker (trade id hash), so they execute in
+    submission order (entry before SL modify, SL cancel before exit, ...).
+    Results (order ids, failures) are written back into the trade's logs / sl_order_id.
+    """
+    def __init__(self, workers):
+        self.workers = max(1, workers)
+        self._queues = [queue.Queue() for _ in range(self.workers)]
+        self._threads = []
+        self._app = None
+
+    # --- SUBMISSION ---
+    def submit(self, kite, trade, action, **params):
+        """
+        Enqueues an order intent for `trade`.
+        Actions: ENTRY (qty, sl), ADD (qty, total), MODIFY_SL (trigger_price),
+        PARTIAL_EXIT (qty, remaining), FULL_EXIT (qty). Optional `tag` for the market order.
+        """
+        intent = {
+            'kite': kite, 'action': action, 'trade_id': int(trade['id']),
+            'symbol': trade['symbol'], 'exchange': trade['exchange'], **params
+        }
+        if not self._threads:
+            # No workers (scripts, replay shell): execute synchronously
+            self._execute(intent)
+            return
+        self._queues[intent['trade_id'] % self.workers].put(intent)
+
+    def pending(self):
+        """Number of intents waiting across all workers."""
+        return sum(q.qsize() for q in self._queues)
+
+    def start(self, app):
+        """Starts the worker pool (idempotent)."""
+        if self._threads:
+            return
+        self._app = app
+        for q in self._queues:
+            t = threading.Thread(target=self._run, args=(q,), daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def _run(self, q):
+        while True:
+            intent = q.get()
+            try:
+                with self._app.app_context():
+                    self._execute(intent)
+            except Exception as e:
+                print(f"❌ Order Dispatcher Error ({intent['action']} #{intent['trade_id']}): {e}")
+            finally:
+                q.task_done()
+
+    # --- EXECUTION ---
+    def _execute(self, intent):
+        kite = intent['kite']
+        action = intent['action']
+        handler = {
+            'ENTRY': self._entry,
+            'ADD': self._add,
+            'MODIFY_SL': self._modify_sl,
+            'PARTIAL_EXIT': self._partial_exit,
+            'FULL_EXIT': self._full_exit,
+        }[action]
+        handler(kite, intent)
+
+    def _market(self, kite, intent, transaction_type, qty, tag=None):
+        params = dict(
+            variety=kite.VARIETY_REGULAR, tradingsymbol=intent['symbol'], exchange=intent['exchange'],
+            transaction_type=transaction_type, quantity=qty,
+            order_type=kite.ORDER_TYPE_MARKET, product=kite.PRODUCT_MIS
+        )
+        tag = intent.get('tag', tag)
+        if tag: params['tag'] = tag
+        return kite.place_order(**params)
+
+    def _entry(self, kite, intent):
+        try:
+            self._market(kite, intent, kite.TRANSACTION_TYPE_BUY, intent['qty'], tag="RD_ENTRY")
+            # Place Broker SL
+            sl_id = kite.place_order(
+                variety=kite.VARIETY_REGULAR, tradingsymbol=intent['symbol'], exchange=intent['exchange'],
+                transaction_type=kite.TRANSACTION_TYPE_SELL, quantity=intent['qty'],
+                order_type=kite.ORDER_TYPE_SL_M, product=kite.PRODUCT_MIS,
+                trigger_price=intent['sl'], tag="RD_SL"
+            )
+            self._write_back(intent, f"Broker Entry Placed | SL Order ID: {sl_id}", sl_order_id=sl_id)
+        except Exception as e:
+            self._write_back(intent, f"Broker Fail (Active): {e}")
+
+    def _add(self, kite, intent):
+        try:
+            self._market(kite, intent, kite.TRANSACTION_TYPE_BUY, intent['qty'])
+            # Update Broker SL Quantity
+            sl_id = self._sl_order_id(intent)
+            if sl_id:
+                kite.modify_order(variety=kite.VARIETY_REGULAR, order_id=sl_id, quantity=intent['total'])
+        except Exception as e:
+            self._write_back(intent, f"Broker Fail (Add): {e}")
+
+    def _modify_sl(self, kite, intent):
+        sl_id = self._sl_order_id(intent)
+        if not sl_id: return
+        try:
+            kite.modify_order(variety=kite.VARIETY_REGULAR, order_id=sl_id, trigger_price=intent['trigger_price'])
+        except Exception as e:
+            self._write_back(intent, f"⚠️ Broker SL Modify Failed: {e}")
+
+    def _partial_exit(self, kite, intent):
+        sl_id = self._sl_order_id(intent)
+        if sl_id:
+            try:
+                kite.modify_order(variety=kite.VARIETY_REGULAR, order_id=sl_id, quantity=intent['remaining'])
+                self._write_back(intent, f"Broker SL Qty Modified to {intent['remaining']}")
+            except Exception as e:
+                self._write_back(intent, f"⚠️ Broker SL Update Failed: {e}")
+        try:
+            self._market(kite, intent, kite.TRANSACTION_TYPE_SELL, intent['qty'])
+        except Exception as e:
+            self._write_back(intent, f"Broker Fail (Partial Exit): {e}")
+
+    def _full_exit(self, kite, intent):
+        sl_id = self._sl_order_id(intent)
+        if sl_id:
+            try:
+                kite.cancel_order(variety=kite.VARIETY_REGULAR, order_id=sl_id)
+                self._write_back(intent, f"Broker SL Cancelled (ID: {sl_id})", sl_order_id=None)
+            except Exception as e:
+                self._write_back(intent, f"⚠️ Broker SL Update Failed: {e}")
+        try:
+            self._market(kite, intent, kite.TRANSACTION_TYPE_SELL, intent['qty'])
+        except Exception as e:
+            self._write_back(intent, f"Broker Fail (Exit): {e}")
+
+    # --- WRITE BACK ---
+    def _resolve(self, trade_id):
+        """Finds the live trade dict, which may have moved to today's history meanwhile."""
+        t = store.get(trade_id)
+        if t is not None: return t, store
+        return closed_today.get(trade_id), closed_today
+
+    def _sl_order_id(self, intent):
+        # Read at execution time: an earlier ENTRY intent of this trade may have just set it
+        with store.lock:
+            t, _ = self._resolve(intent['trade_id'])
+            return t.get('sl_order_id') if t else None
+
+    def _write_back(self, intent, message, **fields):
+        with store.lock:
+            t, owner = self._resolve(intent['trade_id'])
+            if t is None:
+                print(f"⚠️ Order Result for unknown trade #{intent['trade_id']}: {message}")
+                return
+            t.update(fields)
+            log_event(t, message)
+            owner.touch(t)
+        store.writer.request_flush(critical=bool(fields))
+
+# Singleton Instance
+dispatcher = OrderDispatcher(config.ORDER_WORKERS)
@@ -1,5 +1,7 @@
 import json
-from database import db, ActiveTrade, TradeHistory, RiskState, TelegramMessage
+from sqlalchemy import text, inspect, func
+from database import db, ActiveTrade, TradeHistory, RiskState, TelegramMessage, TelegramOutbox
+from managers.versions import versions
 from datetime import datetime, timedelta
 import time
 
@@ -27,57 +29,209 @@ def save_risk_state(mode, state):
         db.session.rollback()
 
 # --- Active Trades Persistence ---
-def load_trades():
+# ActiveTrade rows are keyed by the trade id, so single trades can be upserted/deleted in place
+def migrate_active_trade_ids():
+    """
+    One-off startup migration: re-keys legacy ActiveTrade rows (autoincrement id)
+    to the trade id stored inside their JSON.
+    """
+    try:
+        if db.engine.dialect.name == 'postgresql':
+            db.session.execute(text("ALTER TABLE active_trade ALTER COLUMN id TYPE BIGINT"))
+            db.session.execute(text("ALTER TABLE active_trade ALTER COLUMN id DROP DEFAULT"))
+        
+        legacy = []
+        for r in ActiveTrade.query.all():
+            trade_id = int(json.loads(r.data)['id'])
+            if r.id != trade_id:
+                legacy.append((trade_id, r.data))
+                db.session.delete(r)
+        db.session.flush()
+        for trade_id, data in legacy:
+            db.session.merge(ActiveTrade(id=trade_id, data=data))
+        db.session.commit()
+        if legacy:
+            print(f"🔧 ActiveTrade Migration: Re-keyed {len(legacy)} rows to their trade ids.")
+    except Exception as e:
+        print(f"❌ ActiveTrade Migration Error: {e}")
+        db.session.rollback()
+
+def load_trades(strict=False):
     """
     Loads all currently active trades from the database.
     INCLUDES DEBUG LOGGING AND SESSION RESET.
+    Runtime code should read from managers.trade_store instead; this is the backend loader.
+    With strict=True, errors are re-raised instead of returning an empty list.
     """
     try:
         # [DEBUG] Reset session to force fresh read
         db.session.remove() 
-        
-        raw_rows = ActiveTrade.query.all()
-        trades = [json.loads(r.data) for r in raw_rows]
-        
-        return trades
+        return [json.loads(r.data) for r in ActiveTrade.query.order_by(ActiveTrade.id).all()]
     except Exception as e:
         print(f"[DEBUG] Load Trades Error: {e}")
+        if strict: raise
         return []
 
-def save_trades(trades):
+def write_active_trades(changed, removed_ids):
     """
-    Overwrites the ActiveTrade table with the provided list of trades.
+    Batched upsert/delete of the touched ActiveTrade rows in a single commit (write-behind flush).
+    `changed` maps trade_id -> JSON string; `removed_ids` are trade ids to delete.
+    Returns True on success.
     """
+    if not changed and not removed_ids: return True
     try:
-        # [DEBUG LOG] - Optional: You can comment this out too if needed
-        # ids = [t.get('id') for t in trades]
-        # modes = [t.get('mode') for t in trades]
-        # print(f"[DEBUG] DB SAVE: Saving {len(trades)} trades. IDs: {ids} | Modes: {modes}")
-
-        db.session.query(ActiveTrade).delete()
-        for t in trades: 
-            db.session.add(ActiveTrade(data=json.dumps(t)))
+        for trade_id, data in changed.items():
+            db.session.merge(ActiveTrade(id=int(trade_id), data=data))
+        if removed_ids:
+            ActiveTrade.query.filter(ActiveTrade.id.in_([int(i) for i in removed_ids])).delete(synchronize_session=False)
         db.session.commit()
-        # print(f"[DEBUG] DB SAVE: Commit Successful.")
+        return True
     except Exception as e:
-        print(f"[DEBUG] Save Trades Error: {e}")
+        print(f"[DEBUG] Write Active Trades Error: {e}")
         db.session.rollback()
+        return False
 
 # --- Trade History Persistence ---
-def load_history():
+# The JSON blob stays the source of truth; mode/date/pnl etc. are mirrored into indexed columns
+HISTORY_COLUMNS = {
+    'mode': 'VARCHAR(10)', 'symbol': 'VARCHAR(100)', 'instrument_token': 'BIGINT',
+    'exit_date': 'VARCHAR(10)', 'exit_time': 'VARCHAR(30)', 'pnl': 'FLOAT', 'booked_pnl': 'FLOAT',
+    'status': 'VARCHAR(30)', 'entry_price': 'FLOAT', 'quantity': 'INTEGER',
+}
+
+def _num(value, cast):
+    try: return cast(value) if value not in (None, '') else None
+    except (TypeError, ValueError): return None
+
+def history_columns(trade):
+    """Column values of a TradeHistory row, derived from the trade dict."""
+    exit_time = trade.get('exit_time') or None
+    return {
+        'mode': trade.get('mode'),
+        'symbol': trade.get('symbol'),
+        'instrument_token': _num(trade.get('instrument_token'), int),
+        'exit_date': exit_time[:10] if exit_time else None,
+        'exit_time': exit_time,
+        'pnl': _num(trade.get('pnl'), float),
+        'booked_pnl': _num(trade.get('booked_pnl'), float),
+        'status': trade.get('status'),
+        'entry_price': _num(trade.get('entry_price'), float),
+        'quantity': _num(trade.get('quantity'), int),
+    }
+
+def migrate_history_columns(batch_size=500):
+    """
+    One-off startup migration: adds the normalized TradeHistory columns and indexes to
+    existing tables and backfills them from the JSON of rows written before they existed.
+    """
+    try:
+        existing = {c['name'] for c in inspect(db.engine).get_columns('trade_history')}
+        for name, sql_type in HISTORY_COLUMNS.items():
+            if name not in existing:
+                db.session.execute(text(f"ALTER TABLE trade_history ADD COLUMN {name} {sql_type}"))
+        db.session.commit()
+        if existing and 'booked_pnl' not in existing:
+            _split_booked_pnl(batch_size)
+        for index in TradeHistory.__table__.indexes:
+            index.create(bind=db.engine, checkfirst=True)
+        
+        filled = 0
+        while True:
+            rows = TradeHistory.query.filter(TradeHistory.mode.is_(None)).limit(batch_size).all()
+            if not rows: break
+            for r in rows:
+                cols = history_columns(json.loads(r.data))
+                cols['mode'] = cols['mode'] or ''     # Never selected again, even without a mode
+                for k, v in cols.items(): setattr(r, k, v)
+            db.session.commit()
+            filled += len(rows)
+        if filled:
+            print(f"🔧 TradeHistory Migration: Backfilled columns for {filled} rows.")
+    except Exception as e:
+        print(f"❌ TradeHistory Migration Error: {e}")
+        db.session.rollback()
+
+def _split_booked_pnl(batch_size):
+    """
+    Rows written while `pnl` also included partial-exit P/L (those carry `booked_pnl` in their
+    JSON): restore `pnl` to the exit-only value and move the partials into the booked_pnl column.
+    """
+    fixed, last_id = 0, None
+    while True:
+        query = TradeHistory.query.filter(TradeHistory.data.like('%"booked_pnl"%'))
+        if last_id is not None: query = query.filter(TradeHistory.id > last_id)
+        rows = query.order_by(TradeHistory.id).limit(batch_size).all()
+        if not rows: break
+        for r in rows:
+            trade = json.loads(r.data)
+            booked = _num(trade.get('booked_pnl'), float) or 0.0
+            if booked and trade.get('pnl') is not None:
+                trade['pnl'] = round(trade['pnl'] - booked, 2)
+                r.data = json.dumps(trade)
+                fixed += 1
+            for k, v in history_columns(trade).items(): setattr(r, k, v)
+        db.session.commit()
+        last_id = rows[-1].id
+    if fixed:
+        print(f"🔧 TradeHistory Migration: Split partial-exit P/L out of pnl for {fixed} rows.")
+
+def _history_row(trade_id, data, columns):
+    return TradeHistory(id=int(trade_id), data=data, **columns)
+
+def load_history(strict=False, mode=None, exit_date=None):
+    """
+    Loads history records (newest first), optionally filtered in SQL by mode and
+    exit date (YYYY-MM-DD) through the indexed columns.
+    """
     try:
         db.session.commit() # Ensure fresh
-        return [json.loads(r.data) for r in TradeHistory.query.order_by(TradeHistory.id.desc()).all()]
+        query = TradeHistory.query
+        if exit_date: query = query.filter(TradeHistory.exit_date == exit_date)
+        if mode: query = query.filter(TradeHistory.mode == mode)
+        return [json.loads(r.data) for r in query.order_by(TradeHistory.id.desc()).all()]
     except Exception as e:
         print(f"Load History Error: {e}")
+        if strict: raise
         return []
 
+def history_pnl_by_mode(exit_date):
+    """Sum of realized P&L (exit + partial exits) per mode for trades exited on `exit_date` (None on error)."""
+    try:
+        rows = db.session.query(TradeHistory.mode, func.sum(func.coalesce(TradeHistory.pnl, 0) + func.coalesce(TradeHistory.booked_pnl, 0))).filter(TradeHistory.exit_date == exit_date).group_by(TradeHistory.mode).all()
+        return {mode: float(total or 0) for mode, total in rows}
+    except Exception as e:
+        print(f"History PnL Error: {e}")
+        db.session.rollback()
+        return None
+
+def load_history_rows(trade_ids):
+    """Loads the given history records by primary key (incremental sync)."""
+    if not trade_ids: return []
+    try:
+        db.session.commit() # Ensure fresh
+        rows = TradeHistory.query.filter(TradeHistory.id.in_([int(i) for i in trade_ids])).all()
+        return [json.loads(r.data) for r in rows]
+    except Exception as e:
+        print(f"Load History Rows Error: {e}")
+        return []
+
+def history_summary(trade_id):
+    """(mode, exit_date, realized pnl incl. partial exits) of one history record as a dict, or None if missing."""
+    try:
+        row = db.session.query(TradeHistory.mode, TradeHistory.exit_date, TradeHistory.pnl, TradeHistory.booked_pnl).filter(TradeHistory.id == int(trade_id)).first()
+        return {"mode": row.mode, "exit_date": row.exit_date, "pnl": (row.pnl or 0.0) + (row.booked_pnl or 0.0)} if row else None
+    except Exception as e:
+        print(f"History Summary Error: {e}")
+        db.session.rollback()
+        return None
+
 def delete_trade(trade_id):
     from managers.telegram_manager import bot as telegram_bot
     try:
         telegram_bot.delete_trade_messages(trade_id)
         TradeHistory.query.filter_by(id=int(trade_id)).delete()
         db.session.commit()
+        versions.drop('closed', trade_id)
         return True
     except Exception as e:
         print(f"Delete Trade Error: {e}")
@@ -86,12 +240,30 @@ def delete_trade(trade_id):
 
 def save_to_history_db(trade_data):
     try:
-        db.session.merge(TradeHistory(id=trade_data['id'], data=json.dumps(trade_data)))
+        db.session.merge(_history_row(trade_data['id'], json.dumps(trade_data), history_columns(trade_data)))
         db.session.commit()
+        versions.bump('closed', trade_data['id'])
     except Exception as e:
         print(f"Save History DB Error: {e}")
         db.session.rollback()
 
+def write_history_rows(rows):
+    """
+    Merges several history records in a single commit (closed-trade tracker flush).
+    `rows` maps trade_id -> (JSON string, history_columns()). Returns True on success.
+    """
+    if not rows: return True
+    try:
+        for trade_id, (data, columns) in rows.items():
+            db.session.merge(_history_row(trade_id, data, columns))
+        db.session.commit()
+        for trade_id in rows: versions.bump('closed', trade_id)
+        return True
+    except Exception as e:
+        print(f"Write History Rows Error: {e}")
+        db.session.rollback()
+        return False
+
 def cleanup_old_data(days=7):
     """
     Deletes trade history and associated telegram messages older than X days.
@@ -110,8 +282,13 @@ def cleanup_old_data(days=7):
         # 2. Delete from TradeHistory
         deleted_count = TradeHistory.query.filter(TradeHistory.id < threshold_id).delete()
         
+        # 3. Drop undeliverable Telegram outbox messages
+        TelegramOutbox.query.filter(TelegramOutbox.status == 'FAILED', TelegramOutbox.created_at < time.time() - days * 86400).delete()
+        
         db.session.commit()
         if deleted_count > 0:
+            # Bulk removal: one invalidation (pollers get a full reply) instead of a tombstone per row
+            versions.invalidate('closed')
             print(f"🧹 Database Cleanup: Removed {deleted_count} records older than {days} days.")
         return True
     except Exception as e:
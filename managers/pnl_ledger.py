@@ -0,0 +1,97 @@
+import threading
+import pytz
+from datetime import datetime
+from managers import persistence
+from managers.trade_store import store
+
+IST = pytz.timezone('Asia/Kolkata')
+
+def _unrealized(t):
+    if t.get('status') == 'PENDING': return 0.0
+    entry = t.get('entry_price') or 0
+    return (t.get('current_ltp', entry) - entry) * (t.get('quantity') or 0)
+
+class PnlLedger:
+    """
+    Running day P&L per mode, so max-loss and profit-lock checks are O(1):
+      - realized:   booked at exits (move_to_history) and partial exits; seeded once per day
+                    from an SQL sum over today's history
+      - unrealized: per-trade contributions of open positions, adjusted as ticks and
+                    store events change a trade (store listener + tick path)
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._day = None
+        self.realized = {}          # mode -> realized P&L today
+        self.unrealized = {}        # mode -> sum of open position P&L
+        self._open = {}             # trade_id -> (mode, contribution)
+        self._built = False
+
+    def _ensure_day(self):
+        today = datetime.now(IST).strftime("%Y-%m-%d")
+        if self._day == today: return
+        realized = persistence.history_pnl_by_mode(today)
+        if realized is None: return # DB unavailable: retry on the next call
+        # Partial exits of still-open trades are part of today's realized P&L
+        for t in store.all():
+            if t.get('booked_pnl'):
+                realized[t['mode']] = realized.get(t['mode'], 0.0) + t['booked_pnl']
+        with self._lock:
+            if self._day == today: return
+            self.realized = realized
+            self._day = today
+
+    def _ensure_built(self):
+        if self._built: return
+        with store.lock:
+            if self._built: return
+            self._built = True
+            for t in store.all(): self.mark(t)
+
+    # --- STORE LISTENER ---
+    def on_upsert(self, trade):
+        if self._built: self.mark(trade)
+
+    def on_remove(self, trade_id):
+        with self._lock:
+            mode, value = self._open.pop(int(trade_id), (None, 0.0))
+            if mode is not None: self.unrealized[mode] -= value
+
+    def on_clear(self):
+        with self._lock:
+            self._open.clear()
+            self.unrealized.clear()
+
+    # --- UPDATES ---
+    def mark(self, trade):
+        """Refreshes one open trade's unrealized contribution (after a price or quantity change)."""
+        key, mode, value = int(trade['id']), trade['mode'], _unrealized(trade)
+        with self._lock:
+            old_mode, old = self._open.get(key, (mode, 0.0))
+            self.unrealized[old_mode] = self.unrealized.get(old_mode, 0.0) - old
+            self.unrealized[mode] = self.unrealized.get(mode, 0.0) + value
+            self._open[key] = (mode, value)
+
+    def book(self, mode, amount):
+        """Adds realized P&L (exit or partial exit) to today's ledger."""
+        self._ensure_day()
+        with self._lock:
+            self.realized[mode] = self.realized.get(mode, 0.0) + amount
+
+    def unbook(self, mode, amount, exit_date):
+        """Removes a deleted history record's P&L, if it belongs to the day being tracked."""
+        with self._lock:
+            if self._day is None or exit_date != self._day: return # Seeded from SQL later / other day
+            self.realized[mode] = self.realized.get(mode, 0.0) - amount
+
+    # --- READS ---
+    def day_pnl(self, mode):
+        """Realized + unrealized P&L of `mode` today."""
+        self._ensure_day()
+        self._ensure_built()
+        with self._lock:
+            return self.realized.get(mode, 0.0) + self.unrealized.get(mode, 0.0)
+
+# Singleton Instance
+ledger = PnlLedger()
+store.listeners.append(ledger)
@@ -0,0 +1,60 @@
+import time
+import threading
+import config
+
+class PriceCache:
+    """
+    Process-wide last traded prices, keyed by instrument token, with a timestamp per entry.
+    Fed by the gateway tick stream (and by REST quotes as they happen). Exchange-qualified
+    symbols ("NFO:NIFTY24JAN21500CE") are bound to their token once, so a lookup by symbol
+    hits the same streamed entry.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._prices = {}       # token (or unbound symbol) -> (ltp, timestamp)
+        self._tokens = {}       # "EXCH:SYMBOL" -> token
+        self.counters = {"hits": 0, "misses": 0}
+
+    def _key(self, key):
+        return self._tokens.get(key, key) if isinstance(key, str) else int(key)
+
+    def is_bound(self, symbol):
+        return symbol in self._tokens
+
+    def bind(self, symbol, token):
+        """Associates an exchange-qualified symbol with its instrument token."""
+        if not token: return
+        with self._lock:
+            self._tokens[symbol] = int(token)
+            # A REST price cached under the symbol moves over to the token (unless a tick is newer)
+            old = self._prices.pop(symbol, None)
+            if old and old[1] > self._prices.get(int(token), (0, 0))[1]:
+                self._prices[int(token)] = old
+
+    def update_ticks(self, ticks):
+        """Records a batch of gateway ticks (Kite tick dicts)."""
+        now = time.time()
+        with self._lock:
+            for t in ticks:
+                try: self._prices[int(t['instrument_token'])] = (t['last_price'], now)
+                except (KeyError, TypeError, ValueError): continue
+
+    def put(self, key, ltp):
+        """Records a price obtained elsewhere (REST quote) under a token or symbol."""
+        if not ltp: return
+        with self._lock:
+            self._prices[self._key(key)] = (ltp, time.time())
+
+    def get(self, key, max_age=None):
+        """Cached price for a token or symbol, or None when missing or older than `max_age` seconds."""
+        max_age = config.LTP_MAX_AGE if max_age is None else max_age
+        with self._lock:
+            entry = self._prices.get(self._key(key))
+            if entry is None or time.time() - entry[1] > max_age:
+                self.counters["misses"] += 1
+                return None
+            self.counters["hits"] += 1
+            return entry[0]
+
+# Singleton Instance
+price_cache = PriceCache()
@@ -0,0 +1,93 @@
+import time
+import threading
+import config
+
+# Kite accepts at most this many instruments per quote call
+MAX_INSTRUMENTS = 500
+
+class _Slot:
+    """One instrument being fetched; every caller asking for it waits on the same slot."""
+    __slots__ = ('event', 'data', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.data = None
+        self.error = None
+
+class QuoteService:
+    """
+    Singleflight + batching front for kite.quote.
+    Requests arriving within QUOTE_BATCH_WINDOW are merged into one kite.quote([...]) call
+    (chunked at MAX_INSTRUMENTS); concurrent callers asking for the same instrument share
+    one in-flight fetch. The first caller of a window runs that one batch, the others just wait;
+    instruments queued while it was fetching are handed to a follow-up thread, so the leading
+    caller returns as soon as its own batch is in.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight = {}     # "EXCH:SYMBOL" -> _Slot
+        self._queue = []        # Instruments waiting for the next batch
+        self._leader = False
+        self.counters = {"requested": 0, "calls": 0, "instruments": 0}
+
+    def quote(self, kite, instruments):
+        """Drop-in for kite.quote(instruments): returns {instrument: quote} for the instruments found."""
+        if isinstance(instruments, str): instruments = [instruments]
+        slots, lead = {}, False
+        with self._lock:
+            for key in dict.fromkeys(instruments):
+                slot = self._inflight.get(key)
+                if slot is None:
+                    slot = self._inflight[key] = _Slot()
+                    self._queue.append(key)
+                slots[key] = slot
+            self.counters["requested"] += len(slots)
+            if self._queue and not self._leader:
+                self._leader = lead = True
+
+        if lead:
+            self._run(kite)
+
+        result = {}
+        for key, slot in slots.items():
+            if not slot.event.wait(config.QUOTE_TIMEOUT):
+                raise TimeoutError(f"Quote timed out: {key}")
+            if slot.error is not None:
+                raise slot.error
+            if slot.data is not None:
+                result[key] = slot.data
+        return result
+
+    def _run(self, kite):
+        """Leader: fetches the batch queued after the window, then hands over any newer requests."""
+        time.sleep(config.QUOTE_BATCH_WINDOW)
+        with self._lock:
+            batch, self._queue = self._queue, []
+        for i in range(0, len(batch), MAX_INSTRUMENTS):
+            self._fetch(kite, batch[i:i + MAX_INSTRUMENTS])
+        with self._lock:
+            if not self._queue:
+                self._leader = False
+                return
+        # Queued meanwhile: batched by a follow-up leader thread (leadership stays taken)
+        threading.Thread(target=self._run, args=(kite,), daemon=True).start()
+
+    def _fetch(self, kite, keys):
+        data, error = {}, None
+        try:
+            data = kite.quote(keys) or {}
+        except Exception as e:
+            error = e
+        with self._lock:
+            self.counters["calls"] += 1
+            self.counters["instruments"] += len(keys)
+            for key in keys:
+                slot = self._inflight.pop(key)
+                slot.data, slot.error = data.get(key), error
+                slot.event.set()
+
+    def stats(self):
+        return dict(self.counters)
+
+# Singleton Instance
+quotes = QuoteService()
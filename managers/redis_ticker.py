@@ -2,12 +2,19 @@ import redis
 import json
 import threading
 import os
+import time
 import logging
+from managers.tick_queue import TickQueue
+from managers.price_cache import price_cache
 
 class RedisTicker:
     """
     Connects to the Railway Gateway (Redis) to get market data.
     """
+    # KiteTicker-compatible mode constants (the Gateway streams full ticks regardless)
+    MODE_FULL = "full"
+    MODE_QUOTE = "quote"
+    MODE_LTP = "ltp"
     def __init__(self, api_key=None, access_token=None, debug=False, root=None):
         # We read the REDIS_URL from Railway variables
         self.redis_url = os.getenv("REDIS_URL")
@@ -26,6 +33,30 @@ class RedisTicker:
         
         self._stop_event = threading.Event()
         self.is_connected_flag = False
+        
+        # --- CONFLATION (optional) ---
+        # Keeps only the latest tick per token between processing cycles and delivers
+        # merged batches at most `max_rate` times per second, so risk checks never
+        # work through a backlog of stale prices.
+        self.conflate = os.getenv("TICK_CONFLATE", "0") == "1"
+        self.max_rate = float(os.getenv("TICK_MAX_RATE", 10))
+        self._latest = {}                 # instrument_token -> latest tick
+        self._latest_lock = threading.Lock()
+        self._has_ticks = threading.Event()
+        self.counters = {"received": 0, "conflated": 0, "delivered": 0}
+        
+        # --- BOUNDED TICK QUEUE (when not conflating) ---
+        # Decouples the Redis listener from the risk processor; TICK_QUEUE_SIZE=0 processes inline.
+        queue_size = int(os.getenv("TICK_QUEUE_SIZE", 1000))
+        self.queue = None
+        self._batch_degraded = False      # Degraded flag of the batch currently in on_ticks
+        if not self.conflate and queue_size > 0:
+            self.queue = TickQueue(queue_size, os.getenv("TICK_QUEUE_POLICY", "conflate"))
+
+    @property
+    def degraded(self):
+        """True while the batch being processed came from a saturated queue (risk processor should shed non-critical work)."""
+        return self._batch_degraded
 
     def connect(self, threaded=True):
         self.is_connected_flag = True
@@ -33,6 +64,11 @@ class RedisTicker:
         if self.on_connect:
             self.on_connect(self, {"status": "Connected via Gateway"})
             
+        if self.conflate:
+            threading.Thread(target=self._deliver_loop, daemon=True).start()
+        elif self.queue:
+            threading.Thread(target=self._process_loop, daemon=True).start()
+            
         if threaded:
             t = threading.Thread(target=self._loop, daemon=True)
             t.start()
@@ -57,8 +93,18 @@ class RedisTicker:
                         # Ensure it's a list (Standard Kite format)
                         ticks = [data] if isinstance(data, dict) else data
                         
-                        if self.on_ticks:
-                            self.on_ticks(self, ticks)
+                        # Shared LTP cache sees every tick (before conflation / queueing)
+                        price_cache.update_ticks(ticks)
+                        
+                        if self.conflate:
+                            self._merge(ticks)
+                        elif self.queue:
+                            self.queue.put(ticks)
+                        else:
+                            self.counters["received"] += len(ticks)
+                            if self.on_ticks:
+                                self.on_ticks(self, ticks)
+                                self.counters["delivered"] += len(ticks)
                     except Exception:
                         pass
         except Exception as e:
@@ -66,6 +112,63 @@ class RedisTicker:
                 self.on_error(self, code=500, reason=str(e))
             self.is_connected_flag = False
 
+    def _merge(self, ticks):
+        """Conflates incoming ticks into the latest-per-token buffer."""
+        with self._latest_lock:
+            self.counters["received"] += len(ticks)
+            for tick in ticks:
+                token = tick.get('instrument_token')
+                if token in self._latest:
+                    self.counters["conflated"] += 1
+                self._latest[token] = tick
+        self._has_ticks.set()
+
+    def _deliver_loop(self):
+        """Delivers the conflated buffer as one batch, at most `max_rate` times per second."""
+        min_gap = 1.0 / self.max_rate if self.max_rate > 0 else 0
+        while not self._stop_event.is_set():
+            self._has_ticks.wait()
+            started = time.time()
+            with self._latest_lock:
+                ticks = list(self._latest.values())
+                self._latest = {}
+                self._has_ticks.clear()
+            
+            if ticks and self.on_ticks:
+                try:
+                    self.on_ticks(self, ticks)
+                except Exception as e:
+                    print(f"❌ Tick Delivery Error: {e}")
+                self.counters["delivered"] += len(ticks)
+            
+            # Ticks arriving meanwhile keep conflating until the next cycle
+            elapsed = time.time() - started
+            if elapsed < min_gap:
+                time.sleep(min_gap - elapsed)
+
+    def _process_loop(self):
+        """Risk processor: consumes the bounded tick queue and runs `on_ticks`."""
+        while not self._stop_event.is_set():
+            ticks, self._batch_degraded = self.queue.get(timeout=1.0)
+            if not ticks: continue
+            try:
+                if self.on_ticks: self.on_ticks(self, ticks)
+            except Exception as e:
+                print(f"❌ Tick Processing Error: {e}")
+            finally:
+                self._batch_degraded = False
+                self.queue.task_done()
+            self.counters["delivered"] += len(ticks)
+
+    def stats(self):
+        """Tick counters (received / conflated / delivered), conflation backlog and queue metrics."""
+        with self._latest_lock:
+            stats = {**self.counters, "conflate": self.conflate, "buffered": len(self._latest)}
+        if self.queue:
+            stats["queue"] = self.queue.stats()
+            stats["received"] = self.queue.counters["received"]
+        return stats
+
     def subscribe(self, instrument_tokens):
         """
         Tells the Gateway to start watching these tokens.
@@ -79,6 +182,19 @@ class RedisTicker:
         self.r.publish('gateway_commands', payload)
         print(f"📤 Sent Subscribe Request: {len(instrument_tokens)} tokens")
 
+    def unsubscribe(self, instrument_tokens):
+        """
+        Tells the Gateway to stop watching these tokens.
+        """
+        if not instrument_tokens: return
+        
+        payload = json.dumps({
+            "action": "UNSUBSCRIBE", 
+            "tokens": list(instrument_tokens)
+        })
+        self.r.publish('gateway_commands', payload)
+        print(f"📤 Sent Unsubscribe Request: {len(instrument_tokens)} tokens")
+
     def set_mode(self, mode, instrument_tokens):
         # Gateway handles mode automatically
         pass
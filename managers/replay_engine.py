@@ -3,8 +3,11 @@ import time
 import smart_trader
 import settings
 from managers.common import IST, log_event, get_time_str
-from managers.persistence import load_trades, save_trades, load_history
+from managers.persistence import load_history_rows
+from managers.trade_store import store
 from managers.broker_ops import move_to_history
+from managers.trigger_index import TriggerIndex
+from managers.quote_service import quotes
 
 # Helper to ensure exchange is resolved correctly
 def get_exchange(symbol):
@@ -25,7 +28,7 @@ def import_past_trade(kite, symbol, entry_dt_str, qty, entry_price, sl_price, ta
             return {"status": "error", "message": f"Date Parse Error: {e}"}
 
         try:
-            s_cfg = settings.load_settings()
+            s_cfg = settings.get_settings()
             exit_time_conf = s_cfg['modes']['PAPER'].get('universal_exit_time', "15:25")
             exit_H, exit_M = map(int, exit_time_conf.split(':'))
         except: exit_H, exit_M = 15, 25
@@ -44,6 +47,10 @@ def import_past_trade(kite, symbol, entry_dt_str, qty, entry_price, sl_price, ta
         
         first_open = hist_data[0]['open']
         trigger_dir = "ABOVE" if first_open < entry_price else "BELOW"
+        
+        # Same activation semantics as the live tick path (sorted trigger levels)
+        triggers = TriggerIndex()
+        triggers.add(0, token, trigger_dir, entry_price)
 
         status = "PENDING"
         final_status = "PENDING" # Default for DB
@@ -101,10 +108,8 @@ def import_past_trade(kite, symbol, entry_dt_str, qty, entry_price, sl_price, ta
             for ltp in ticks:
                 # Activation
                 if status == "PENDING":
-                    activated = False
-                    if trigger_dir == "ABOVE" and ltp >= entry_price: activated = True
-                    elif trigger_dir == "BELOW" and ltp <= entry_price: activated = True
-                    if activated:
+                    if triggers.triggered(token, ltp):
+                        triggers.discard(0)
                         # Sync final_status immediately so DB knows it's OPEN
                         status = "OPEN"; final_status = "OPEN"; 
                         fill_price = entry_price; highest_ltp = max(fill_price, ltp)
@@ -237,13 +242,13 @@ def import_past_trade(kite, symbol, entry_dt_str, qty, entry_price, sl_price, ta
         # Use final_status here
         if final_status in ["OPEN", "PENDING"]:
             try: 
-                q = kite.quote(f"{exchange}:{symbol}")
+                q = quotes.quote(kite, f"{exchange}:{symbol}")
                 current_ltp = q[f"{exchange}:{symbol}"]['last_price']
             except: 
                 if hist_data: current_ltp = hist_data[-1]['close']
             
             record = {
-                "id": int(time.time()), 
+                "id": store.next_id(time.time()), 
                 "instrument_token": token,
                 "entry_time": entry_time.strftime("%Y-%m-%d %H:%M:%S"), 
                 "symbol": symbol, "exchange": exchange, "mode": "PAPER", 
@@ -260,7 +265,9 @@ def import_past_trade(kite, symbol, entry_dt_str, qty, entry_price, sl_price, ta
                 "is_replay": True, "last_update_time": hist_data[-1]['date'] if hist_data else get_time_str(),
                 "target_channels": target_channels 
             }
-            trades = load_trades(); trades.append(record); save_trades(trades)
+            with store.lock:
+                store.add(record)
+                store.commit(critical=True)
             
             # FORCE Subscription Update
             try:
@@ -282,7 +289,7 @@ def import_past_trade(kite, symbol, entry_dt_str, qty, entry_price, sl_price, ta
                 logs.append(f"[{last_time}] Closed: {final_status} @ {final_exit_price} | P/L ₹ {realized_pnl:.2f}")
 
             record = {
-                "id": int(time.time()), 
+                "id": store.next_id(time.time()), 
                 "instrument_token": token,
                 "entry_time": entry_time.strftime("%Y-%m-%d %H:%M:%S"), 
                 "symbol": symbol, "exchange": exchange, "mode": "PAPER", 
@@ -316,8 +323,8 @@ def simulate_trade_scenario(kite, trade_id, scenario_config):
     Does NOT affect the database or send notifications.
     """
     try:
-        trades = load_history()
-        original_trade = next((t for t in trades if str(t['id']) == str(trade_id)), None)
+        trades = load_history_rows([trade_id]) if str(trade_id).isdigit() else []
+        original_trade = trades[0] if trades else None
         if not original_trade: return {"status": "error", "message": "Trade not found"}
 
         symbol = original_trade['symbol']
@@ -1,15 +1,22 @@
-import json
 import time
 import threading
 from kiteconnect import KiteTicker
 import smart_trader
 import settings
 from datetime import datetime
-from database import db, TradeHistory
-from managers.persistence import load_trades, save_trades, load_history, get_risk_state, save_risk_state
+from managers.persistence import load_history, load_history_rows, get_risk_state, save_risk_state
+from managers.trade_store import store, closed_today
 from managers.common import IST, log_event
-from managers.broker_ops import manage_broker_sl, move_to_history
+from managers.broker_ops import move_to_history, book_partial_exit
+from managers.pnl_ledger import ledger
 from managers.telegram_manager import bot as telegram_bot
+from managers.order_dispatcher import dispatcher
+from managers import vector_risk
+from managers.trigger_index import PendingTriggerBook
+from managers.level_index import RiskLevelIndex
+from managers.subscriptions import subscriptions
+from managers.live_feed import live_feed
+from managers.index_feed import index_feed
 from managers.redis_ticker import RedisTicker  # <--- Add this at the top
 
 # --- GLOBAL OBJECTS FOR WEBSOCKET ---
@@ -18,8 +25,15 @@ kite_client = None  # Reference to KiteConnect instance for placing orders
 flask_app = None    # Reference to Flask App for DB Context
 socket_io_server = None # Reference to SocketIO Server for emitting events
 
-# Global timer for periodic subscription checks (Self-Healing)
-last_sub_check = 0
+# Pre-screen indexes, maintained only when the NumPy vector book is off (it covers both):
+#   - sorted trigger levels of PENDING orders (activation lookup per tick is O(log n + k))
+#   - per-token SL / target / trailing / high heaps of open positions (only crossed levels are visited)
+pending_triggers = risk_levels = None
+if not vector_risk.book:
+    pending_triggers = PendingTriggerBook(store.all)
+    store.listeners.append(pending_triggers)
+    risk_levels = RiskLevelIndex(store.all)
+    store.listeners.append(risk_levels)
 
 # --- REPORTING FUNCTIONS ---
 
@@ -31,10 +45,8 @@ def send_eod_report(mode):
     """
     try:
         today_str = datetime.now(IST).strftime("%Y-%m-%d")
-        history = load_history()
-        
-        # Filter for Today's trades in the specific Mode (LIVE/PAPER)
-        todays_trades = [t for t in history if t.get('exit_time') and t['exit_time'].startswith(today_str) and t['mode'] == mode]
+        # Today's trades in the specific Mode (LIVE/PAPER), filtered in SQL
+        todays_trades = load_history(mode=mode, exit_date=today_str)
         
         if not todays_trades:
             return
@@ -139,8 +151,7 @@ def send_eod_report(mode):
 def send_manual_trade_status(mode):
     try:
         today_str = datetime.now(IST).strftime("%Y-%m-%d")
-        history = load_history()
-        todays_trades = [t for t in history if t.get('exit_time') and t['exit_time'].startswith(today_str) and t['mode'] == mode]
+        todays_trades = load_history(mode=mode, exit_date=today_str)
         
         if not todays_trades:
             return {"status": "error", "message": "No trades found for today."}
@@ -206,10 +217,10 @@ def send_manual_trade_status(mode):
 
 def send_manual_trade_report(trade_id):
     try:
-        history = load_history()
-        trade = next((t for t in history if str(t['id']) == str(trade_id)), None)
+        history = load_history_rows([trade_id]) if str(trade_id).isdigit() else []
+        trade = history[0] if history else None
         if not trade:
-            active = load_trades()
+            active = store.snapshot()
             trade = next((t for t in active if str(t['id']) == str(trade_id)), None)
             
         if not trade:
@@ -269,8 +280,7 @@ def send_manual_trade_report(trade_id):
 def send_manual_summary(mode):
     try:
         today_str = datetime.now(IST).strftime("%Y-%m-%d")
-        history = load_history()
-        todays_trades = [t for t in history if t.get('exit_time') and t['exit_time'].startswith(today_str) and t['mode'] == mode]
+        todays_trades = load_history(mode=mode, exit_date=today_str)
         
         if not todays_trades:
             return {"status": "error", "message": "No trades found for today."}
@@ -325,67 +335,60 @@ def send_manual_summary(mode):
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
-def check_global_exit_conditions(kite, mode, mode_settings):
+def _square_off_mode(kite, mode, exit_reason_fn):
     """
-    Checks and executes global risk rules:
-    1. Universal Square-off Time (e.g., 15:25)
-    2. Profit Locking (Global PnL Trailing)
+    Closes every active trade of `mode` (broker square-off for LIVE) and removes it from the store.
+    `exit_reason_fn(trade)` returns the (exit_reason, exit_price) pair for each trade.
+    """
+    with store.lock:
+        active_mode = [t for t in store.all() if t['mode'] == mode]
+        for t in active_mode:
+            exit_reason, exit_price = exit_reason_fn(t)
+            
+            if t['mode'] == "LIVE" and t['status'] != 'PENDING':
+                # SL cancel + Sell placed by the order dispatcher (no broker round trip under the store lock)
+                dispatcher.submit(kite, t, 'FULL_EXIT', qty=t['quantity'])
+            
+            move_to_history(t, exit_reason, exit_price)
+            store.remove(t['id'])
+        
+        if active_mode:
+            store.commit(critical=True)
+        return active_mode
+
+def run_time_exit(kite, mode):
     """
-    trades = load_trades()
-    now = datetime.now(IST)
-    exit_time_str = mode_settings.get('universal_exit_time', "15:25")
-    today_str = now.strftime("%Y-%m-%d")
+    Universal square-off of `mode` (fired by the scheduler at universal_exit_time).
+    Runs at most once per day; sends the EOD report. Returns True once done for today.
+    """
+    today_str = datetime.now(IST).strftime("%Y-%m-%d")
     state = get_risk_state(mode)
+    if state.get('last_eod_date') == today_str: return True
     
-    # --- 1. TIME BASED EXIT ---
-    try:
-        exit_dt = datetime.strptime(exit_time_str, "%H:%M").replace(year=now.year, month=now.month, day=now.day)
-        exit_dt = IST.localize(exit_dt.replace(tzinfo=None))
-        
-        if now >= exit_dt and (now - exit_dt).seconds < 120:
-             if state.get('last_eod_date') != today_str:
-                 active_mode = [t for t in trades if t['mode'] == mode]
-                 if active_mode:
-                     for t in active_mode:
-                         exit_reason = "TIME_EXIT"
-                         exit_price = t.get('current_ltp', 0)
-                         
-                         if t['status'] == 'PENDING':
-                             exit_reason = "NOT_ACTIVE"
-                             exit_price = t['entry_price']
-                         
-                         if t['mode'] == "LIVE" and t['status'] != 'PENDING':
-                            manage_broker_sl(kite, t, cancel_completely=True)
-                            try: 
-                                kite.place_order(variety=kite.VARIETY_REGULAR, tradingsymbol=t['symbol'], exchange=t['exchange'], transaction_type=kite.TRANSACTION_TYPE_SELL, quantity=t['quantity'], order_type=kite.ORDER_TYPE_MARKET, product=kite.PRODUCT_MIS)
-                            except: pass
-                         
-                         move_to_history(t, exit_reason, exit_price)
-                     
-                     remaining = [t for t in trades if t['mode'] != mode]
-                     save_trades(remaining)
-                 
-                 send_eod_report(mode)
-                 state['last_eod_date'] = today_str
-                 save_risk_state(mode, state)
-                 return
-    except Exception as e: 
-        print(f"Time Check Error: {e}")
-
-    # --- 2. PROFIT LOCKING ---
+    def time_exit(t):
+        if t['status'] == 'PENDING':
+            return "NOT_ACTIVE", t['entry_price']
+        return "TIME_EXIT", t.get('current_ltp', 0)
+    
+    _square_off_mode(kite, mode, time_exit)
+    
+    send_eod_report(mode)
+    state['last_eod_date'] = today_str
+    save_risk_state(mode, state)
+    return True
+
+def check_global_exit_conditions(kite, mode, mode_settings):
+    """
+    Checks and executes global risk rules:
+    - Profit Locking (Global PnL Trailing)
+    The universal square-off time is a scheduler timer (run_time_exit), not polled here.
+    """
+    # --- PROFIT LOCKING ---
     pnl_start = float(mode_settings.get('profit_lock', 0))
     if pnl_start > 0:
-        current_total_pnl = 0.0
-        today_str = datetime.now(IST).strftime("%Y-%m-%d")
-        history = load_history()
-        for t in history:
-            if t.get('exit_time') and t['exit_time'].startswith(today_str) and t['mode'] == mode: 
-                current_total_pnl += t.get('pnl', 0)
-        
-        active = [t for t in trades if t['mode'] == mode]
-        for t in active:
-            if t['status'] != 'PENDING':
-                current_total_pnl += (t.get('current_ltp', t['entry_price']) - t['entry_price']) * t['quantity']
+        state = get_risk_state(mode)
+        # Running ledger: realized (exits, partials) + unrealized (ticks), O(1)
+        current_total_pnl = ledger.day_pnl(mode)
 
         if not state.get('active') and current_total_pnl >= pnl_start:
             state['active'] = True
@@ -404,107 +407,94 @@ def check_global_exit_conditions(kite, mode, mode_settings):
                      save_risk_state(mode, state)
 
             if current_total_pnl <= state['global_sl']:
-                active_mode = [t for t in trades if t['mode'] == mode]
-                for t in active_mode:
-                     if t['mode'] == "LIVE" and t['status'] != 'PENDING':
-                        manage_broker_sl(kite, t, cancel_completely=True)
-                        try: 
-                            kite.place_order(variety=kite.VARIETY_REGULAR, tradingsymbol=t['symbol'], exchange=t['exchange'], transaction_type=kite.TRANSACTION_TYPE_SELL, quantity=t['quantity'], order_type=kite.ORDER_TYPE_MARKET, product=kite.PRODUCT_MIS)
-                        except: pass
-                     
-                     move_to_history(t, "PROFIT_LOCK", t.get('current_ltp', 0))
-                
-                remaining = [t for t in trades if t['mode'] != mode]
-                save_trades(remaining)
+                _square_off_mode(kite, mode, lambda t: ("PROFIT_LOCK", t.get('current_ltp', 0)))
                 state['active'] = False
                 save_risk_state(mode, state)
 
 # --- WEB SOCKET LOGIC ---
 
+def _risk_fingerprint(t):
+    """Fields whose change is a critical transition (activation, SL move, partial exit, target hit)."""
+    return (t['status'], t['sl'], t['quantity'], len(t.get('targets_hit_indices', [])))
+
+def _sl_distance(t, ltp):
+    """Relative distance to the next risk level (SL for open trades, entry trigger for pending)."""
+    level = t['entry_price'] if t['status'] == 'PENDING' else t['sl']
+    return abs(ltp - level) / ltp if ltp else 0
+
 def on_ticks(ws, ticks):
     """
     Triggered whenever a price update is received from Zerodha.
     Handles Active Trades and Closed Trades (Virtual SL & Monitoring).
     """
-    global kite_client, flask_app, socket_io_server, last_sub_check
+    global kite_client, flask_app, socket_io_server
     
     if not flask_app: return
 
-    # --- 0. AUTO-RESUBSCRIBE CHECK (Every 5 Seconds) ---
-    # This ensures newly closed trades (like Replay or Live SL Hit) are watched.
-    if time.time() - last_sub_check > 5:
-        subscribe_active_trades(ws)
-        last_sub_check = time.time()
+    # Subscriptions are diffed and published by update_subscriptions() (background monitor)
 
     # Use App Context for DB operations inside this thread
-    with flask_app.app_context():
-        active_trades = load_trades()
+    with flask_app.app_context(), store.lock:
+        # Map Ticks: {instrument_token: last_price}
+        tick_map = {int(t['instrument_token']): t['last_price'] for t in ticks}
         
-        # Load Today's Closed Trades for Virtual Tracking
-        history = load_history()
-        today_str = datetime.now(IST).strftime("%Y-%m-%d")
-        todays_closed = [t for t in history if t.get('exit_time') and t['exit_time'].startswith(today_str)]
+        # Index ticker (cached for /api/sync, pushed to dashboards by the broadcaster)
+        index_feed.on_ticks(tick_map)
+        
+        # Token-indexed dispatch: only the trades subscribed to this batch's tokens
+        active_trades = store.for_tokens(tick_map)
+        
+        # Today's Closed Trades for Virtual Tracking (maintained in memory, no history query)
+        todays_closed = closed_today.for_tokens(tick_map)
+        
+        # Saturated tick queue: evaluate trades closest to their SL first, skip virtual tracking
+        degraded = getattr(ws, 'degraded', False)
+        if degraded:
+            active_trades.sort(key=lambda t: _sl_distance(t, tick_map[int(t['instrument_token'])]))
+            todays_closed = []
         
         if not active_trades and not todays_closed: return
-
-        # Map Ticks: {instrument_token: last_price}
-        tick_map = {t['instrument_token']: t['last_price'] for t in ticks}
         
-        active_list = []
         updated = False
         
+        # Pre-screen: only trades that crossed a threshold run the handlers below, and the
+        # pending orders activated by this batch (vectorized book when enabled, else the
+        # sorted trigger index + per-token level heaps)
+        if vector_risk.book:
+            flagged = vector_risk.book.evaluate(tick_map)
+            activated = {t['id'] for t in active_trades if t['status'] == 'PENDING' and t['id'] in flagged}
+        else:
+            activated = pending_triggers.triggered_ids(tick_map)
+            flagged = activated | risk_levels.crossed_ids(tick_map)
+        before = {t['id']: (t.get('current_ltp'), t.get('highest_ltp'), _risk_fingerprint(t))
+                  for t in active_trades if t['id'] in flagged}
+        
         # --- 1. PROCESS ACTIVE TRADES ---
         for t in active_trades:
-            token = t.get('instrument_token')
-            if token: token = int(token) # Force INT to match tick_map keys
-            
-            # If no update for this trade, keep as is
-            if not token or token not in tick_map:
-                active_list.append(t)
-                continue
-                
-            ltp = tick_map[token]
+            ltp = tick_map[int(t['instrument_token'])]
             
             # Update internal LTP
             if t.get('current_ltp') != ltp:
                 t['current_ltp'] = ltp
                 updated = True
+                if t['id'] not in before:
+                    store.touch(t, risk=False)
+                    ledger.mark(t) # Unrealized P/L (price-only updates skip the store listeners)
+            
+            # No threshold crossed: price update only
+            if t['id'] not in before: continue
             
             # A. PENDING ORDERS (Activation)
             if t['status'] == "PENDING":
-                condition_met = False
-                if t.get('trigger_dir') == 'BELOW':
-                    if ltp <= t['entry_price']: condition_met = True
-                elif t.get('trigger_dir') == 'ABOVE':
-                    if ltp >= t['entry_price']: condition_met = True
-                
-                if condition_met:
+                if t['id'] in activated:
                     t['status'] = "OPEN"
                     t['highest_ltp'] = t['entry_price']
                     log_event(t, f"Order ACTIVATED @ {ltp}")
                     telegram_bot.notify_trade_event(t, "ACTIVE", ltp)
                     
                     if t['mode'] == 'LIVE' and kite_client:
-                        try:
-                            kite_client.place_order(
-                                variety=kite_client.VARIETY_REGULAR, tradingsymbol=t['symbol'], exchange=t['exchange'],
-                                transaction_type=kite_client.TRANSACTION_TYPE_BUY, quantity=t['quantity'],
-                                order_type=kite_client.ORDER_TYPE_MARKET, product=kite_client.PRODUCT_MIS, tag="RD_ENTRY"
-                            )
-                            # Place Broker SL
-                            sl_id = kite_client.place_order(
-                                variety=kite_client.VARIETY_REGULAR, tradingsymbol=t['symbol'], exchange=t['exchange'],
-                                transaction_type=kite_client.TRANSACTION_TYPE_SELL, quantity=t['quantity'],
-                                order_type=kite_client.ORDER_TYPE_SL_M, product=kite_client.PRODUCT_MIS,
-                                trigger_price=t['sl'], tag="RD_SL"
-                            )
-                            t['sl_order_id'] = sl_id
-                        except Exception as e:
-                            log_event(t, f"Broker Fail (Active): {e}")
-
-                    active_list.append(t)
-                else:
-                    active_list.append(t)
+                        # Entry + Broker SL placed off the tick thread; sl_order_id is written back
+                        dispatcher.submit(kite_client, t, 'ENTRY', qty=t['quantity'], sl=t['sl'])
                 continue
 
             # B. ACTIVE ORDERS
@@ -541,9 +531,8 @@ def on_ticks(ws, ticks):
                         
                         if new_sl > t['sl']:
                             t['sl'] = new_sl
-                            if t['mode'] == 'LIVE' and t.get('sl_order_id') and kite_client:
-                                try: kite_client.modify_order(variety=kite_client.VARIETY_REGULAR, order_id=t['sl_order_id'], trigger_price=new_sl)
-                                except: pass
+                            if t['mode'] == 'LIVE' and kite_client:
+                                dispatcher.submit(kite_client, t, 'MODIFY_SL', trigger_price=new_sl)
                             log_event(t, f"Step Trailing: SL Moved to {t['sl']:.2f}")
 
                 exit_triggered = False
@@ -567,9 +556,8 @@ def on_ticks(ws, ticks):
                             if conf.get('trail_to_entry') and t['sl'] < t['entry_price']:
                                 t['sl'] = t['entry_price']
                                 log_event(t, f"Target {i+1} Hit: SL Trailed to Entry")
-                                if t['mode'] == 'LIVE' and t.get('sl_order_id') and kite_client:
-                                    try: kite_client.modify_order(variety=kite_client.VARIETY_REGULAR, order_id=t['sl_order_id'], trigger_price=t['sl'])
-                                    except: pass
+                                if t['mode'] == 'LIVE' and kite_client:
+                                    dispatcher.submit(kite_client, t, 'MODIFY_SL', trigger_price=t['sl'])
                             
                             if not conf['enabled']: continue
                             
@@ -581,18 +569,16 @@ def on_ticks(ws, ticks):
                                 exit_reason = "TARGET_HIT"
                                 break
                             elif qty_to_exit > 0:
-                                if t['mode'] == 'LIVE' and kite_client: manage_broker_sl(kite_client, t, qty_to_exit)
+                                if t['mode'] == 'LIVE' and kite_client:
+                                    dispatcher.submit(kite_client, t, 'PARTIAL_EXIT', qty=qty_to_exit, remaining=t['quantity'] - qty_to_exit)
+                                book_partial_exit(t, qty_to_exit, tgt)
                                 t['quantity'] -= qty_to_exit
                                 log_event(t, f"Target {i+1} Hit. Exited {qty_to_exit}")
-                                if t['mode'] == 'LIVE' and kite_client:
-                                    try: kite_client.place_order(variety=kite_client.VARIETY_REGULAR, tradingsymbol=t['symbol'], exchange=t['exchange'], transaction_type=kite_client.TRANSACTION_TYPE_SELL, quantity=qty_to_exit, order_type=kite.ORDER_TYPE_MARKET, product=kite.PRODUCT_MIS)
-                                    except: pass
 
                 if exit_triggered:
                     if t['mode'] == "LIVE" and kite_client:
-                        manage_broker_sl(kite_client, t, cancel_completely=True)
-                        try: kite_client.place_order(variety=kite_client.VARIETY_REGULAR, tradingsymbol=t['symbol'], exchange=t['exchange'], transaction_type=kite.TRANSACTION_TYPE_SELL, quantity=t['quantity'], order_type=kite.ORDER_TYPE_MARKET, product=kite.PRODUCT_MIS)
-                        except: pass
+                        # Cancels the Broker SL, then places the market exit (same worker, in order)
+                        dispatcher.submit(kite_client, t, 'FULL_EXIT', qty=t['quantity'])
                     
                     final_price = t['sl'] if exit_reason=="SL_HIT" else (t['targets'][-1] if exit_reason=="TARGET_HIT" else ltp)
                     if exit_reason == "SL_HIT":
@@ -600,31 +586,38 @@ def on_ticks(ws, ticks):
                         telegram_bot.notify_trade_event(t, "SL_HIT", (final_price - t['entry_price']) * t['quantity'])
                     
                     move_to_history(t, exit_reason, final_price)
-                else:
-                    active_list.append(t)
+                    store.remove(t['id'])
+                    updated = True
+        
+        # Dirty tracking: only trades that changed are written; risk transitions flush now
+        critical = False
+        for t in active_trades:
+            if t['id'] not in before: continue # Price-only update, already recorded
+            if store.get(t['id']) is not t:
+                critical = True # Exited (removal already recorded)
+                continue
+            if risk_levels is not None: risk_levels.on_upsert(t) # Its crossed levels were popped: re-index
+            ltp_0, high_0, risk_0 = before[t['id']]
+            if risk_0 != _risk_fingerprint(t):
+                store.touch(t)
+                critical = True
+            elif ltp_0 != t.get('current_ltp') or high_0 != t.get('highest_ltp'):
+                store.touch(t)
+        
+        if updated or critical:
+            store.commit(critical)
         
         if updated:
-            save_trades(active_list)
-            # Emit real-time update to Frontend for Active Trades
-            if socket_io_server:
-                try:
-                    socket_io_server.emit('trade_update', active_list)
-                except Exception as e:
-                    print(f"Socket Emit Error: {e}")
+            # Broadcaster sends compact field diffs at its own frame rate (exits/edits arrive via the store listener)
+            live_feed.mark_positions(active_trades)
 
         # --- 2. PROCESS CLOSED TRADES (Modified for Live LTP & Virtual SL) ---
-        history_updated = False
+        history_changes = []
         live_closed_updates = []  # List to store live updates for frontend
 
         try:
             for t in todays_closed:
-                token = t.get('instrument_token')
-                if not token: continue
-                token = int(token) # Force INT casting
-                
-                if token not in tick_map: continue
-                
-                ltp = tick_map[token]
+                ltp = tick_map[int(t['instrument_token'])]
                 t['current_ltp'] = ltp
                 
                 # Always add to update list so Frontend gets the live price
@@ -642,8 +635,7 @@ def on_ticks(ws, ticks):
                     
                     if is_dead:
                         t['virtual_sl_hit'] = True
-                        db.session.merge(TradeHistory(id=t['id'], data=json.dumps(t)))
-                        history_updated = True
+                        history_changes.append(t)
                         continue # Skip High Check if just died
 
                     # Check High Made
@@ -652,54 +644,40 @@ def on_ticks(ws, ticks):
                         t['made_high'] = ltp
                         try: telegram_bot.notify_trade_event(t, "HIGH_MADE", ltp)
                         except: pass
-                        db.session.merge(TradeHistory(id=t['id'], data=json.dumps(t)))
-                        history_updated = True
+                        history_changes.append(t)
                     
         except Exception as e:
             print(f"Error in History Tracker: {e}")
         
-        if history_updated:
-            db.session.commit()
+        if history_changes:
+            for t in history_changes: closed_today.touch(t)
+            closed_today.writer.request_flush()
 
-        # Emit Real-Time Closed Trade Updates to Frontend
-        if socket_io_server and live_closed_updates:
-            try:
-                socket_io_server.emit('closed_trade_update', live_closed_updates)
-            except Exception as e:
-                print(f"Socket Emit Error (Closed): {e}")
+        # Real-Time Closed Trade Updates to Frontend (live LTP / made_high diffs)
+        if live_closed_updates:
+            live_feed.mark_closed(live_closed_updates)
 
 def on_connect(ws, response):
     print("✅ WebSocket Connected! Resubscribing...")
-    subscribe_active_trades(ws)
+    subscribe_active_trades(ws, full=True)
 
 def on_close(ws, code, reason):
     print(f"⚠️ WebSocket Closed: {code} - {reason}")
 
-def subscribe_active_trades(ws):
+def subscribe_active_trades(ws, full=False):
+    """
+    Publishes subscription changes: active trades + today's closed trades (until virtual SL hit).
+    Only adds/removes since the last call are sent, unless full=True (reconnect).
+    """
     with flask_app.app_context():
-        # Get Active Trade Tokens
-        trades = load_trades()
-        active_tokens = [int(t['instrument_token']) for t in trades if t.get('instrument_token')]
-        
-        # Get Closed Trade Tokens (for Today) to track Missed Opportunities
-        history = load_history()
-        today_str = datetime.now(IST).strftime("%Y-%m-%d")
-        closed_tokens = [int(t['instrument_token']) for t in history 
-                         if t.get('exit_time') and t['exit_time'].startswith(today_str) and t.get('instrument_token')]
-        
-        # Combine unique tokens
-        all_tokens = list(set(active_tokens + closed_tokens))
-        
-        if all_tokens:
-            ws.subscribe(all_tokens)
-            ws.set_mode(ws.MODE_FULL, all_tokens)
-            # print(f"📡 Subscribed to {len(all_tokens)} tokens (Active + Closed).") # Reduced spam
+        subscriptions.sync(ws, full=full)
 
 def start_ticker(api_key, access_token, kite_inst, app_inst, socket_inst=None):
     global kws, kite_client, flask_app, socket_io_server
     kite_client = kite_inst
     flask_app = app_inst
     socket_io_server = socket_inst
+    live_feed.attach(socket_inst)
 
     # ALWAYS use RedisTicker for this Paper Trading System
     print("🔗 Connecting to Market Data Gateway...")
@@ -716,7 +694,7 @@ def start_ticker(api_key, access_token, kite_inst, app_inst, socket_inst=None):
 
 def update_subscriptions():
     """
-    Call this function whenever a NEW trade is added to dynamically subscribe.
+    Call this function whenever trades are added/closed to publish the subscription diff.
     """
     if kws and kws.is_connected():
         subscribe_active_trades(kws)
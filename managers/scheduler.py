@@ -0,0 +1,159 @@
+import heapq
+import itertools
+import threading
+import time
+import pytz
+from datetime import datetime, timedelta
+from database import db
+
+IST = pytz.timezone('Asia/Kolkata')
+
+class _Job:
+    def __init__(self, name, fn, interval=None, at=None, grace=0, retry=None, background=False):
+        self.name = name
+        self.fn = fn
+        self.interval = interval    # Seconds between runs (interval jobs)
+        self.at = at                # Callable returning "HH:MM" IST (daily jobs)
+        self.grace = grace          # Daily jobs: catch-up window after the time (late start, retries)
+        self.retry = retry          # Daily jobs: seconds until a retry when fn returns False
+        self.background = background  # Runs on its own thread (long I/O), not the timer thread
+        self.target = 0             # Daily jobs: the occurrence being served
+        self.due = 0
+        self.runs = 0
+        self.running = False
+        self.rerun = False          # Triggered while running (background jobs)
+        self.last_error = None
+
+class Scheduler:
+    """
+    Named jobs on one timer thread, each run inside an app context:
+      - every(name, seconds, fn):  fixed cadence
+      - daily(name, at, fn):       fires exactly at an IST time of day; `at` is re-read each day
+      - trigger(name):             runs a job now (event-driven wakeups, e.g. token change)
+    Jobs run one at a time on the timer thread, so they never race each other for the DB.
+    Long I/O jobs (background=True) get their own thread, so they cannot delay timed jobs.
+    A daily job returning False is retried every `retry` seconds until its grace window closes.
+    """
+    def __init__(self):
+        self._jobs = {}
+        self._heap = []             # (due, seq, name); stale entries are skipped
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._app = None
+        self._thread = None
+
+    # --- REGISTRATION ---
+    def every(self, name, seconds, fn, delay=0, background=False):
+        job = _Job(name, fn, interval=seconds, background=background)
+        self._add(job, time.time() + delay)
+
+    def daily(self, name, at, fn, grace=120, retry=10):
+        job = _Job(name, fn, at=at, grace=grace, retry=retry)
+        self._add(job, self._next_daily(job, first=True))
+
+    def _add(self, job, due):
+        with self._cond:
+            self._jobs[job.name] = job
+            self._schedule(job, due)
+
+    def _schedule(self, job, due):
+        job.due = due
+        heapq.heappush(self._heap, (due, next(self._seq), job.name))
+        self._cond.notify()
+
+    def _next_daily(self, job, first=False):
+        """Next occurrence of the job's IST time (today if still ahead, or within grace on startup)."""
+        now = datetime.now(IST)
+        try:
+            hh, mm = map(int, str(job.at()).split(':'))
+        except Exception as e:
+            print(f"⚠️ Scheduler: Bad time for {job.name}: {e}")
+            return time.time() + 60 # Retry once the setting is fixed
+        target = now.replace(hour=hh, minute=mm, second=0, microsecond=0)
+        late = (now - target).total_seconds()
+        if late > (job.grace if first else 0):
+            target += timedelta(days=1)
+        job.target = target.timestamp()
+        return max(job.target, time.time())
+
+    # --- CONTROL ---
+    def trigger(self, name):
+        """Runs `name` as soon as possible (its regular cadence continues afterwards)."""
+        with self._cond:
+            job = self._jobs.get(name)
+            if job: self._schedule(job, time.time())
+
+    def reschedule(self, name):
+        """Re-reads a daily job's time (e.g. after settings changed); a time just passed still fires within grace."""
+        with self._cond:
+            job = self._jobs.get(name)
+            if job and job.at: self._schedule(job, self._next_daily(job, first=True))
+
+    def start(self, app):
+        """Starts the scheduler thread (idempotent)."""
+        if self._thread is not None: return
+        self._app = app
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._heap:
+                        due, _, name = self._heap[0]
+                        job = self._jobs.get(name)
+                        if job is None or due != job.due:
+                            heapq.heappop(self._heap) # Stale (rescheduled)
+                            continue
+                        wait = due - time.time()
+                        if wait <= 0:
+                            heapq.heappop(self._heap)
+                            if job.running:
+                                job.rerun = True # Background job still busy: run again when it ends
+                                continue
+                            job.running = True
+                            break
+                    else:
+                        wait = None
+                    self._cond.wait(wait)
+            if job.background:
+                threading.Thread(target=self._execute, args=(job,), daemon=True).start()
+            else:
+                self._execute(job)
+
+    def _execute(self, job):
+        started_due = job.due
+        result = None
+        with self._app.app_context():
+            try:
+                result = job.fn()
+                job.last_error = None
+            except Exception as e:
+                job.last_error = str(e)
+                print(f"⚠️ Job Error ({job.name}): {e}")
+            finally:
+                job.runs += 1
+                db.session.remove()
+        with self._cond:
+            job.running = False
+            if job.rerun:
+                job.rerun = False
+                self._schedule(job, time.time())
+            elif job.due == started_due: # Not re-triggered / rescheduled while running
+                self._schedule(job, self._next_due(job, result))
+
+    def _next_due(self, job, result):
+        if job.interval:
+            return time.time() + job.interval
+        retry_at = time.time() + (job.retry or 0)
+        if result is False and job.retry and retry_at <= job.target + job.grace:
+            return retry_at # Not done yet: retry within the catch-up window
+        return self._next_daily(job)
+
+    def stats(self):
+        with self._cond:
+            return {j.name: {"next": round(j.due - time.time(), 1), "runs": j.runs, "error": j.last_error} for j in self._jobs.values()}
+
+# Singleton Instance
+scheduler = Scheduler()
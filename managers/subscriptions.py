@@ -0,0 +1,107 @@
+import threading
+from managers.trade_store import store, closed_today
+
+def _token_of(trade):
+    try: return int(trade.get('instrument_token') or 0) or None
+    except (TypeError, ValueError): return None
+
+class _SourceListener:
+    """Store listener feeding one source (active / closed) of the subscription manager."""
+    def __init__(self, manager, source):
+        self.manager = manager
+        self.source = source
+
+    def on_upsert(self, trade):
+        token = _token_of(trade)
+        key = (self.source, int(trade['id']))
+        # Closed trades stop being watched once their virtual SL is hit
+        if token is None or (self.source == 'closed' and trade.get('virtual_sl_hit')):
+            self.manager.drop(key)
+        else:
+            self.manager.want(key, token)
+
+    def on_remove(self, trade_id):
+        self.manager.drop((self.source, int(trade_id)))
+
+    def on_clear(self):
+        self.manager.drop_source(self.source)
+
+class SubscriptionManager:
+    """
+    Tracks the desired instrument token set incrementally from trade lifecycle events
+    (active trades, today's closed trades until their virtual SL is hit, index feeds)
+    and publishes only the difference to the gateway: adds via subscribe, removes via unsubscribe.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wanted = {}       # (source, key) -> token
+        self._refs = {}         # token -> number of wanting keys
+        self._subscribed = set()
+        self._seeded = False
+
+    # --- DESIRED SET ---
+    def want(self, key, token):
+        with self._lock:
+            old = self._wanted.get(key)
+            if old == token: return
+            if old is not None: self._unref(old)
+            self._wanted[key] = token
+            self._refs[token] = self._refs.get(token, 0) + 1
+
+    def drop(self, key):
+        with self._lock:
+            token = self._wanted.pop(key, None)
+            if token is not None: self._unref(token)
+
+    def drop_source(self, source):
+        with self._lock:
+            for key in [k for k in self._wanted if k[0] == source]:
+                self._unref(self._wanted.pop(key))
+
+    def _unref(self, token):
+        self._refs[token] -= 1
+        if self._refs[token] <= 0:
+            del self._refs[token]
+
+    def desired(self):
+        with self._lock:
+            return set(self._refs)
+
+    def _seed(self):
+        """Initial desired set from the stores (they load lazily, without lifecycle events)."""
+        with store.lock:
+            active, closed = store.all(), closed_today.all()
+            for t in active: active_listener.on_upsert(t)
+            for t in closed: closed_listener.on_upsert(t)
+            self._seeded = True
+
+    # --- PUBLISHING ---
+    def sync(self, ws, full=False):
+        """
+        Publishes the changes since the last sync (adds / removes).
+        With full=True (reconnect) the whole desired set is re-sent.
+        """
+        if not self._seeded:
+            self._seed()
+        # Rolls today's closed-trade set over at the day boundary (its tokens are dropped)
+        closed_today.refresh_day()
+
+        with self._lock:
+            desired = set(self._refs)
+            adds = desired if full else desired - self._subscribed
+            removes = self._subscribed - desired
+            self._subscribed = desired
+
+        if adds:
+            ws.subscribe(sorted(adds))
+            ws.set_mode(ws.MODE_FULL, sorted(adds))
+        if removes and hasattr(ws, 'unsubscribe'):
+            ws.unsubscribe(sorted(removes))
+        return adds, removes
+
+# Singleton Instances
+subscriptions = SubscriptionManager()
+active_listener = _SourceListener(subscriptions, 'active')
+closed_listener = _SourceListener(subscriptions, 'closed')
+store.listeners.append(active_listener)
+closed_today.listeners.append(closed_listener)
@@ -4,16 +4,27 @@ import time
 import threading
 import settings
 import smart_trader
+import config
 from managers.common import get_time_str
-from database import db, TelegramMessage
+from managers.trade_store import store, closed_today
+from database import db, TelegramMessage, TelegramOutbox
 
 class TelegramManager:
     def __init__(self):
         self.base_url = "https://api.telegram.org/bot"
+        
+        # --- OUTBOX SENDER STATE ---
+        self._app = None
+        self._thread = None
+        self._wake = threading.Event()
+        self._send_lock = threading.Lock()
+        self._chat_last_sent = {}       # chat_id -> epoch of last send (per-chat rate limit)
+        self._global_last_sent = 0      # epoch of last send (global rate limit)
+        self._pending_threads = set()   # (trade_id, channel_key) whose thread parent is queued, not yet sent
 
     def _get_config(self):
-        s = settings.load_settings()
-        return s.get('telegram', {})
+        # Immutable cached snapshot: no DB query per formatted message
+        return settings.get_settings().get('telegram', {})
 
     def _format_msg(self, template_key, trade, extra_data=None, action_time=None):
         """
@@ -97,40 +108,193 @@ class TelegramManager:
 
     def send_message(self, text, reply_to_id=None, override_chat_id=None):
         """
-        Sends a message to the configured Telegram Channel.
+        Queues a message for the configured Telegram Channel (delivered by the outbox sender).
         Allows overriding the chat_id for specific alerts (like System Alerts).
-        Returns the Message ID of the sent message.
+        Returns the Outbox ID of the queued message.
         """
         conf = self._get_config()
         if not conf.get('enable_notifications', False):
             return None
         
-        token = conf.get('bot_token')
-        
         # Use the specific channel if provided, otherwise fallback to the default trade channel
         chat_id = override_chat_id if override_chat_id else conf.get('channel_id')
 
-        if not token or not chat_id:
+        if not conf.get('bot_token') or not chat_id:
             return None
 
-        url = f"{self.base_url}{token}/sendMessage"
+        return self._enqueue(chat_id, text, reply_to_id=reply_to_id)
+
+    # --- OUTBOX ---
+    def _enqueue(self, chat_id, text, event_type=None, trade_id=None, channel_key=None, thread_start=False, reply_to_id=None):
+        """Persists a message to the outbox and wakes the sender. Never touches the network."""
+        try:
+            row = TelegramOutbox(
+                chat_id=str(chat_id), text=text, event_type=event_type,
+                trade_id=str(trade_id) if trade_id else None, channel_key=channel_key,
+                thread_start=thread_start, reply_to_id=reply_to_id,
+                attempts=0, next_attempt=0, status='PENDING', created_at=time.time()
+            )
+            db.session.add(row)
+            db.session.commit()
+            if thread_start and trade_id:
+                self._pending_threads.add((str(trade_id), channel_key))
+        except Exception as e:
+            print(f"⚠️ Telegram Outbox Enqueue Failed: {e}")
+            try: db.session.rollback()
+            except: pass
+            return None
+        
+        if self._thread is None:
+            # No background sender (scripts, shell): deliver what is due right away
+            self.flush()
+        else:
+            self._wake.set()
+        return row.id
+
+    def start(self, app):
+        """Starts the background outbox sender (idempotent)."""
+        if self._thread is not None:
+            return
+        self._app = app
+        with app.app_context():
+            # Threads whose parent is still queued from a previous run
+            for r in TelegramOutbox.query.filter_by(status='PENDING', thread_start=True).all():
+                if r.trade_id: self._pending_threads.add((r.trade_id, r.channel_key))
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            wait = 1.0
+            with self._app.app_context():
+                try:
+                    wait = self.flush()
+                except Exception as e:
+                    print(f"❌ Telegram Outbox Error: {e}")
+                finally:
+                    db.session.remove()
+            self._wake.wait(wait)
+            self._wake.clear()
+
+    def flush(self):
+        """
+        Delivers every outbox message that is due, oldest first, one head-of-line message per chat
+        (keeps per-chat order so thread parents go out before their replies).
+        Returns the number of seconds until the next message becomes due (capped at 1s).
+        """
+        with self._send_lock:
+            token = self._get_config().get('bot_token')
+            if not token:
+                return 1.0
+            
+            rows = TelegramOutbox.query.filter_by(status='PENDING').order_by(TelegramOutbox.id).limit(500).all()
+            heads = {}
+            for r in rows:
+                heads.setdefault(r.chat_id, r)
+            
+            next_due = 1.0
+            min_gap = 1.0 / config.TELEGRAM_GLOBAL_RATE if config.TELEGRAM_GLOBAL_RATE > 0 else 0
+            for chat_id, row in heads.items():
+                now = time.time()
+                chat_ready = self._chat_last_sent.get(chat_id, 0) + config.TELEGRAM_CHAT_INTERVAL
+                due = max(row.next_attempt or 0, chat_ready)
+                if due > now:
+                    next_due = min(next_due, due - now)
+                    continue
+                
+                # Global rate limit
+                global_ready = self._global_last_sent + min_gap
+                if global_ready > now:
+                    time.sleep(global_ready - now)
+                
+                self._deliver(token, row)
+                self._chat_last_sent[chat_id] = self._global_last_sent = time.time()
+                next_due = min(next_due, config.TELEGRAM_CHAT_INTERVAL)
+            return max(next_due, 0.05)
+
+    def _resolve_reply(self, row):
+        """Reply target: explicit id, else the trade's thread parent in this chat (earliest stored message)."""
+        if row.thread_start: return None
+        if row.reply_to_id: return row.reply_to_id
+        if not row.trade_id: return None
+        parent = TelegramMessage.query.filter_by(trade_id=row.trade_id, chat_id=row.chat_id)\
+            .order_by(TelegramMessage.id).first()
+        return parent.message_id if parent else None
+
+    def _deliver(self, token, row):
+        """Sends one outbox row; on success records the message id, else schedules a retry with backoff."""
         payload = {
-            "chat_id": chat_id,
-            "text": text,
+            "chat_id": row.chat_id,
+            "text": row.text,
             "parse_mode": "HTML"
         }
-        if reply_to_id:
-            payload["reply_to_message_id"] = reply_to_id
+        reply_to = self._resolve_reply(row)
+        if reply_to:
+            payload["reply_to_message_id"] = reply_to
+            payload["allow_sending_without_reply"] = True
 
+        retry_after = None
+        error = None
         try:
-            resp = requests.post(url, json=payload, timeout=5)
+            resp = requests.post(f"{self.base_url}{token}/sendMessage", json=payload, timeout=5)
             if resp.status_code == 200:
-                return resp.json().get('result', {}).get('message_id')
-            else:
-                print(f"❌ Telegram Error (Chat {chat_id}): {resp.text}")
+                sent_id = resp.json().get('result', {}).get('message_id')
+                self._on_sent(row, sent_id)
+                return
+            error = resp.text
+            if resp.status_code == 429:
+                try: retry_after = float(resp.json().get('parameters', {}).get('retry_after', 1))
+                except Exception: retry_after = 1.0
+            elif resp.status_code in (400, 403):
+                # Bad request / bot removed from chat: retrying will not help
+                row.attempts = config.TELEGRAM_MAX_ATTEMPTS
         except Exception as e:
-            print(f"❌ Telegram Request Failed: {e}")
-        return None
+            error = str(e)
+        
+        row.attempts = (row.attempts or 0) + 1
+        if row.attempts >= config.TELEGRAM_MAX_ATTEMPTS:
+            row.status = 'FAILED'
+            self._pending_threads.discard((row.trade_id, row.channel_key))
+            print(f"❌ Telegram Error (Chat {row.chat_id}), giving up: {error}")
+        else:
+            delay = retry_after if retry_after is not None else min(2 ** row.attempts, 300)
+            row.next_attempt = time.time() + delay
+            print(f"⚠️ Telegram Error (Chat {row.chat_id}), retry in {delay:.0f}s: {error}")
+        try:
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+
+    def _on_sent(self, row, sent_id):
+        trade_id, key, thread_start = row.trade_id, row.channel_key, row.thread_start
+        try:
+            if trade_id and sent_id:
+                db.session.add(TelegramMessage(trade_id=trade_id, message_id=sent_id, chat_id=row.chat_id))
+            db.session.delete(row)
+            db.session.commit()
+        except Exception as e:
+            print(f"⚠️ Failed to save Telegram Msg ID: {e}")
+            db.session.rollback()
+        
+        if thread_start and trade_id:
+            self._pending_threads.discard((trade_id, key))
+            if sent_id: self._store_thread_id(trade_id, key, sent_id)
+
+    def _store_thread_id(self, trade_id, key, msg_id):
+        """Writes a thread parent id back into the trade's telegram_msg_ids (active or closed today)."""
+        with store.lock:
+            t, owner = store.get(trade_id), store
+            if t is None:
+                t, owner = closed_today.get(trade_id), closed_today
+            if t is None:
+                return
+            if not isinstance(t.get('telegram_msg_ids'), dict):
+                t['telegram_msg_ids'] = {}
+            t['telegram_msg_ids'][key] = msg_id
+            if key == 'main' or not t.get('telegram_msg_id'):
+                t['telegram_msg_id'] = msg_id
+            owner.touch(t)
+        store.writer.request_flush()
 
     def notify_system_event(self, event_type, message=""):
         """
@@ -153,12 +317,15 @@ class TelegramManager:
         # Format the message
         text = f"{icon} <b>SYSTEM ALERT: {event_type}</b>\n{message}\nTime: {get_time_str()}"
         
-        # Send immediately using the system channel (if configured) or default
+        # Queue using the system channel (if configured) or default
         self.send_message(text, override_chat_id=sys_channel_id)
 
     def notify_trade_event(self, trade, event_type, extra_data=None):
         """
-        Constructs and sends notifications to ALL configured channels based on rules.
+        Constructs notifications for ALL configured channels based on rules and queues them
+        in the outbox (no network I/O, safe to call from the tick loop).
+        Thread parent ids are written back to the trade once the sender delivers them.
+        Returns the outbox ids of the queued thread parents, keyed by channel.
         """
         conf = self._get_config()
         if not conf.get('enable_notifications', False):
@@ -251,23 +418,24 @@ class TelegramManager:
                     continue
             
             # --- THREAD MANAGEMENT ---
-            reply_to = stored_ids.get(key)
+            # A thread exists once its parent was sent (stored id) or is still queued in the outbox
+            has_thread = bool(stored_ids.get(key)) or ((str(trade.get('id')), key) in self._pending_threads)
             is_new_thread_start = False
 
             # NEW_TRADE always starts a new thread
             if event_type == "NEW_TRADE":
-                reply_to = None 
+                has_thread = False 
 
             # Special Logic for FREE Channel (Lazy Threading):
             # If we are sending a message (e.g. TARGET_HIT) but have no Thread ID yet,
             # this means we skipped the Entry (Spillover mode).
             # So this message becomes the Header/Parent.
-            if key == 'free' and not reply_to:
+            if key == 'free' and not has_thread:
                 is_new_thread_start = True
 
             # If it's a reply event (not NEW_TRADE) but we don't have a thread ID 
             # AND it's not the start of the Free Channel thread -> SKIP
-            if event_type != "NEW_TRADE" and not reply_to and not is_new_thread_start:
+            if event_type != "NEW_TRADE" and not has_thread and not is_new_thread_start:
                 continue
 
             # --- BUILD MESSAGE CONTENT (UPDATED: USES TEMPLATE) ---
@@ -286,34 +454,19 @@ class TelegramManager:
                 if header:
                     msg = header + msg
 
-            # --- SEND & SAVE ---
+            # --- QUEUE ---
+            # Reply target is resolved by the sender from the stored thread parent of this chat
             if msg:
-                sent_id = self.send_message(msg, reply_to_id=reply_to, override_chat_id=chat_id)
-                if sent_id:
-                    self._save_msg_to_db(trade.get('id'), sent_id, chat_id)
-                    
-                    # If NEW_TRADE or First Free Msg, update stored IDs
-                    if event_type == "NEW_TRADE" or is_new_thread_start:
-                        new_msg_ids[key] = sent_id
-                        # Update trade object for persistence
-                        trade['telegram_msg_ids'][key] = sent_id
+                thread_start = event_type == "NEW_TRADE" or is_new_thread_start
+                outbox_id = self._enqueue(
+                    chat_id, msg, event_type=event_type, trade_id=trade.get('id'),
+                    channel_key=key, thread_start=thread_start
+                )
+                if outbox_id and thread_start:
+                    new_msg_ids[key] = outbox_id
 
         return new_msg_ids
 
-    def _save_msg_to_db(self, trade_id, msg_id, chat_id):
-        """Helper to safely save message ID to database"""
-        if not trade_id or not msg_id or not chat_id:
-            return
-            
-        try:
-            rec = TelegramMessage(trade_id=str(trade_id), message_id=msg_id, chat_id=str(chat_id))
-            db.session.add(rec)
-            db.session.commit()
-        except Exception as e:
-            print(f"⚠️ Failed to save Telegram Msg ID: {e}")
-            try: db.session.rollback()
-            except: pass
-
     def delete_trade_messages(self, trade_id):
         """
         Deletes messages associated with a trade from the database immediately,
@@ -321,9 +474,15 @@ class TelegramManager:
         Prevents Worker Timeout on slow network calls.
         """
         try:
+            # 0. Drop anything still queued for this trade
+            TelegramOutbox.query.filter_by(trade_id=str(trade_id)).delete()
+            self._pending_threads = {k for k in self._pending_threads if k[0] != str(trade_id)}
+            
             # 1. Fetch messages
             messages = TelegramMessage.query.filter_by(trade_id=str(trade_id)).all()
-            if not messages: return
+            if not messages:
+                db.session.commit()
+                return
 
             # 2. Extract data for background processing
             msg_data_list = [{"chat_id": m.chat_id, "message_id": m.message_id} for m in messages]
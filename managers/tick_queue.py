@@ -0,0 +1,102 @@
+import time
+import threading
+from collections import deque
+
+POLICIES = ("drop_oldest", "conflate", "block")
+
+def _merge(ticks, into):
+    """Merges a tick batch into a token -> tick dict (latest wins). Returns the number of overwritten ticks."""
+    replaced = 0
+    for tick in ticks:
+        token = tick.get('instrument_token')
+        if token in into: replaced += 1
+        into[token] = tick
+    return replaced
+
+class TickQueue:
+    """
+    Bounded queue of tick batches between the Redis listener and the risk processor.
+    Overflow policies:
+      - drop_oldest: discards the oldest queued batch
+      - conflate:    merges the new batch into the newest queued one (latest tick per token)
+      - block:       the listener waits for room (backpressure onto the Redis buffer)
+    Above the high watermark the queue is `degraded` until a processed batch leaves it below the
+    low watermark; the consumer then merges the whole backlog into one batch (freshest prices only).
+    Consumers call get() for (ticks, degraded) and task_done() once that batch is processed.
+    """
+    def __init__(self, maxsize=1000, policy="conflate", high_water=0.8, low_water=0.2):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown tick queue policy: {policy}")
+        self.maxsize = max(1, maxsize)
+        self.policy = policy
+        self._high = max(1, int(self.maxsize * high_water))
+        self._low = int(self.maxsize * low_water)
+        self._q = deque()           # (received_at, [ticks])
+        self._cond = threading.Condition()
+        self.degraded = False
+        self.counters = {"received": 0, "processed": 0, "dropped": 0, "conflated": 0, "shed": 0}
+        self.lag = 0.0              # seconds between receipt and dequeue of the last batch
+        self.max_lag = 0.0
+
+    def put(self, ticks):
+        with self._cond:
+            self.counters["received"] += len(ticks)
+            if len(self._q) >= self.maxsize:
+                if self.policy == "drop_oldest":
+                    _, old = self._q.popleft()
+                    self.counters["dropped"] += len(old)
+                elif self.policy == "conflate":
+                    received_at, newest = self._q[-1]
+                    merged = {t.get('instrument_token'): t for t in newest}
+                    self.counters["conflated"] += _merge(ticks, merged)
+                    # Keep the older receipt time so lag reflects the oldest price in the batch
+                    self._q[-1] = (received_at, list(merged.values()))
+                    self._cond.notify()
+                    return
+                else:
+                    while len(self._q) >= self.maxsize:
+                        self._cond.wait()
+            self._q.append((time.time(), ticks))
+            if len(self._q) >= self._high:
+                self.degraded = True
+            self._cond.notify_all()
+
+    def get(self, timeout=None):
+        """
+        Returns (ticks, degraded) for the next batch, or (None, False) on timeout.
+        In degraded mode the whole backlog is merged into one batch of the latest ticks; the flag
+        stays set until task_done(), so the consumer processes that batch in degraded mode.
+        """
+        with self._cond:
+            if not self._q and not self._cond.wait_for(lambda: self._q, timeout):
+                return None, False
+            received_at, ticks = self._q.popleft()
+            degraded = self.degraded
+            if degraded and self._q:
+                merged = {t.get('instrument_token'): t for t in ticks}
+                while self._q:
+                    _, more = self._q.popleft()
+                    self.counters["shed"] += _merge(more, merged)
+                ticks = list(merged.values())
+            self.lag = time.time() - received_at
+            self.max_lag = max(self.max_lag, self.lag)
+            self.counters["processed"] += len(ticks)
+            self._cond.notify_all()
+            return ticks, degraded
+
+    def task_done(self):
+        """Marks the last batch processed; leaves degraded mode once the backlog is below the low watermark."""
+        with self._cond:
+            if len(self._q) <= self._low:
+                self.degraded = False
+
+    def depth(self):
+        with self._cond:
+            return len(self._q)
+
+    def stats(self):
+        with self._cond:
+            return {
+                **self.counters, "policy": self.policy, "depth": len(self._q), "maxsize": self.maxsize,
+                "degraded": self.degraded, "lag": round(self.lag, 4), "max_lag": round(self.max_lag, 4)
+            }
@@ -1,9 +1,10 @@
 import time
 import copy
 import smart_trader
-from managers.persistence import load_trades, save_trades
+from managers.trade_store import store
 from managers.common import get_time_str, log_event
 from managers import broker_ops
+from managers.order_dispatcher import dispatcher
 from managers.telegram_manager import bot as telegram_bot
 
 def create_trade_direct(kite, mode, specific_symbol, quantity, sl_points, custom_targets, order_type, limit_price=0, target_controls=None, trailing_sl=0, sl_to_entry=0, exit_multiplier=1, target_channels=None, risk_ratios=None):
@@ -18,7 +19,7 @@ def create_trade_direct(kite, mode, specific_symbol, quantity, sl_points, custom
     print(f"[DEBUG] Symbol: {specific_symbol}, Qty: {quantity}")
     
     try:
-        trades = load_trades()
+        trades = store.all()
         current_ts = int(time.time())
         
         # --- FIX: ROBUST DUPLICATE CHECK ---
@@ -34,12 +35,7 @@ def create_trade_direct(kite, mode, specific_symbol, quantity, sl_points, custom
 
         # --- FIX: UNIQUE ID GENERATION ---
         # Ensure new_id is always greater than the max existing ID to prevent overwrites
-        new_id = current_ts
-        existing_ids = [t['id'] for t in trades]
-        if existing_ids:
-            max_id = max(existing_ids)
-            if new_id <= max_id:
-                new_id = max_id + 1
+        new_id = store.next_id(current_ts)
         
         print(f"[DEBUG] Generated New ID: {new_id}")
 
@@ -194,19 +190,13 @@ def create_trade_direct(kite, mode, specific_symbol, quantity, sl_points, custom
             "logs": logs
         }
         
-        # --- SEND TELEGRAM NOTIFICATION ---
-        msg_ids = telegram_bot.notify_trade_event(record, "NEW_TRADE")
-        if msg_ids:
-            record['telegram_msg_ids'] = msg_ids
-            if isinstance(msg_ids, dict):
-                record['telegram_msg_id'] = msg_ids.get('main')
-            else:
-                record['telegram_msg_id'] = msg_ids
-        
-        print(f"[DEBUG] Appending trade to list. Previous count: {len(trades)}")
-        trades.append(record)
-        print(f"[DEBUG] Saving list. New count: {len(trades)}")
-        save_trades(trades)
+        print(f"[DEBUG] Appending trade to store. Previous count: {len(trades)}")
+        with store.lock:
+            store.add(record)
+            # --- QUEUE TELEGRAM NOTIFICATION ---
+            # Thread ids are written back into the stored trade once the outbox delivers them
+            telegram_bot.notify_trade_event(record, "NEW_TRADE")
+            store.commit(critical=True)
         print(f"[DEBUG] Trade Creation Successful.")
         return {"status": "success", "trade": record}
             
@@ -219,269 +209,233 @@ def update_trade_protection(kite, trade_id, sl, targets, trailing_sl=0, entry_pr
     Updates the protection parameters (SL, Targets, Trailing) for an existing trade.
     Also syncs the changes to the broker if the trade is LIVE.
     """
-    trades = load_trades()
-    updated = False
-    
-    for t in trades:
-        if str(t['id']) == str(trade_id):
-            entry_msg = ""
-            
-            # Update Entry Price (Only allowed if PENDING)
-            if entry_price is not None:
-                if t['status'] == 'PENDING':
-                    new_entry = float(entry_price)
-                    if new_entry != t['entry_price']:
-                        t['entry_price'] = new_entry
-                        entry_msg = f" | Entry Updated to {new_entry}"
-            
-            final_trailing_sl = float(trailing_sl) if trailing_sl else 0
-            if final_trailing_sl == -1.0:
-                calc_diff = t['entry_price'] - float(sl)
-                final_trailing_sl = max(0.0, calc_diff)
+    with store.lock:
+        t = store.get(trade_id)
+        if not t:
+            return False
+        entry_msg = ""
+        
+        # Update Entry Price (Only allowed if PENDING)
+        if entry_price is not None:
+            if t['status'] == 'PENDING':
+                new_entry = float(entry_price)
+                if new_entry != t['entry_price']:
+                    t['entry_price'] = new_entry
+                    entry_msg = f" | Entry Updated to {new_entry}"
+        
+        final_trailing_sl = float(trailing_sl) if trailing_sl else 0
+        if final_trailing_sl == -1.0:
+            calc_diff = t['entry_price'] - float(sl)
+            final_trailing_sl = max(0.0, calc_diff)
 
-            t['sl'] = float(sl)
-            t['trailing_sl'] = final_trailing_sl
-            t['sl_to_entry'] = int(sl_to_entry)
-            t['exit_multiplier'] = int(exit_multiplier) 
-            
-            # Modify Broker SL if Live
-            if t['mode'] == 'LIVE' and t.get('sl_order_id'):
-                try:
-                    broker_ops.modify_order(
-                        kite, 
-                        order_id=t['sl_order_id'], 
-                        trigger_price=t['sl']
-                    )
-                    entry_msg += " [Broker SL Updated]"
-                except Exception as e: 
-                    entry_msg += f" [Broker SL Fail: {e}]"
+        t['sl'] = float(sl)
+        t['trailing_sl'] = final_trailing_sl
+        t['sl_to_entry'] = int(sl_to_entry)
+        t['exit_multiplier'] = int(exit_multiplier) 
+        
+        # Modify Broker SL if Live (order dispatcher: no broker round trip under the store lock)
+        if t['mode'] == 'LIVE' and t.get('sl_order_id'):
+            dispatcher.submit(kite, t, 'MODIFY_SL', trigger_price=t['sl'])
+            entry_msg += " [Broker SL Update Sent]"
 
-            # Recalculate Targets if Exit Multiplier Changed
-            if exit_multiplier > 1:
-                eff_entry = t['entry_price']
-                eff_sl_points = eff_entry - float(sl)
-                
-                valid_custom = [x for x in targets if x > 0]
-                final_goal = max(valid_custom) if valid_custom else (eff_entry + (eff_sl_points * 2))
-                
-                dist = final_goal - eff_entry
-                new_targets = []
-                new_controls = []
-                
-                lot_size = t.get('lot_size') or smart_trader.get_lot_size(t['symbol'])
-                total_lots = t['quantity'] // lot_size
-                base_lots = total_lots // exit_multiplier
-                remainder = total_lots % exit_multiplier
-                
-                for i in range(1, exit_multiplier + 1):
-                    fraction = i / exit_multiplier
-                    t_price = eff_entry + (dist * fraction)
-                    new_targets.append(round(t_price, 2))
-                    
-                    lots_here = base_lots + (remainder if i == exit_multiplier else 0)
-                    new_controls.append({'enabled': True, 'lots': int(lots_here), 'trail_to_entry': False})
-                
-                while len(new_targets) < 3: 
-                    new_targets.append(0)
-                    new_controls.append({'enabled': False, 'lots': 0, 'trail_to_entry': False})
-                    
-                t['targets'] = new_targets
-                t['target_controls'] = new_controls
-            else:
-                t['targets'] = [float(x) for x in targets]
-                if target_controls: 
-                    t['target_controls'] = target_controls
+        # Recalculate Targets if Exit Multiplier Changed
+        if exit_multiplier > 1:
+            eff_entry = t['entry_price']
+            eff_sl_points = eff_entry - float(sl)
             
-            log_event(t, f"Manual Update: SL {t['sl']}{entry_msg}. Trailing: {t['trailing_sl']} pts. Multiplier: {exit_multiplier}x")
+            valid_custom = [x for x in targets if x > 0]
+            final_goal = max(valid_custom) if valid_custom else (eff_entry + (eff_sl_points * 2))
             
-            # --- TELEGRAM UPDATE ---
-            telegram_bot.notify_trade_event(t, "UPDATE")
+            dist = final_goal - eff_entry
+            new_targets = []
+            new_controls = []
+            
+            lot_size = t.get('lot_size') or smart_trader.get_lot_size(t['symbol'])
+            total_lots = t['quantity'] // lot_size
+            base_lots = total_lots // exit_multiplier
+            remainder = total_lots % exit_multiplier
             
-            updated = True
-            break
+            for i in range(1, exit_multiplier + 1):
+                fraction = i / exit_multiplier
+                t_price = eff_entry + (dist * fraction)
+                new_targets.append(round(t_price, 2))
+                
+                lots_here = base_lots + (remainder if i == exit_multiplier else 0)
+                new_controls.append({'enabled': True, 'lots': int(lots_here), 'trail_to_entry': False})
             
-    if updated:
-        save_trades(trades)
+            while len(new_targets) < 3: 
+                new_targets.append(0)
+                new_controls.append({'enabled': False, 'lots': 0, 'trail_to_entry': False})
+                
+            t['targets'] = new_targets
+            t['target_controls'] = new_controls
+        else:
+            t['targets'] = [float(x) for x in targets]
+            if target_controls: 
+                t['target_controls'] = target_controls
+        
+        log_event(t, f"Manual Update: SL {t['sl']}{entry_msg}. Trailing: {t['trailing_sl']} pts. Multiplier: {exit_multiplier}x")
+        
+        # --- TELEGRAM UPDATE ---
+        telegram_bot.notify_trade_event(t, "UPDATE")
+        
+        # SL / target edit is a critical transition: flush immediately
+        store.touch(t)
+        store.commit(critical=True)
         return True
-    return False
 
 def manage_trade_position(kite, trade_id, action, lot_size, lots_count):
     """
     Manages position sizing: Adding lots (Averaging) or Partial Exits.
     """
-    trades = load_trades()
-    updated = False
+    t = store.get(trade_id)
+    if not t:
+        return True
+    
+    qty_delta = lots_count * lot_size
+    # Fetch LTP before taking the store lock (network call)
+    ltp = smart_trader.get_ltp(kite, t['symbol'])
     
-    for t in trades:
-        if str(t['id']) == str(trade_id):
-            qty_delta = lots_count * lot_size
-            ltp = smart_trader.get_ltp(kite, t['symbol'])
+    with store.lock:
+        t = store.get(trade_id)
+        if not t:
+            return True
+        
+        # --- ADD LOTS ---
+        if action == 'ADD':
+            new_total = t['quantity'] + qty_delta
+            avg_entry = ((t['quantity'] * t['entry_price']) + (qty_delta * ltp)) / new_total
+            t['quantity'] = new_total
+            t['entry_price'] = avg_entry
+            log_event(t, f"Added {qty_delta} Qty. New Avg: {avg_entry:.2f}")
             
-            # --- ADD LOTS ---
-            if action == 'ADD':
-                new_total = t['quantity'] + qty_delta
-                avg_entry = ((t['quantity'] * t['entry_price']) + (qty_delta * ltp)) / new_total
-                t['quantity'] = new_total
-                t['entry_price'] = avg_entry
-                log_event(t, f"Added {qty_delta} Qty. New Avg: {avg_entry:.2f}")
-                
-                if t['mode'] == 'LIVE':
-                    try:
-                        # Place Market Buy
-                        broker_ops.place_order(
-                            kite, 
-                            symbol=t['symbol'], 
-                            exchange=t['exchange'], 
-                            transaction_type=kite.TRANSACTION_TYPE_BUY, 
-                            quantity=qty_delta, 
-                            order_type=kite.ORDER_TYPE_MARKET, 
-                            product=kite.PRODUCT_MIS,
-                            tag="RD_ADD"
-                        )
-                        # Update Broker SL Quantity
-                        if t.get('sl_order_id'): 
-                            broker_ops.modify_order(
-                                kite, 
-                                order_id=t['sl_order_id'], 
-                                quantity=new_total
-                            )
-                    except Exception as e: 
-                        log_event(t, f"Broker Fail (Add): {e}")
-                updated = True
-                
-            # --- EXIT LOTS ---
-            elif action == 'EXIT':
-                if t['quantity'] > qty_delta:
-                    # 1. Reduce Broker SL Qty First
-                    if t['mode'] == 'LIVE': 
-                        broker_ops.manage_broker_sl(kite, t, qty_delta)
-                    
-                    t['quantity'] -= qty_delta
-                    log_event(t, f"Partial Exit {qty_delta} Qty @ {ltp}")
-                    
-                    # 2. Place Sell Order
-                    if t['mode'] == 'LIVE':
-                        try: 
-                            broker_ops.place_order(
-                                kite, 
-                                symbol=t['symbol'], 
-                                exchange=t['exchange'], 
-                                transaction_type=kite.TRANSACTION_TYPE_SELL, 
-                                quantity=qty_delta, 
-                                order_type=kite.ORDER_TYPE_MARKET, 
-                                product=kite.PRODUCT_MIS,
-                                tag="RD_EXIT_PART"
-                            )
-                        except Exception as e: 
-                            log_event(t, f"Broker Fail (Exit): {e}")
-                    updated = True
-                else: 
-                    return False 
-            break
+            if t['mode'] == 'LIVE':
+                # Market Buy + Broker SL quantity update, off the store lock
+                dispatcher.submit(kite, t, 'ADD', qty=qty_delta, total=new_total, tag="RD_ADD")
+            store.touch(t)
+            store.commit(critical=True)
             
-    if updated: 
-        save_trades(trades)
+        # --- EXIT LOTS ---
+        elif action == 'EXIT':
+            if t['quantity'] > qty_delta:
+                # Broker SL qty reduced first, then the Sell order (dispatcher keeps the order)
+                if t['mode'] == 'LIVE': 
+                    dispatcher.submit(kite, t, 'PARTIAL_EXIT', qty=qty_delta, remaining=t['quantity'] - qty_delta, tag="RD_EXIT_PART")
+                
+                broker_ops.book_partial_exit(t, qty_delta, ltp)
+                t['quantity'] -= qty_delta
+                log_event(t, f"Partial Exit {qty_delta} Qty @ {ltp}")
+                store.touch(t)
+                store.commit(critical=True)
+            else: 
+                return False 
     return True
 
+# Trades with promotion orders in flight (guards against a double Buy)
+_promoting = set()
+
 def promote_to_live(kite, trade_id):
     """
     Promotes a PAPER trade to LIVE execution.
     Places a Market Buy order and a Stop Loss order immediately.
+    The broker calls run outside the store lock; the trade only turns LIVE once the Buy went through.
     """
-    trades = load_trades()
-    for t in trades:
-        if t['id'] == int(trade_id) and t['mode'] == "PAPER":
-            try:
-                # 1. Place Buy Order
-                broker_ops.place_order(
-                    kite, 
-                    symbol=t['symbol'], 
-                    exchange=t['exchange'], 
-                    transaction_type=kite.TRANSACTION_TYPE_BUY, 
-                    quantity=t['quantity'], 
-                    order_type=kite.ORDER_TYPE_MARKET, 
-                    product=kite.PRODUCT_MIS,
-                    tag="RD_PROMOTE"
-                )
-                
-                # 2. Place SL Order
-                try:
-                    sl_id = broker_ops.place_order(
-                        kite, 
-                        symbol=t['symbol'], 
-                        exchange=t['exchange'], 
-                        transaction_type=kite.TRANSACTION_TYPE_SELL, 
-                        quantity=t['quantity'], 
-                        order_type=kite.ORDER_TYPE_SL_M, 
-                        product=kite.PRODUCT_MIS, 
-                        trigger_price=t['sl'],
-                        tag="RD_SL"
-                    )
-                    t['sl_order_id'] = sl_id
-                except: 
-                    log_event(t, "Promote: Broker SL Failed")
-                    
-                t['mode'] = "LIVE"
-                t['status'] = "PROMOTED_LIVE"
-                
-                # Notify Promotion
-                telegram_bot.notify_trade_event(t, "UPDATE", "Promoted to LIVE")
-                
-                save_trades(trades)
-                return True
-            except: 
+    with store.lock:
+        t = store.get(trade_id)
+        if not t or t['mode'] != "PAPER" or trade_id in _promoting:
+            return False
+        _promoting.add(trade_id)
+        symbol, exchange, qty, sl = t['symbol'], t['exchange'], t['quantity'], t['sl']
+    try:
+        # 1. Place Buy Order
+        try:
+            broker_ops.place_order(
+                kite, 
+                symbol=symbol, 
+                exchange=exchange, 
+                transaction_type=kite.TRANSACTION_TYPE_BUY, 
+                quantity=qty, 
+                order_type=kite.ORDER_TYPE_MARKET, 
+                product=kite.PRODUCT_MIS,
+                tag="RD_PROMOTE"
+            )
+        except: 
+            return False
+        
+        # 2. Place SL Order
+        sl_id = None
+        try:
+            sl_id = broker_ops.place_order(
+                kite, 
+                symbol=symbol, 
+                exchange=exchange, 
+                transaction_type=kite.TRANSACTION_TYPE_SELL, 
+                quantity=qty, 
+                order_type=kite.ORDER_TYPE_SL_M, 
+                product=kite.PRODUCT_MIS, 
+                trigger_price=sl,
+                tag="RD_SL"
+            )
+        except: pass
+        
+        with store.lock:
+            t = store.get(trade_id)
+            if not t:
+                # Closed as PAPER while the orders were in flight: the broker position is unmanaged
+                print(f"⚠️ Promote: Trade {trade_id} closed during promotion. Check broker position for {symbol}.")
                 return False
-    return False
+            if sl_id: t['sl_order_id'] = sl_id
+            else: log_event(t, "Promote: Broker SL Failed")
+                
+            t['mode'] = "LIVE"
+            t['status'] = "PROMOTED_LIVE"
+            store.reindex(t)
+            
+            # Notify Promotion
+            telegram_bot.notify_trade_event(t, "UPDATE", "Promoted to LIVE")
+            
+            store.touch(t)
+            store.commit(critical=True)
+            return True
+    finally:
+        with store.lock: _promoting.discard(trade_id)
 
 def close_trade_manual(kite, trade_id):
     """
     Manually closes a trade via the UI.
     Squares off position (if Live), cancels SL, and moves to history.
     """
-    trades = load_trades()
-    active_list = []
-    found = False
+    t = store.get(trade_id)
+    if not t:
+        return False
     
-    for t in trades:
-        if t['id'] == int(trade_id):
-            found = True
-            
-            # Default Exit Reason
-            exit_reason = "MANUAL_EXIT"
-            exit_p = t.get('current_ltp', 0)
-            
-            # Fetch fresh LTP if possible
-            try: 
-                exit_p = smart_trader.get_ltp(kite, t['symbol'])
-            except: pass
-            
-            # --- NEW: Handle Pending Cancellations ---
-            # If closing a PENDING order, it means we canceled it. 
-            # PnL should be 0, so we set exit_price = entry_price and status = NOT_ACTIVE
-            if t['status'] == 'PENDING':
-                exit_reason = "NOT_ACTIVE"
-                exit_p = t['entry_price']
-            
-            # Handle Live Execution
-            if t['mode'] == "LIVE" and t['status'] != "PENDING":
-                broker_ops.manage_broker_sl(kite, t, cancel_completely=True)
-                try: 
-                    broker_ops.place_order(
-                        kite, 
-                        symbol=t['symbol'], 
-                        exchange=t['exchange'], 
-                        transaction_type=kite.TRANSACTION_TYPE_SELL, 
-                        quantity=t['quantity'], 
-                        order_type=kite.ORDER_TYPE_MARKET, 
-                        product=kite.PRODUCT_MIS,
-                        tag="RD_MANUAL_EXIT"
-                    )
-                except: pass
-            
-            broker_ops.move_to_history(t, exit_reason, exit_p)
-        else:
-            active_list.append(t)
+    # Fetch fresh LTP if possible (outside the store lock, network call)
+    fresh_ltp = None
+    try: 
+        fresh_ltp = smart_trader.get_ltp(kite, t['symbol'])
+    except: pass
     
-    if found: 
-        save_trades(active_list)
-    return found
+    with store.lock:
+        t = store.get(trade_id)
+        if not t:
+            return False
+        
+        # Default Exit Reason
+        exit_reason = "MANUAL_EXIT"
+        exit_p = fresh_ltp if fresh_ltp is not None else t.get('current_ltp', 0)
+        
+        # --- NEW: Handle Pending Cancellations ---
+        # If closing a PENDING order, it means we canceled it. 
+        # PnL should be 0, so we set exit_price = entry_price and status = NOT_ACTIVE
+        if t['status'] == 'PENDING':
+            exit_reason = "NOT_ACTIVE"
+            exit_p = t['entry_price']
+        
+        # Handle Live Execution (SL cancel + Sell via the dispatcher; results land in the history row)
+        if t['mode'] == "LIVE" and t['status'] != "PENDING":
+            dispatcher.submit(kite, t, 'FULL_EXIT', qty=t['quantity'], tag="RD_MANUAL_EXIT")
+        
+        broker_ops.move_to_history(t, exit_reason, exit_p)
+        store.remove(trade_id)
+        store.commit(critical=True)
+    return True
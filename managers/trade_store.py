@@ -0,0 +1,411 @@
+import copy
+import json
+import threading
+import atexit
+import pytz
+from datetime import datetime
+import config
+from managers import persistence
+from managers.versions import versions
+
+IST = pytz.timezone('Asia/Kolkata')
+
+def _token_of(trade):
+    token = trade.get('instrument_token')
+    try: return int(token) if token else None
+    except (TypeError, ValueError): return None
+
+class TokenIndex:
+    """
+    Maps instrument_token -> set of trade ids, so a tick batch only touches
+    the trades subscribed to the tokens it carries.
+    """
+    def __init__(self):
+        self._ids = {}      # token -> set(trade_id)
+        self._token = {}    # trade_id -> token (to move a trade when its token changes)
+
+    def put(self, trade_id, token):
+        self.discard(trade_id)
+        if token is None:
+            return
+        self._ids.setdefault(token, set()).add(trade_id)
+        self._token[trade_id] = token
+
+    def discard(self, trade_id):
+        token = self._token.pop(trade_id, None)
+        if token is None:
+            return
+        ids = self._ids.get(token)
+        if ids is not None:
+            ids.discard(trade_id)
+            if not ids:
+                del self._ids[token]
+
+    def ids_for(self, token):
+        return self._ids.get(token, ())
+
+    def tokens(self):
+        return set(self._ids.keys())
+
+    def clear(self):
+        self._ids.clear()
+        self._token.clear()
+
+class WriteBehind:
+    """
+    Write-behind persistence for the in-memory stores.
+    Records which trades changed and flushes only those rows, batched every `interval`
+    seconds or immediately on critical transitions (exits, SL moves). Flushes on shutdown.
+    """
+    def __init__(self, lock, interval):
+        self.lock = lock            # Shared store lock guarding the trade dicts
+        self.interval = interval
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._active = {}           # trade_id -> live trade dict (upsert)
+        self._removed = set()       # trade_ids deleted from ActiveTrade
+        self._history = {}          # trade_id -> live closed trade dict (TradeHistory merge)
+        self._wake = threading.Event()
+        self._app = None
+        self._thread = None
+
+    # --- DIRTY TRACKING ---
+    def mark_active(self, trade):
+        key = int(trade['id'])
+        with self._pending_lock:
+            self._removed.discard(key)
+            self._active[key] = trade
+
+    def mark_removed(self, trade_id):
+        key = int(trade_id)
+        with self._pending_lock:
+            self._active.pop(key, None)
+            self._removed.add(key)
+
+    def mark_history(self, trade):
+        with self._pending_lock:
+            self._history[int(trade['id'])] = trade
+
+    def discard_history(self, trade_id):
+        """Drops a pending history write (row deleted by the user)."""
+        with self._pending_lock:
+            self._history.pop(int(trade_id), None)
+
+    def request_flush(self, critical=False):
+        """Schedules a flush: immediately if critical, else on the next interval."""
+        if self._thread is None:
+            # No background writer (scripts, shell): write through synchronously
+            self.flush()
+        elif critical:
+            self._wake.set()
+
+    # --- FLUSHING ---
+    def flush(self):
+        """Writes all pending changes. Must be called inside an app context."""
+        with self._flush_lock:
+            with self._pending_lock:
+                active, removed, history = self._active, self._removed, self._history
+                self._active, self._removed, self._history = {}, set(), {}
+            if not (active or removed or history):
+                return
+            
+            # Serialize under the store lock (consistent snapshot), write without it
+            with self.lock:
+                active_rows = {k: json.dumps(t) for k, t in active.items()}
+                history_rows = {k: (json.dumps(t), persistence.history_columns(t)) for k, t in history.items()}
+            
+            ok = persistence.write_active_trades(active_rows, removed)
+            ok = persistence.write_history_rows(history_rows) and ok
+            if not ok:
+                self._requeue(active, removed, history)
+
+    def _requeue(self, active, removed, history):
+        """Puts failed changes back unless newer changes were recorded meanwhile."""
+        with self._pending_lock:
+            for k, t in active.items():
+                if k not in self._active and k not in self._removed: self._active[k] = t
+            for k in removed:
+                if k not in self._active: self._removed.add(k)
+            for k, t in history.items():
+                self._history.setdefault(k, t)
+
+    def start(self, app):
+        """Starts the background flusher thread (idempotent)."""
+        if self._thread is not None:
+            return
+        self._app = app
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        atexit.register(self._flush_on_exit)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            with self._app.app_context():
+                try:
+                    self.flush()
+                except Exception as e:
+                    print(f"❌ Write-Behind Flush Error: {e}")
+                finally:
+                    persistence.db.session.remove()
+
+    def _flush_on_exit(self):
+        try:
+            with self._app.app_context():
+                self.flush()
+            print("💾 Write-Behind: Pending trade changes flushed on shutdown.")
+        except Exception as e:
+            print(f"❌ Write-Behind Shutdown Flush Error: {e}")
+
+class ActiveTradeStore:
+    """
+    Process-resident, authoritative store of active trades.
+    The tick path, the trade manager and the Flask routes all read and mutate this store.
+    The ActiveTrade table is only used as a persistence backend: loaded once, then changed rows
+    are batched by the WriteBehind writer and flushed on an interval or on critical commits.
+    """
+    def __init__(self, lock, writer):
+        # Injected RLock, shared with ClosedTodayTracker and the writer's snapshot step
+        self.lock = lock
+        self.writer = writer
+        self._trades = {}   # trade_id -> trade dict (insertion order = creation order)
+        self.by_token = TokenIndex()
+        self._loaded = False
+        self._last_id = 0
+        self.listeners = [] # Derived indexes (e.g. vector risk book): on_upsert / on_remove / on_clear
+
+    def _ensure_loaded(self):
+        """Loads the persisted trades on first access. Must be called inside an app context."""
+        if self._loaded:
+            return
+        with self.lock:
+            if self._loaded:
+                return
+            try:
+                rows = persistence.load_trades(strict=True)
+            except Exception as e:
+                # Do NOT mark as loaded, otherwise the next commit would wipe the table
+                print(f"❌ Trade Store Load Error: {e}")
+                return
+            for t in rows:
+                self._trades[int(t['id'])] = t
+                self.by_token.put(int(t['id']), _token_of(t))
+            if self._trades:
+                self._last_id = max(self._last_id, max(self._trades.keys()))
+            self._loaded = True
+            print(f"📦 Trade Store Loaded: {len(self._trades)} active trades.")
+
+    # --- READS ---
+    def all(self):
+        """
+        Returns the live trade dicts. Callers that mutate them must hold `store.lock`
+        and call `commit()` afterwards.
+        """
+        self._ensure_loaded()
+        with self.lock:
+            return list(self._trades.values())
+
+    def snapshot(self, ids=None):
+        """
+        Returns deep copies of all trades (or of those in `ids` that still exist),
+        safe to decorate (display names etc.) and serialize.
+        """
+        self._ensure_loaded()
+        with self.lock:
+            if ids is None:
+                return copy.deepcopy(list(self._trades.values()))
+            return copy.deepcopy([self._trades[int(i)] for i in ids if int(i) in self._trades])
+
+    def get(self, trade_id):
+        """Returns the live trade dict for `trade_id` (int or str), or None."""
+        self._ensure_loaded()
+        try: key = int(trade_id)
+        except (TypeError, ValueError): return None
+        with self.lock:
+            return self._trades.get(key)
+
+    def for_tokens(self, tokens):
+        """
+        Returns the live trades subscribed to any of `tokens` (creation order).
+        Callers must hold `store.lock` while using the result.
+        """
+        self._ensure_loaded()
+        with self.lock:
+            ids = set()
+            for token in tokens:
+                ids.update(self.by_token.ids_for(token))
+            return [self._trades[i] for i in sorted(ids) if i in self._trades]
+
+    def tokens(self):
+        """Returns the set of instrument tokens referenced by active trades."""
+        self._ensure_loaded()
+        with self.lock:
+            return self.by_token.tokens()
+
+    # --- MUTATIONS ---
+    def next_id(self, candidate):
+        """Returns a unique trade id >= candidate (ids are timestamp based)."""
+        self._ensure_loaded()
+        with self.lock:
+            new_id = int(candidate)
+            if new_id <= self._last_id:
+                new_id = self._last_id + 1
+            self._last_id = new_id
+            return new_id
+
+    def add(self, trade):
+        self._ensure_loaded()
+        with self.lock:
+            key = int(trade['id'])
+            self._trades[key] = trade
+            self.by_token.put(key, _token_of(trade))
+            self._last_id = max(self._last_id, key)
+            self.writer.mark_active(trade)
+            versions.bump('positions', key)
+            for l in self.listeners: l.on_upsert(trade)
+
+    def touch(self, trade, risk=True):
+        """
+        Marks a trade mutated in place as dirty, so the next flush writes its row.
+        Pass risk=False for price-only updates (derived risk indexes are not refreshed).
+        """
+        self.writer.mark_active(trade)
+        versions.bump('positions', trade['id'])
+        if risk:
+            for l in self.listeners: l.on_upsert(trade)
+
+    def reindex(self, trade):
+        """Refreshes the token index after a trade's instrument changed (e.g. promotion)."""
+        self._ensure_loaded()
+        with self.lock:
+            key = int(trade['id'])
+            if key in self._trades:
+                self.by_token.put(key, _token_of(trade))
+                versions.bump('positions', key)
+                for l in self.listeners: l.on_upsert(trade)
+
+    def remove(self, trade_id):
+        self._ensure_loaded()
+        with self.lock:
+            key = int(trade_id)
+            self.by_token.discard(key)
+            self.writer.mark_removed(key)
+            versions.drop('positions', key)
+            for l in self.listeners: l.on_remove(key)
+            return self._trades.pop(key, None)
+
+    def clear(self):
+        self._ensure_loaded()
+        with self.lock:
+            removed = list(self._trades.values())
+            for t in removed:
+                self.writer.mark_removed(t['id'])
+                versions.drop('positions', t['id'])
+            self._trades.clear()
+            self.by_token.clear()
+            for l in self.listeners: l.on_clear()
+            return removed
+
+    def commit(self, critical=False):
+        """
+        Hands the recorded changes to the write-behind layer.
+        Critical transitions (exits, SL moves, activations) are flushed immediately.
+        """
+        self.writer.request_flush(critical)
+
+class ClosedTodayTracker:
+    """
+    Maintained set of trades closed today (any mode), used for virtual SL and made_high tracking.
+    Fed by broker_ops.move_to_history and reset at the day boundary, so the tick path never
+    has to query TradeHistory. Seeded from the database on first use of the day (restarts).
+    """
+    def __init__(self, lock, writer):
+        self.lock = lock
+        self.writer = writer
+        self._day = None
+        self._trades = {}   # trade_id -> closed trade dict
+        self.by_token = TokenIndex()
+        self.listeners = [] # on_upsert / on_remove / on_clear (e.g. subscription manager)
+
+    def _ensure_day(self):
+        today = datetime.now(IST).strftime("%Y-%m-%d")
+        if self._day == today:
+            return
+        with self.lock:
+            if self._day == today:
+                return
+            self._trades.clear()
+            self.by_token.clear()
+            for l in self.listeners: l.on_clear()
+            try:
+                history = persistence.load_history(strict=True, exit_date=today)
+            except Exception as e:
+                print(f"❌ Closed Tracker Load Error: {e}")
+                return
+            for t in history:
+                self._put(t)
+            self._day = today
+
+    def _put(self, trade):
+        key = int(trade['id'])
+        self._trades[key] = trade
+        self.by_token.put(key, _token_of(trade))
+        for l in self.listeners: l.on_upsert(trade)
+
+    def refresh_day(self):
+        """Rolls the set over if the day changed (reseeds from the database)."""
+        self._ensure_day()
+
+    def add(self, trade):
+        """Registers a trade that was just moved to history."""
+        self._ensure_day()
+        with self.lock:
+            if self._day and trade.get('exit_time', '').startswith(self._day):
+                self._put(trade)
+
+    def touch(self, trade):
+        """Marks a closed trade mutated in place (virtual SL, made_high) for the next flush."""
+        self.writer.mark_history(trade)
+        for l in self.listeners: l.on_upsert(trade)
+
+    def discard(self, trade_id):
+        with self.lock:
+            try: key = int(trade_id)
+            except (TypeError, ValueError): return
+            self.by_token.discard(key)
+            self._trades.pop(key, None)
+            self.writer.discard_history(key)
+            for l in self.listeners: l.on_remove(key)
+
+    def get(self, trade_id):
+        self._ensure_day()
+        try: key = int(trade_id)
+        except (TypeError, ValueError): return None
+        with self.lock:
+            return self._trades.get(key)
+
+    def all(self):
+        self._ensure_day()
+        with self.lock:
+            return list(self._trades.values())
+
+    def for_tokens(self, tokens):
+        """Returns today's closed trades on any of `tokens`. Callers mutating them must hold `lock`."""
+        self._ensure_day()
+        with self.lock:
+            ids = set()
+            for token in tokens:
+                ids.update(self.by_token.ids_for(token))
+            return [self._trades[i] for i in sorted(ids) if i in self._trades]
+
+    def tokens(self):
+        self._ensure_day()
+        with self.lock:
+            return self.by_token.tokens()
+
+# Singleton Instances (one lock guards both stores; the tick path mutates both in one pass)
+_lock = threading.RLock()
+writer = WriteBehind(_lock, config.TRADE_FLUSH_INTERVAL)
+store = ActiveTradeStore(_lock, writer)
+closed_today = ClosedTodayTracker(_lock, writer)
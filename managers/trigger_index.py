@@ -0,0 +1,92 @@
+from bisect import bisect_left, bisect_right, insort
+
+class TriggerIndex:
+    """
+    Per-token sorted price levels of PENDING entry orders, one list per trigger direction.
+    ABOVE orders activate when ltp >= level, BELOW orders when ltp <= level, so a tick finds
+    every activated order with one bisect per list: O(log n + k) instead of a scan of the ladder.
+    Lookups do not remove entries; an order leaves the index when its status changes.
+    """
+    def __init__(self):
+        self._levels = {}   # token -> {'ABOVE': [(price, trade_id)], 'BELOW': [(price, trade_id)]}
+        self._entry = {}    # trade_id -> (token, direction, price)
+
+    def add(self, trade_id, token, direction, price):
+        self.discard(trade_id)
+        if token is None or direction not in ('ABOVE', 'BELOW'):
+            return
+        book = self._levels.setdefault(token, {'ABOVE': [], 'BELOW': []})
+        insort(book[direction], (float(price), trade_id))
+        self._entry[trade_id] = (token, direction, float(price))
+
+    def discard(self, trade_id):
+        entry = self._entry.pop(trade_id, None)
+        if entry is None:
+            return
+        token, direction, price = entry
+        levels = self._levels[token][direction]
+        i = bisect_left(levels, (price, trade_id))
+        if i < len(levels) and levels[i] == (price, trade_id):
+            del levels[i]
+        if not self._levels[token]['ABOVE'] and not self._levels[token]['BELOW']:
+            del self._levels[token]
+
+    def triggered(self, token, ltp):
+        """Returns the trade ids on `token` whose trigger is met at `ltp`."""
+        book = self._levels.get(token)
+        if not book:
+            return []
+        above, below = book['ABOVE'], book['BELOW']
+        hits = [tid for _, tid in above[:bisect_right(above, (ltp, float('inf')))]]
+        hits += [tid for _, tid in below[bisect_left(below, (ltp, float('-inf'))):]]
+        return hits
+
+    def __contains__(self, trade_id):
+        return trade_id in self._entry
+
+    def __len__(self):
+        return len(self._entry)
+
+    def clear(self):
+        self._levels.clear()
+        self._entry.clear()
+
+class PendingTriggerBook:
+    """
+    TriggerIndex of the active-trade store's PENDING trades, kept in sync through the store
+    listener hooks and built lazily from the store on first use.
+    """
+    def __init__(self, source):
+        self._source = source
+        self.index = TriggerIndex()
+        self._built = False
+
+    def _put(self, t):
+        trade_id = int(t['id'])
+        if t.get('status') != 'PENDING':
+            self.index.discard(trade_id)
+            return
+        try: token = int(t.get('instrument_token') or 0) or None
+        except (TypeError, ValueError): token = None
+        self.index.add(trade_id, token, t.get('trigger_dir'), t.get('entry_price') or 0)
+
+    # --- STORE LISTENER ---
+    def on_upsert(self, trade):
+        if self._built: self._put(trade)
+
+    def on_remove(self, trade_id):
+        self.index.discard(int(trade_id))
+
+    def on_clear(self):
+        self.index.clear()
+
+    def triggered_ids(self, tick_map):
+        """Trade ids of pending orders activated by a tick batch ({token: ltp}). Caller holds the store lock."""
+        if not self._built:
+            self.index.clear()
+            for t in self._source(): self._put(t)
+            self._built = True
+        ids = set()
+        for token, ltp in tick_map.items():
+            ids.update(self.index.triggered(token, ltp))
+        return ids
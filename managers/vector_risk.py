@@ -0,0 +1,146 @@
+import numpy as np
+import config
+from managers.trade_store import store
+
+# Status codes held in the book (anything else is never flagged)
+PENDING, ACTIVE, IDLE = 0, 1, -1
+TRIGGER_DIRS = {'ABOVE': 1, 'BELOW': -1}
+
+class VectorRiskBook:
+    """
+    Array-backed copy of the numeric risk state of active trades (one slot per trade).
+    `evaluate()` checks a whole tick batch with vectorized comparisons and returns only the
+    trade ids that crossed a threshold (activation, SL, next target, trailing step, new high);
+    the Python handlers in on_ticks then apply the side effects for those trades.
+    Kept in sync through the trade store listener hooks; slots are re-read lazily.
+    """
+    def __init__(self, source, capacity=1024):
+        self._source = source       # Callable returning the live trades (initial build)
+        self._slot = {}             # trade_id -> slot
+        self._free = []
+        self._size = 0              # High-water mark of used slots
+        self._dirty = {}            # trade_id -> trade dict, re-read before the next evaluation
+        self._built = False
+        self._alloc(capacity)
+
+    def _alloc(self, n):
+        self.ids = np.zeros(n, dtype=np.int64)
+        self.token = np.full(n, -1, dtype=np.int64)
+        self.status = np.full(n, IDLE, dtype=np.int8)
+        self.trigger = np.zeros(n, dtype=np.int8)
+        self.entry = np.zeros(n, dtype=np.float64)
+        self.sl = np.zeros(n, dtype=np.float64)
+        self.trail = np.zeros(n, dtype=np.float64)
+        self.next_target = np.full(n, np.inf, dtype=np.float64)
+        self.highest = np.zeros(n, dtype=np.float64)
+
+    def _grow(self):
+        old = {k: getattr(self, k) for k in ('ids', 'token', 'status', 'trigger', 'entry', 'sl', 'trail', 'next_target', 'highest')}
+        self._alloc(len(self.ids) * 2)
+        for k, arr in old.items():
+            getattr(self, k)[:len(arr)] = arr
+
+    # --- STORE LISTENER ---
+    def on_upsert(self, trade):
+        self._dirty[int(trade['id'])] = trade
+
+    def on_remove(self, trade_id):
+        self._dirty.pop(int(trade_id), None)
+        self._release(int(trade_id))
+
+    def on_clear(self):
+        self._dirty.clear()
+        self._reset()
+
+    # --- SLOTS ---
+    def _reset(self):
+        self._slot.clear()
+        self._free = []
+        self._size = 0
+        self.status[:] = IDLE
+        self.token[:] = -1
+
+    def _release(self, trade_id):
+        slot = self._slot.pop(trade_id, None)
+        if slot is None: return
+        self.status[slot] = IDLE
+        self.token[slot] = -1
+        self._free.append(slot)
+
+    def _write(self, t):
+        trade_id = int(t['id'])
+        slot = self._slot.get(trade_id)
+        if slot is None:
+            if self._free:
+                slot = self._free.pop()
+            else:
+                if self._size == len(self.ids): self._grow()
+                slot = self._size
+                self._size += 1
+            self._slot[trade_id] = slot
+
+        try: token = int(t.get('instrument_token') or -1)
+        except (TypeError, ValueError): token = -1
+
+        status = t.get('status')
+        hit = set(t.get('targets_hit_indices', []))
+        pending_targets = [tgt for i, tgt in enumerate(t.get('targets') or []) if i not in hit]
+
+        self.ids[slot] = trade_id
+        self.token[slot] = token
+        self.status[slot] = PENDING if status == 'PENDING' else (ACTIVE if status in ('OPEN', 'PROMOTED_LIVE') else IDLE)
+        self.trigger[slot] = TRIGGER_DIRS.get(t.get('trigger_dir'), 0)
+        self.entry[slot] = float(t.get('entry_price') or 0)
+        self.sl[slot] = float(t.get('sl') or 0)
+        self.trail[slot] = float(t.get('trailing_sl') or 0)
+        self.next_target[slot] = min(pending_targets) if pending_targets else np.inf
+        self.highest[slot] = float(t.get('highest_ltp', 0) or 0)
+
+    def rebuild(self, trades):
+        self._reset()
+        self._dirty.clear()
+        for t in trades: self._write(t)
+        self._built = True
+
+    # --- EVALUATION ---
+    def evaluate(self, tick_map):
+        """
+        Returns the set of trade ids whose thresholds were crossed by this batch.
+        `tick_map` is {instrument_token: last_price}. Caller must hold the store lock.
+        """
+        if not self._built:
+            self.rebuild(self._source())
+        if self._dirty:
+            for t in self._dirty.values(): self._write(t)
+            self._dirty.clear()
+
+        n = self._size
+        if not n or not tick_map: return set()
+
+        tokens = np.fromiter(tick_map.keys(), dtype=np.int64, count=len(tick_map))
+        prices = np.fromiter(tick_map.values(), dtype=np.float64, count=len(tick_map))
+        order = np.argsort(tokens)
+        tokens, prices = tokens[order], prices[order]
+
+        # Price per slot (NaN where the batch carries no tick for the slot's token)
+        pos = np.minimum(np.searchsorted(tokens, self.token[:n]), len(tokens) - 1)
+        has_tick = tokens[pos] == self.token[:n]
+        ltp = np.where(has_tick, prices[pos], np.nan)
+
+        entry, sl, trail = self.entry[:n], self.sl[:n], self.trail[:n]
+        status, trigger = self.status[:n], self.trigger[:n]
+
+        with np.errstate(invalid='ignore'):
+            activate = (status == PENDING) & (((trigger == 1) & (ltp >= entry)) | ((trigger == -1) & (ltp <= entry)))
+            risk = (status == ACTIVE) & (
+                (ltp <= sl) | (ltp >= self.next_target[:n]) | (ltp > self.highest[:n]) |
+                ((trail > 0) & ((ltp - (sl + trail)) >= trail))
+            )
+        flagged = np.nonzero(has_tick & (activate | risk))[0]
+        return set(self.ids[flagged].tolist())
+
+# Singleton Instance (registered with the store only when enabled)
+book = None
+if config.VECTOR_RISK:
+    book = VectorRiskBook(store.all)
+    store.listeners.append(book)
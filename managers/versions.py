@@ -0,0 +1,69 @@
+import threading
+import uuid
+
+KINDS = ('positions', 'closed')
+
+class VersionLog:
+    """
+    Monotonic state version for active trades ('positions') and trade history ('closed').
+    Every change records the version at which a trade last changed (or was removed), so a poller
+    holding cursor `since` can be sent only what moved after it. The epoch changes on restart;
+    cursors from another epoch, or older than the retained tombstones, get a full reply.
+    """
+    def __init__(self, max_tombstones=5000):
+        self.epoch = uuid.uuid4().hex[:12]
+        self.version = 0
+        self.max_tombstones = max_tombstones
+        self._lock = threading.Lock()
+        self._changed = {k: {} for k in KINDS}     # trade_id -> version of last change
+        self._removed = {k: {} for k in KINDS}     # trade_id -> version of removal
+        self._floor = {k: 0 for k in KINDS}        # Oldest cursor still answerable incrementally
+
+    def bump(self, kind, trade_id):
+        with self._lock:
+            self.version += 1
+            key = int(trade_id)
+            self._changed[kind][key] = self.version
+            self._removed[kind].pop(key, None)
+
+    def drop(self, kind, trade_id):
+        with self._lock:
+            self.version += 1
+            key = int(trade_id)
+            self._changed[kind].pop(key, None)
+            removed = self._removed[kind]
+            removed[key] = self.version
+            if len(removed) > self.max_tombstones:
+                # Forget the oldest half; cursors older than them fall back to a full reply
+                oldest = sorted(removed.items(), key=lambda kv: kv[1])[:len(removed) // 2]
+                for k, _ in oldest: del removed[k]
+                self._floor[kind] = oldest[-1][1]
+
+    def invalidate(self, kind):
+        """Bulk change (e.g. history cleanup): every cursor gets a full reply for `kind`."""
+        with self._lock:
+            self.version += 1
+            self._changed[kind].clear()
+            self._removed[kind].clear()
+            self._floor[kind] = self.version
+
+    def changes(self, kind, since, epoch):
+        """
+        (changed_ids, removed_ids) after cursor `since`, or None when the cursor cannot be
+        answered incrementally (missing, other epoch, too old).
+        """
+        if since is None or epoch != self.epoch:
+            return None
+        try: since = int(since)
+        except (TypeError, ValueError): return None
+        with self._lock:
+            if since < self._floor[kind] or since > self.version:
+                return None
+            if since == self.version:
+                return [], []
+            changed = [k for k, v in self._changed[kind].items() if v > since]
+            removed = [k for k, v in self._removed[kind].items() if v > since]
+            return changed, removed
+
+# Singleton Instance
+versions = VersionLog()
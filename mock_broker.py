@@ -21,7 +21,8 @@ SIM_CONFIG = {
     "active": True, 
     "volatility": 0.05,
     "speed": 1.0,
-    "trend": "SIDEWAYS"
+    "trend": "SIDEWAYS",
+    "order_latency": 0.0  # Seconds each order call blocks (simulates broker HTTP round-trip)
 }
 
 # --- UPDATED: EXPIRY LOGIC (0DTE Daily) ---
@@ -83,13 +84,74 @@ def _market_heartbeat():
 t = threading.Thread(target=_market_heartbeat, daemon=True)
 t.start()
 
+# --- SYNTHETIC FULL-SIZE INSTRUMENT DUMP ---
+# Shape of the real master list: cash equities on NSE and BSE (same symbols on both), stock and
+# index F&O with several expiries, BSE index options, MCX and CDS contracts. ~100k rows.
+# Not ticked by the simulator; used to measure cold-start indexing cost.
+def _synthetic_universe(seed=7):
+    rng = random.Random(seed)
+    rows = []
+    token = iter(range(10_000_000, 20_000_000))
+    today = datetime.date.today()
+
+    def row(sym, name, exch, type_, lot, strike=0.0, expiry=None):
+        rows.append({
+            "instrument_token": next(token), "tradingsymbol": sym, "name": name,
+            "exchange": exch, "last_price": 0, "instrument_type": type_,
+            "lot_size": lot, "expiry": expiry, "strike": strike
+        })
+
+    def chain(name, exch, spot, step, strikes, expiries, lot):
+        for exp, tag in expiries:
+            row(f"{name}{tag}FUT", name, exch, "FUT", lot, 0.0, exp.strftime("%Y-%m-%d"))
+            atm = round(spot / step) * step
+            for i in range(-strikes, strikes):
+                k = float(atm + i * step)
+                for opt in ("CE", "PE"):
+                    row(f"{name}{tag}{k:g}{opt}", name, exch, opt, lot, k, exp.strftime("%Y-%m-%d"))
+
+    # Weekly contracts carry the day in the symbol (NIFTY26OCT17...), monthlies just the month
+    weeklies = [(d, d.strftime("%y%b%d").upper()) for d in (today + datetime.timedelta(days=7 * w) for w in range(8))]
+    monthlies = [(d, d.strftime("%y%b").upper()) for d in (today + datetime.timedelta(days=30 * m + 3) for m in range(3))]
+
+    # Cash equities (listed on both exchanges)
+    for i in range(2500):
+        sym = f"STK{i:04d}"
+        row(sym, sym, "NSE", "EQ", 1)
+        row(sym, sym, "BSE", "EQ", 1)
+
+    # Index options: weekly + monthly, wide strike range
+    for name, spot, step, lot in [("NIFTY", 22000, 50, 65), ("BANKNIFTY", 48000, 100, 15),
+                                  ("FINNIFTY", 21000, 50, 40), ("MIDCPNIFTY", 11000, 25, 75)]:
+        chain(name, "NFO", spot, step, 100, weeklies + monthlies, lot)
+    for name, spot, step, lot in [("SENSEX", 72000, 100, 10), ("BANKEX", 54000, 100, 15)]:
+        chain(name, "BFO", spot, step, 80, weeklies[:4], lot)
+
+    # Stock F&O: monthly expiries only
+    for i in range(180):
+        spot = rng.uniform(100, 5000)
+        step = 5 if spot < 500 else (10 if spot < 2000 else 50)
+        chain(f"STK{i:04d}", "NFO", spot, step, 30, monthlies, rng.choice([250, 500, 1000]))
+
+    # Commodities and currencies
+    for name, spot, step in [("CRUDEOIL", 6500, 50), ("GOLD", 62000, 100), ("SILVER", 72000, 250), ("NATURALGAS", 200, 5)]:
+        chain(name, "MCX", spot, step, 40, monthlies, 1)
+    for name, spot, step in [("USDINR", 83, 0.25), ("EURINR", 90, 0.25)]:
+        chain(name, "CDS", spot, step, 40, weeklies[:4], 1000)
+
+    return rows
+
 # --- Mock Kite Class ---
 class MockKiteConnect:
-    def __init__(self, api_key=None, **kwargs):
+    def __init__(self, api_key=None, full_universe=False, **kwargs):
         print(f"⚠️ [MOCK BROKER] Initialized.", flush=True)
-        self.mock_instruments = self._generate_instruments()
+        self.mock_instruments = self._generate_instruments(full_universe)
 
-    def _generate_instruments(self):
+    def _generate_instruments(self, full_universe=False):
+        """
+        Demo instruments (NIFTY/BANKNIFTY chain around the simulated spot). With `full_universe`,
+        a synthetic master list the size of the real Kite dump is appended (for benchmarks).
+        """
         inst_list = []
         global TOKEN_TO_SYMBOL
         
@@ -104,6 +166,7 @@ class MockKiteConnect:
         # 1. Indices
         add_inst(256265, "NIFTY 50", "NIFTY", "NSE", "EQ", 1)
         add_inst(260105, "NIFTY BANK", "BANKNIFTY", "NSE", "EQ", 1)
+        add_inst(265, "SENSEX", "SENSEX", "BSE", "EQ", 1)
         add_inst(738561, "RELIANCE", "RELIANCE", "NSE", "EQ", 1)
 
         # 2. Futures
@@ -126,6 +189,9 @@ class MockKiteConnect:
             if f"NFO:{ce_sym}" not in MOCK_MARKET_DATA: MOCK_MARKET_DATA[f"NFO:{ce_sym}"] = calculate_option_price(spot, strike, "CE")
             if f"NFO:{pe_sym}" not in MOCK_MARKET_DATA: MOCK_MARKET_DATA[f"NFO:{pe_sym}"] = calculate_option_price(spot, strike, "PE")
 
+        if full_universe:
+            inst_list.extend(_synthetic_universe())
+
         return inst_list
 
     def login_url(self): return "/mock-login-trigger"
@@ -146,14 +212,17 @@ class MockKiteConnect:
     def ltp(self, instruments): return self.quote(instruments)
 
     def place_order(self, **kwargs): 
+        time.sleep(SIM_CONFIG["order_latency"])
         print(f"✅ [MOCK] Order Placed: {kwargs.get('tradingsymbol')}")
         return f"ORD_{random.randint(10000,99999)}"
         
     def modify_order(self, **kwargs):
+        time.sleep(SIM_CONFIG["order_latency"])
         print(f"✅ [MOCK] Order Modified: {kwargs.get('order_id')}")
         return True
         
     def cancel_order(self, **kwargs):
+        time.sleep(SIM_CONFIG["order_latency"])
         print(f"✅ [MOCK] Order Cancelled: {kwargs.get('order_id')}")
         return True
 
@@ -173,6 +242,8 @@ class MockKiteConnect:
 
 # --- NEW: Mock Ticker for WebSocket ---
 class MockKiteTicker:
+    MODE_FULL = "full"
+
     def __init__(self, api_key, access_token):
         self.api_key = api_key
         self.access_token = access_token
@@ -200,6 +271,10 @@ class MockKiteTicker:
         self.subscribed_tokens.update(tokens)
         print(f"📡 [MOCK TICKER] Subscribed to {len(tokens)} tokens")
 
+    def unsubscribe(self, tokens):
+        self.subscribed_tokens.difference_update(tokens)
+        print(f"📡 [MOCK TICKER] Unsubscribed from {len(tokens)} tokens")
+
     def set_mode(self, mode, tokens):
         pass 
 
@@ -39,6 +39,12 @@ def set_trend():
     SIM_CONFIG["trend"] = trend
     return jsonify({"status": "success", "message": f"Market Trend set to {trend}"})
 
+@app.route('/demo/set_order_latency', methods=['POST'])
+def set_order_latency():
+    latency = float(request.form.get('latency', 0))
+    SIM_CONFIG["order_latency"] = latency
+    return jsonify({"status": "success", "message": f"Broker order latency set to {latency}s"})
+
 @app.route('/demo/set_price', methods=['POST'])
 def demo_set_price():
     sym = request.form.get('symbol')
@@ -1,6 +1,21 @@
 import json
+import os
+import copy
+import uuid
+import time
+import threading
+from types import MappingProxyType
+import redis
 from database import db, AppSetting
 
+# Settings change rarely but are read on every order and notification: they are served from
+# memory and reloaded only after a save (in this worker, or in another one announced via Redis)
+SETTINGS_CHANNEL = "settings_updates"
+_cache_lock = threading.Lock()
+_cache = {"version": 0, "data": None, "frozen": None}
+_origin = uuid.uuid4().hex     # Identifies this process in pubsub messages
+_redis = None
+
 def get_defaults():
     # Define default settings for a mode
     default_mode_settings = {
@@ -63,7 +78,77 @@ def get_defaults():
         }
     }
 
+def _freeze(obj):
+    """Read-only view of nested settings (dicts -> mappingproxy, lists -> tuples)."""
+    if isinstance(obj, dict): return MappingProxyType({k: _freeze(v) for k, v in obj.items()})
+    if isinstance(obj, list): return tuple(_freeze(v) for v in obj)
+    return obj
+
+def _current():
+    """
+    (data, frozen) of the cached settings, loaded from the DB on first use / after invalidation.
+    Captured under the lock, so a concurrent invalidate() cannot hand out a half-cleared entry.
+    """
+    with _cache_lock:
+        if _cache["data"] is None:
+            data = _load_from_db()
+            if data is None:
+                data = get_defaults() # Not cached: retry next call
+                return data, _freeze(data)
+            _cache["data"], _cache["frozen"] = data, _freeze(data)
+        return _cache["data"], _cache["frozen"]
+
+def get_settings():
+    """Immutable snapshot of the current settings (no DB access once cached). Use for reads."""
+    return _current()[1]
+
 def load_settings():
+    """Mutable copy of the current settings (served from the cache)."""
+    return copy.deepcopy(_current()[0])
+
+def settings_version():
+    return _cache["version"]
+
+def invalidate():
+    """Drops the cached settings and bumps the version; the next read reloads them."""
+    with _cache_lock:
+        _cache["data"], _cache["frozen"] = None, None
+        _cache["version"] += 1
+
+def _get_redis():
+    global _redis
+    if _redis is None:
+        _redis = redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/0"), decode_responses=True)
+    return _redis
+
+def _publish_change():
+    try:
+        r = _get_redis()
+        version = r.incr("SETTINGS_VERSION")
+        r.publish(SETTINGS_CHANNEL, json.dumps({"origin": _origin, "version": version}))
+    except Exception as e:
+        print(f"⚠️ Settings change not broadcast (other workers keep their cache): {e}")
+
+def start_sync():
+    """Listens for settings saves of other workers and invalidates the local cache (background thread)."""
+    def listen():
+        while True:
+            try:
+                pubsub = _get_redis().pubsub()
+                pubsub.subscribe(SETTINGS_CHANNEL)
+                for message in pubsub.listen():
+                    if message['type'] == 'subscribe':
+                        invalidate() # (Re)connected: changes may have been missed
+                    elif message['type'] == 'message':
+                        if json.loads(message['data']).get('origin') != _origin:
+                            invalidate()
+            except Exception as e:
+                print(f"⚠️ Settings Sync Error: {e}")
+            time.sleep(5)
+    threading.Thread(target=listen, daemon=True).start()
+
+def _load_from_db():
+    """Reads and default-merges the stored settings. None on error."""
     defaults = get_defaults()
     try:
         setting = AppSetting.query.first()
@@ -114,7 +199,9 @@ def load_settings():
                         saved["auth_credentials"][k] = v
 
             return saved
-    except Exception as e: print(f"Error loading settings: {e}")
+    except Exception as e:
+        print(f"Error loading settings: {e}")
+        return None
     return defaults
 
 def save_settings_file(data):
@@ -144,6 +231,8 @@ def save_settings_file(data):
             setting.data = json.dumps(data)
             
         db.session.commit()
+        invalidate()
+        _publish_change()
         return True
     except Exception as e:
         print(f"Settings Save Error: {e}")
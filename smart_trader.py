@@ -1,7 +1,13 @@
+import os
+import glob
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 import pytz
 import re
+import config
+from managers.price_cache import price_cache
+from managers.quote_service import quotes
 
 # Global IST Timezone
 IST = pytz.timezone('Asia/Kolkata')
@@ -10,16 +16,140 @@ instrument_dump = None
 symbol_map = {} 
 criteria_map = {} # <--- NEW GLOBAL CACHE
 
+# --- ON-DISK INSTRUMENT CACHE ---
+# The instrument dump is stored once per trading day, so a restart mid-session loads it from disk
+# instead of downloading the full master list; the lookup maps are rebuilt from it (vectorized, fast).
+# Data-only formats (never pickle: loading the cache must not be able to execute code):
+# Parquet when pyarrow is installed, else a column-per-array .npz read with allow_pickle=False.
+try:
+    import pyarrow  # noqa: F401 (enables pandas' Parquet engine)
+    CACHE_FORMAT = 'parquet'
+except ImportError:
+    CACHE_FORMAT = 'npz'
+
+def _trading_day():
+    """Label of the current instrument day (Kite publishes the new master list in the morning)."""
+    now = datetime.now(IST)
+    hh, mm = map(int, config.INSTRUMENT_REFRESH_TIME.split(':'))
+    if (now.hour, now.minute) < (hh, mm): now -= timedelta(days=1)
+    return now.strftime("%Y-%m-%d")
+
+def _instrument_cache_path(kite, day):
+    # Keyed by client class too, so the demo's mock instruments never leak into a live run
+    return os.path.join(config.INSTRUMENT_CACHE_DIR, f"instruments_{type(kite).__name__}_{day}.{CACHE_FORMAT}")
+
+def _prepare_dump(df):
+    """Adds the parsed expiry columns: expiry_str (lookup keys) and expiry_date (comparisons)."""
+    if 'expiry' in df.columns:
+        expiry = pd.to_datetime(df['expiry'], errors='coerce')
+        df['expiry_str'] = expiry.dt.strftime('%Y-%m-%d')
+        df['expiry_date'] = expiry.dt.date
+    return df
+
+def _cache_frame(df):
+    """Plain-typed copy of the dump: derived columns dropped, expiry kept as ISO text."""
+    out = df.drop(columns=['expiry_str', 'expiry_date'], errors='ignore')
+    if 'expiry_str' in df.columns:
+        out = out.assign(expiry=df['expiry_str'].fillna(''))
+    return out
+
+def _write_npz(f, df):
+    """One array per column; text columns as fixed-width unicode plus a null mask where needed."""
+    arrays = {'__columns__': np.array(df.columns.tolist(), dtype=str)}
+    for i, col in enumerate(df.columns):
+        s = df[col]
+        if pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+            arrays[f"c{i}"] = s.to_numpy()
+        else:
+            null = s.isna().to_numpy()
+            arrays[f"c{i}"] = s.where(~null, '').astype(str).to_numpy(dtype=str)
+            if null.any(): arrays[f"n{i}"] = null
+    np.savez(f, **arrays)
+
+def _read_npz(path):
+    with np.load(path, allow_pickle=False) as data:
+        cols = {}
+        for i, col in enumerate(data['__columns__'].tolist()):
+            values = pd.Series(data[f"c{i}"])
+            if values.dtype.kind == 'U': values = values.astype(object)
+            if f"n{i}" in data.files: values[data[f"n{i}"]] = None
+            cols[col] = values
+    return pd.DataFrame(cols)
+
+def _load_instrument_cache(kite):
+    global instrument_dump, symbol_map, criteria_map
+    path = _instrument_cache_path(kite, _trading_day())
+    if not os.path.exists(path): return False
+    try:
+        df = pd.read_parquet(path) if CACHE_FORMAT == 'parquet' else _read_npz(path)
+        df = _prepare_dump(df)
+        symbol_map, criteria_map = build_lookup_maps(df)
+        instrument_dump = df
+        print(f"✅ Instruments Loaded from Disk Cache ({os.path.basename(path)}). Count: {len(instrument_dump)}")
+        return True
+    except Exception as e:
+        print(f"⚠️ Instrument Cache Unreadable ({e}). Downloading...")
+        return False
+
+def _save_instrument_cache(kite):
+    day = _trading_day()
+    path = _instrument_cache_path(kite, day)
+    try:
+        os.makedirs(config.INSTRUMENT_CACHE_DIR, mode=0o700, exist_ok=True)
+        tmp = f"{path}.tmp"
+        # Owner-only file (created 0600, not subject to the umask's group/other bits)
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'wb') as f:
+            df = _cache_frame(instrument_dump)
+            if CACHE_FORMAT == 'parquet': df.to_parquet(f, index=False)
+            else: _write_npz(f, df)
+        os.replace(tmp, path) # Atomic: readers never see a partial file
+        # Older days (and caches in other formats, e.g. legacy pickles) are stale for good
+        for old in glob.glob(os.path.join(config.INSTRUMENT_CACHE_DIR, f"instruments_{type(kite).__name__}_*")):
+            if old != path: os.remove(old)
+    except Exception as e:
+        print(f"⚠️ Instrument Cache Write Failed: {e}")
+
+def build_lookup_maps(df):
+    """
+    Builds (symbol_map, criteria_map) from the instrument dump with column operations only.
+    symbol_map:   tradingsymbol -> row dict, best exchange first (NFO > MCX > CDS > NSE > BSE)
+    criteria_map: (NAME, EXPIRY, TYPE, STRIKE) -> tradingsymbol, for O(1) get_exact_symbol
+    """
+    # Prioritize exchanges: NFO > MCX > CDS > NSE > BSE
+    exchange_priority = {'NFO': 0, 'MCX': 1, 'CDS': 2, 'NSE': 3, 'BSE': 4, 'BFO': 5}
+    temp_df = df.assign(priority=df['exchange'].map(exchange_priority).fillna(99))
+    
+    # Sort by priority so the "best" exchange comes first, then drop duplicates on tradingsymbol
+    unique_symbols = temp_df.sort_values('priority', kind='stable').drop_duplicates(subset=['tradingsymbol'])
+    
+    # 1. Symbol Map
+    symbols = unique_symbols['tradingsymbol'].tolist()
+    symbol_map = dict(zip(symbols, unique_symbols.drop(columns='tradingsymbol').to_dict('records')))
+    
+    # 2. Criteria Map (Options/Futures have expiry)
+    if 'expiry_str' not in unique_symbols.columns: return symbol_map, {}
+    subset = unique_symbols.dropna(subset=['name', 'expiry_str', 'instrument_type'])
+    # Strike is stored as float to handle mismatches (21500 vs 21500.0)
+    strikes = pd.to_numeric(subset['strike'], errors='coerce').fillna(0.0).astype(float)
+    keys = zip(subset['name'].tolist(), subset['expiry_str'].tolist(), subset['instrument_type'].tolist(), strikes.tolist())
+    criteria_map = dict(zip(keys, subset['tradingsymbol'].tolist()))
+    return symbol_map, criteria_map
+
 def fetch_instruments(kite):
     """
     Downloads the master instrument list, optimizes dates, and builds fast lookup maps.
     Prioritizes specific exchanges (NFO > MCX > NSE) to handle duplicate symbols.
+    Uses the on-disk cache of the current trading day when present.
     """
     global instrument_dump, symbol_map, criteria_map
     
     # If already loaded and maps exist, skip to save bandwidth
     if instrument_dump is not None and not instrument_dump.empty and symbol_map: 
         return
+    
+    if _load_instrument_cache(kite):
+        return
 
     print("📥 Downloading Instrument List...")
     try:
@@ -28,47 +158,14 @@ def fetch_instruments(kite):
             print("⚠️ Warning: Kite returned empty instrument list.")
             return
 
-        instrument_dump = pd.DataFrame(instruments)
-        
         # Optimize Dates
-        if 'expiry' in instrument_dump.columns:
-            instrument_dump['expiry_str'] = pd.to_datetime(instrument_dump['expiry'], errors='coerce').dt.strftime('%Y-%m-%d')
-            instrument_dump['expiry_date'] = pd.to_datetime(instrument_dump['expiry'], errors='coerce').dt.date
+        instrument_dump = _prepare_dump(pd.DataFrame(instruments))
         
         print("⚡ Building Fast Lookup Cache...")
-        
-        # Create a copy to sort and deduplicate without affecting the main search dump
-        temp_df = instrument_dump.copy()
-        
-        # Prioritize exchanges: NFO > MCX > CDS > NSE > BSE
-        exchange_priority = {'NFO': 0, 'MCX': 1, 'CDS': 2, 'NSE': 3, 'BSE': 4, 'BFO': 5}
-        temp_df['priority'] = temp_df['exchange'].map(exchange_priority).fillna(99)
-        
-        # Sort by priority so the "best" exchange comes first
-        temp_df.sort_values('priority', inplace=True)
-        
-        # Drop duplicates on tradingsymbol
-        unique_symbols = temp_df.drop_duplicates(subset=['tradingsymbol'])
-        
-        # 1. Build Symbol Map (Existing)
-        symbol_map = unique_symbols.set_index('tradingsymbol').to_dict('index')
-        
-        # 2. Build Criteria Map (NEW OPTIMIZATION)
-        # This enables O(1) lookup for: get_exact_symbol(NIFTY, 2024-01-25, 21500, CE)
-        criteria_map = {}
-        # Filter for relevant rows to speed up iteration (Options/Futures have expiry)
-        subset = unique_symbols.dropna(subset=['name', 'expiry_str', 'instrument_type'])
-        
-        for _, row in subset.iterrows():
-            try:
-                # Key: (NAME, EXPIRY, TYPE, STRIKE)
-                # Strike is stored as float to handle mismatches (21500 vs 21500.0)
-                s_val = float(row['strike']) if row['strike'] else 0.0
-                key = (row['name'], row['expiry_str'], row['instrument_type'], s_val)
-                criteria_map[key] = row['tradingsymbol']
-            except: continue
+        symbol_map, criteria_map = build_lookup_maps(instrument_dump)
         
         print(f"✅ Instruments Downloaded & Indexed. Count: {len(instrument_dump)}")
+        _save_instrument_cache(kite)
         
     except Exception as e:
         print(f"❌ Failed to fetch instruments: {e}")
@@ -100,6 +197,28 @@ def get_exchange_name(symbol):
     # Default to NSE if unable to determine
     return "NSE"
 
+def _quote_ltp(kite, full_sym):
+    """
+    LTP for an exchange-qualified symbol: the streamed/cached price while it is fresh
+    (LTP_MAX_AGE), otherwise a REST quote (which refreshes the cache). 0 if unavailable.
+    """
+    if not price_cache.is_bound(full_sym):
+        # Bind to the streamed token when the instrument map knows it
+        exch, _, ts = full_sym.partition(":")
+        row = symbol_map.get(ts) if symbol_map else None
+        if row and row.get('exchange') == exch:
+            price_cache.bind(full_sym, row.get('instrument_token'))
+
+    ltp = price_cache.get(full_sym)
+    if ltp is not None: return ltp
+
+    quote = quotes.quote(kite, full_sym)
+    if quote and full_sym in quote:
+        price_cache.bind(full_sym, quote[full_sym].get('instrument_token'))
+        price_cache.put(full_sym, quote[full_sym]['last_price'])
+        return quote[full_sym]['last_price']
+    return 0
+
 def get_ltp(kite, symbol):
     """
     Fetches the Last Traded Price (LTP) with automatic exchange detection.
@@ -107,28 +226,21 @@ def get_ltp(kite, symbol):
     try:
         # 1. If symbol already has exchange (e.g., NSE:RELIANCE), try directly
         if ":" in symbol:
-            quote = kite.quote(symbol)
-            if quote and symbol in quote:
-                return quote[symbol]['last_price']
+            ltp = _quote_ltp(kite, symbol)
+            if ltp: return ltp
 
         # 2. Determine Exchange
         exch = get_exchange_name(symbol)
         
-        # 3. Fetch Quote with constructed format
-        full_sym = f"{exch}:{symbol}"
-        quote = kite.quote(full_sym)
-        
-        if quote and full_sym in quote:
-            return quote[full_sym]['last_price']
-            
-        return 0
+        # 3. Cached / quoted price with constructed format
+        return _quote_ltp(kite, f"{exch}:{symbol}")
     except Exception as e:
         print(f"⚠️ Error fetching LTP for {symbol}: {e}")
         return 0
 
 def get_indices_ltp(kite):
     try:
-        q = kite.quote(["NSE:NIFTY 50", "NSE:NIFTY BANK", "BSE:SENSEX"])
+        q = quotes.quote(kite, ["NSE:NIFTY 50", "NSE:NIFTY BANK", "BSE:SENSEX"])
         return {
             "NIFTY": q.get("NSE:NIFTY 50", {}).get('last_price', 0),
             "BANKNIFTY": q.get("NSE:NIFTY BANK", {}).get('last_price', 0),
@@ -211,15 +323,15 @@ def search_symbols(kite, keyword, allowed_exchanges=None):
         unique_matches = matches.drop_duplicates(subset=['name', 'exchange']).head(10)
         items_to_quote = [f"{row['exchange']}:{row['tradingsymbol']}" for _, row in unique_matches.iterrows()]
         
-        quotes = {}
+        quoted = {}
         try:
-            if items_to_quote: quotes = kite.quote(items_to_quote)
+            if items_to_quote: quoted = quotes.quote(kite, items_to_quote)
         except: pass
         
         results = []
         for _, row in unique_matches.iterrows():
             key = f"{row['exchange']}:{row['tradingsymbol']}"
-            ltp = quotes.get(key, {}).get('last_price', 0)
+            ltp = quoted.get(key, {}).get('last_price', 0)
             results.append(f"{row['name']} ({row['exchange']}) : {ltp}")
             
         return results
@@ -268,9 +380,7 @@ def get_symbol_details(kite, symbol, preferred_exchange=None):
     if clean == "SENSEX": quote_sym = "BSE:SENSEX"
     
     ltp = 0
-    try:
-        q = kite.quote(quote_sym)
-        if quote_sym in q: ltp = q[quote_sym]['last_price']
+    try: ltp = _quote_ltp(kite, quote_sym)
     except: pass
         
     if ltp == 0:
@@ -281,7 +391,7 @@ def get_symbol_details(kite, symbol, preferred_exchange=None):
                 if not futs_all.empty:
                     near_fut = futs_all.sort_values('expiry_date').iloc[0]
                     fut_sym = f"{near_fut['exchange']}:{near_fut['tradingsymbol']}"
-                    ltp = kite.quote(fut_sym)[fut_sym]['last_price']
+                    ltp = _quote_ltp(kite, fut_sym)
         except: pass
 
     lot = 1
@@ -373,7 +483,7 @@ def get_specific_ltp(kite, symbol, expiry, strike, inst_type):
              row = instrument_dump[instrument_dump['tradingsymbol'] == ts]
              if not row.empty: exch = row.iloc[0]['exchange']
              
-        return kite.quote(f"{exch}:{ts}")[f"{exch}:{ts}"]['last_price']
+        return _quote_ltp(kite, f"{exch}:{ts}")
     except: return 0
 
 def get_instrument_token(tradingsymbol, exchange):
@@ -420,25 +420,41 @@ $(document).ready(function() {
     if (typeof socket !== 'undefined') {
         console.log("✅ History.js: Listening for Closed Trade Updates...");
         
-        socket.on('closed_trade_update', function(updates) {
-            updates.forEach(t => {
-                // 1. Update Global Cache
-                let existing = allClosedTrades.find(x => x.id == t.id);
-                if(existing) {
-                    existing.current_ltp = t.current_ltp;
-                    existing.made_high = t.made_high; 
-                }
+        var closedSeq = null; // Last applied sequence of the closed-trade delta feed
+
+        function applyClosedUpdate(id, fields) {
+            // 1. Update Global Cache
+            let existing = allClosedTrades.find(x => x.id == id);
+            if(existing) Object.assign(existing, fields);
+            if(fields.current_ltp === undefined || fields.current_ltp === null) return;
+
+            // 2. Direct DOM Update for Live LTP
+            let el = $(`#ltp-${id}`);
+            if(el.length) {
+                el.text(fields.current_ltp.toFixed(2));
+                
+                // Flash effect
+                let entry = existing ? existing.entry_price : fields.current_ltp;
+                el.removeClass('text-success text-danger');
+                el.addClass(fields.current_ltp >= entry ? 'text-success' : 'text-danger');
+            }
+        }
 
-                // 2. Direct DOM Update for Live LTP
-                let el = $(`#ltp-${t.id}`);
-                if(el.length) {
-                    el.text(t.current_ltp.toFixed(2));
-                    
-                    // Flash effect
-                    el.removeClass('text-success text-danger');
-                    el.addClass(t.current_ltp >= t.entry_price ? 'text-success' : 'text-danger');
-                }
-            });
+        socket.on('closed_snapshot', function(snap) {
+            closedSeq = snap.seq;
+            (snap.trades || []).forEach(t => applyClosedUpdate(t.id, t));
+        });
+
+        socket.on('closed_patch', function(p, ack) {
+            if (ack) ack();
+            // Gap detected (missed a patch): ask for a fresh snapshot
+            if (closedSeq === null || p.from !== closedSeq) {
+                closedSeq = null;
+                socket.emit('resync', {channel: 'closed'});
+                return;
+            }
+            closedSeq = p.seq;
+            Object.keys(p.patches || {}).forEach(id => applyClosedUpdate(id, p.patches[id]));
         });
     } else {
         console.warn("⚠️ History.js: 'socket' is undefined. Make sure main.js is loaded BEFORE history.js in dashboard.html");
@@ -1,5 +1,6 @@
 // Global Socket Object
 var socket = null;
+var positionsSeq = null; // Last applied sequence of the positions delta feed
 
 $(document).ready(function() {
     // --- CONFIGURATION ---
@@ -19,19 +20,35 @@ $(document).ready(function() {
         $('#status-badge').attr('class', 'badge bg-danger shadow-sm').html('Socket Lost');
     });
 
-    // 1. LISTEN FOR TRADE UPDATES (Active Positions)
-    socket.on('trade_update', function(data) {
+    // 1. LISTEN FOR TRADE UPDATES (Active Positions) - Snapshot + Sequenced Patches
+    socket.on('trade_snapshot', function(snap) {
+        positionsSeq = snap.seq;
         if(typeof renderActivePositions === 'function') {
-            renderActivePositions(data);
+            renderActivePositions(snap.positions);
+        }
+    });
+
+    socket.on('trade_patch', function(p, ack) {
+        if (ack) ack(); // Lets the server know this client keeps up
+        // Gap detected (missed a patch): ask for a fresh snapshot
+        if (positionsSeq === null || p.from !== positionsSeq) {
+            positionsSeq = null;
+            socket.emit('resync', {channel: 'positions'});
+            return;
+        }
+        positionsSeq = p.seq;
+        if(typeof applyPositionPatch === 'function') {
+            applyPositionPatch(p);
         }
     });
 
     // 2. LISTEN FOR INDEX UPDATES (Ticker Bar) <--- THIS WAS MISSING
-    socket.on('index_update', function(data) {
-        // data format: { "NIFTY 50": 22150.5, "NIFTY BANK": 46500.2, ... }
-        if (data['NIFTY 50']) $('#n_lp').text(data['NIFTY 50'].toFixed(2));
-        if (data['NIFTY BANK']) $('#b_lp').text(data['NIFTY BANK'].toFixed(2));
-        if (data['BSE SENSEX']) $('#s_lp').text(data['BSE SENSEX'].toFixed(2));
+    socket.on('index_update', function(data, ack) {
+        if (ack) ack();
+        // data format: { "NIFTY": 22150.5, "BANKNIFTY": 46500.2, "SENSEX": 72010.4 }
+        if (data.NIFTY) $('#n_lp').text(data.NIFTY.toFixed(2));
+        if (data.BANKNIFTY) $('#b_lp').text(data.BANKNIFTY.toFixed(2));
+        if (data.SENSEX) $('#s_lp').text(data.SENSEX.toFixed(2));
     });
 
     // ---------------------------------
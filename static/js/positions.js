@@ -1,12 +1,18 @@
 var activeTradesList = [];
 
+// Version cursors for incremental /api/sync (reset when the server epoch changes)
+var syncEpoch = null, syncVersion = null, closedSyncVersion = null;
+
 // 1. Main Sync Loop
 // Fetches Indices, System Status, and specific LTP for Forms
 function updateData() {
     // A. Prepare Request
     let payload = {
         include_closed: $('#closed').is(':visible'), // Save bandwidth: only fetch closed if tab is open
-        ltp_req: null
+        ltp_req: null,
+        epoch: syncEpoch,
+        since: syncVersion,
+        closed_since: closedSyncVersion
     };
 
     // Check if Import Modal is open (Priority for LTP)
@@ -92,14 +98,28 @@ function updateData() {
                 }
             }
 
+            // Advance cursors (closed cursor only while the closed tab is being synced)
+            syncEpoch = d.epoch;
+            syncVersion = d.version;
+            closedSyncVersion = payload.include_closed ? d.version : null;
+            if (d.unchanged) return;
+
             // 4. Update Active Positions (Fallback for Socket)
             // Only update if socket is not firing (or to ensure sync)
-            if(d.positions) {
+            if (d.positions_delta) {
+                if (d.positions.length || d.removed_positions.length) {
+                    applyPositionPatch({upserts: d.positions, removed: d.removed_positions});
+                }
+            } else if(d.positions) {
                 renderActivePositions(d.positions);
             }
 
             // 5. Update Closed Trades (if requested)
-            if (d.closed_trades && d.closed_trades.length > 0) {
+            if (d.closed_delta) {
+                if ((d.closed_trades.length || d.removed_closed.length) && typeof renderClosedTrades === 'function') {
+                    renderClosedTrades(mergeClosedTrades(allClosedTrades, d.closed_trades, d.removed_closed));
+                }
+            } else if (d.closed_trades && d.closed_trades.length > 0) {
                 if(typeof renderClosedTrades === 'function') renderClosedTrades(d.closed_trades);
             }
         },
@@ -109,6 +129,33 @@ function updateData() {
     });
 }
 
+// Merges changed/removed history records into the closed list (newest first)
+function mergeClosedTrades(list, changed, removed) {
+    let drop = new Set(removed.map(String));
+    changed.forEach(t => drop.add(String(t.id)));
+    return list.filter(t => !drop.has(String(t.id))).concat(changed).sort((a, b) => b.id - a.id);
+}
+
+// Applies a delta patch {patches: {id: {field: value}}, upserts: [trade], removed: [id]}
+function applyPositionPatch(p) {
+    let byId = {};
+    activeTradesList.forEach(t => byId[String(t.id)] = t);
+
+    (p.upserts || []).forEach(u => {
+        let t = byId[String(u.id)];
+        if (t) Object.assign(t, u);
+        else { activeTradesList.push(u); byId[String(u.id)] = u; }
+    });
+    Object.keys(p.patches || {}).forEach(id => {
+        let t = byId[String(id)];
+        if (t) Object.assign(t, p.patches[id]);
+    });
+    let removed = (p.removed || []).map(String);
+    if (removed.length) activeTradesList = activeTradesList.filter(t => !removed.includes(String(t.id)));
+
+    renderActivePositions(activeTradesList);
+}
+
 function renderActivePositions(trades) {
     activeTradesList = trades; 
     
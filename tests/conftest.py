@@ -0,0 +1,25 @@
+import os
+import sys
+import pytest
+
+# Tests import the app modules the way main.py does (from the repository root)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from database import db
+
+@pytest.fixture
+def app():
+    """Flask app on an in-memory SQLite database with all tables created."""
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+@pytest.fixture
+def app_ctx(app):
+    with app.app_context():
+        yield app
+        db.session.remove()
@@ -0,0 +1,46 @@
+import json
+from sqlalchemy import text
+from database import db, TradeHistory
+from managers import persistence, broker_ops
+
+def closed(id_, mode="PAPER", pnl=None, booked=None, exit_time="2026-10-16 15:00:00"):
+    t = {"id": id_, "mode": mode, "symbol": "X", "status": "SL_HIT", "entry_price": 100.0,
+         "quantity": 50, "exit_time": exit_time}
+    if pnl is not None: t["pnl"] = pnl
+    if booked is not None: t["booked_pnl"] = booked
+    return t
+
+def test_day_sum_includes_partial_exits(app_ctx):
+    persistence.save_to_history_db(closed(1, pnl=-100.0, booked=300.0))
+    persistence.save_to_history_db(closed(2, pnl=50.0))
+    persistence.save_to_history_db(closed(3, mode="LIVE", pnl=10.0))
+    persistence.save_to_history_db(closed(4, pnl=999.0, exit_time="2026-10-15 15:00:00"))
+    assert persistence.history_pnl_by_mode("2026-10-16") == {"PAPER": 250.0, "LIVE": 10.0}
+    assert persistence.history_summary(1) == {"mode": "PAPER", "exit_date": "2026-10-16", "pnl": 200.0}
+
+def test_move_to_history_keeps_pnl_exit_only(app_ctx, monkeypatch):
+    booked = []
+    monkeypatch.setattr(broker_ops.ledger, "book", lambda mode, amount: booked.append(amount))
+    t = {"id": 5, "mode": "PAPER", "symbol": "X", "status": "OPEN", "entry_price": 100.0,
+         "quantity": 100, "logs": [], "instrument_token": 1}
+    broker_ops.book_partial_exit(t, 50, 110.0)
+    t["quantity"] -= 50
+    broker_ops.move_to_history(t, "SL_HIT", 95.0)
+    assert t["booked_pnl"] == 500.0 and t["pnl"] == -250.0
+    assert booked == [500.0, -250.0]
+    row = db.session.get(TradeHistory, 5)
+    assert (row.pnl, row.booked_pnl) == (-250.0, 500.0)
+
+def test_migration_splits_booked_pnl_out_of_pnl(app_ctx):
+    # Table as it was before the booked_pnl column, with a row whose pnl included partials
+    db.session.execute(text("ALTER TABLE trade_history DROP COLUMN booked_pnl"))
+    db.session.execute(text("INSERT INTO trade_history (id, data, mode, exit_date, pnl) VALUES (:id, :data, 'PAPER', '2026-10-16', 200.0)"),
+                       {"id": 7, "data": json.dumps(closed(7, pnl=200.0, booked=300.0))})
+    db.session.execute(text("INSERT INTO trade_history (id, data, mode, exit_date, pnl) VALUES (:id, :data, 'PAPER', '2026-10-16', 40.0)"),
+                       {"id": 8, "data": json.dumps(closed(8, pnl=40.0))})
+    db.session.commit()
+    persistence.migrate_history_columns()
+    row = db.session.get(TradeHistory, 7)
+    assert (row.pnl, row.booked_pnl, json.loads(row.data)["pnl"]) == (-100.0, 300.0, -100.0)
+    assert db.session.get(TradeHistory, 8).pnl == 40.0
+    assert persistence.history_pnl_by_mode("2026-10-16") == {"PAPER": 240.0}
@@ -0,0 +1,48 @@
+import os
+import config
+import smart_trader
+
+class FakeKite:
+    def __init__(self, instruments): self._instruments = instruments
+    def instruments(self): return self._instruments
+
+INSTRUMENTS = [
+    {"instrument_token": 1, "tradingsymbol": "NIFTY26OCT25000CE", "name": "NIFTY", "exchange": "NFO",
+     "instrument_type": "CE", "expiry": "2026-10-27", "strike": 25000.0, "lot_size": 75},
+    {"instrument_token": 2, "tradingsymbol": "NIFTY26OCTFUT", "name": "NIFTY", "exchange": "NFO",
+     "instrument_type": "FUT", "expiry": "2026-10-27", "strike": 0.0, "lot_size": 75},
+    {"instrument_token": 3, "tradingsymbol": "INFY", "name": None, "exchange": "NSE",
+     "instrument_type": "EQ", "expiry": "", "strike": 0.0, "lot_size": 1},
+]
+
+def reset():
+    smart_trader.instrument_dump, smart_trader.symbol_map, smart_trader.criteria_map = None, {}, {}
+
+def test_cache_round_trip_rebuilds_maps(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "INSTRUMENT_CACHE_DIR", str(tmp_path))
+    reset()
+    smart_trader.fetch_instruments(FakeKite(INSTRUMENTS))
+    built = smart_trader.symbol_map, smart_trader.criteria_map
+
+    reset()
+    smart_trader.fetch_instruments(FakeKite([]))         # Served from disk: no download
+    assert smart_trader.criteria_map == built[1] == {
+        ("NIFTY", "2026-10-27", "CE", 25000.0): "NIFTY26OCT25000CE",
+        ("NIFTY", "2026-10-27", "FUT", 0.0): "NIFTY26OCTFUT",
+    }
+    assert smart_trader.symbol_map.keys() == built[0].keys()
+    assert smart_trader.symbol_map["NIFTY26OCTFUT"]["expiry_date"].isoformat() == "2026-10-27"
+    assert smart_trader.instrument_dump["name"].isna().tolist() == [False, False, True]
+    reset()
+
+def test_cache_file_is_data_only_and_private(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "INSTRUMENT_CACHE_DIR", str(tmp_path))
+    stale = tmp_path / "instruments_FakeKite_2000-01-01.pkl"
+    stale.write_bytes(b"old")
+    reset()
+    smart_trader.fetch_instruments(FakeKite(INSTRUMENTS))
+    files = os.listdir(tmp_path)
+    assert files == [os.path.basename(smart_trader._instrument_cache_path(FakeKite([]), smart_trader._trading_day()))]
+    assert files[0].endswith(("." + smart_trader.CACHE_FORMAT))
+    assert os.stat(tmp_path / files[0]).st_mode & 0o777 == 0o600
+    reset()
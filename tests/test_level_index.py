@@ -0,0 +1,80 @@
+from managers.level_index import RiskLevelIndex
+
+def trade(id_, token=5, sl=90.0, targets=(110.0, 120.0, 130.0), hit=(), trailing=0, high=100.0, status="OPEN"):
+    return {"id": id_, "instrument_token": token, "sl": sl, "targets": list(targets),
+            "targets_hit_indices": list(hit), "trailing_sl": trailing, "highest_ltp": high, "status": status}
+
+def build(*trades):
+    index = RiskLevelIndex(lambda: list(trades))
+    return index
+
+def test_no_cross_inside_levels():
+    index = build(trade(1))
+    assert index.crossed_ids({5: 95.0}) == set()
+
+def test_sl_boundary_is_inclusive():
+    index = build(trade(1))
+    assert index.crossed_ids({5: 90.0}) == {1}
+
+def test_next_unhit_target_and_new_high():
+    index = build(trade(1, hit=[0], high=125.0), trade(2, high=100.0))
+    assert index.crossed_ids({5: 100.5}) == {2}         # New high only (strictly above)
+    index = build(trade(1, hit=[0], high=125.0))
+    assert index.crossed_ids({5: 115.0}) == set()       # T1 already hit: next target is 120
+    assert index.crossed_ids({5: 120.0}) == {1}
+
+def test_trailing_trigger():
+    index = build(trade(1, trailing=5.0, high=200.0, targets=(300.0,)))
+    assert index.crossed_ids({5: 99.9}) == set()
+    assert index.crossed_ids({5: 100.0}) == {1}         # sl + 2 * step
+
+def test_other_tokens_and_inactive_trades_ignored():
+    index = build(trade(1, token=6), trade(2, status="PENDING"), trade(3, token=None))
+    assert index.crossed_ids({5: 1.0, 7: 1.0}) == set()
+
+def test_crossed_levels_popped_until_reindexed():
+    t = trade(1)
+    index = build(t)
+    assert index.crossed_ids({5: 85.0}) == {1}
+    assert index.crossed_ids({5: 85.0}) == set()
+    index.on_upsert(t)
+    assert index.crossed_ids({5: 85.0}) == {1}
+
+def test_stale_versions_dropped_after_level_change():
+    t = trade(1)
+    index = build(t)
+    index.crossed_ids({})                               # Build
+    t["sl"] = 80.0
+    index.on_upsert(t)
+    # The old SL entry (90) is stale: a tick at 85 crosses nothing
+    assert index.crossed_ids({5: 85.0}) == set()
+    assert index.crossed_ids({5: 80.0}) == {1}
+
+def test_token_change_moves_trade():
+    t = trade(1)
+    index = build(t)
+    index.crossed_ids({})
+    t["instrument_token"] = 6
+    index.on_upsert(t)
+    assert index.crossed_ids({5: 1.0}) == set()
+    assert index.crossed_ids({6: 1.0}) == {1}
+
+def test_remove_and_clear():
+    t1, t2 = trade(1), trade(2)
+    index = build(t1, t2)
+    index.crossed_ids({})
+    index.on_remove(1)
+    assert index.crossed_ids({5: 1.0}) == {2}
+    index.on_clear()
+    assert index.crossed_ids({5: 1.0}) == set()
+
+def test_compaction_keeps_live_entries():
+    t = trade(1)
+    index = build(t)
+    index.crossed_ids({})
+    for i in range(300):
+        t["sl"] = 50.0 + (i % 10)
+        index.on_upsert(t)
+        index.crossed_ids({})
+    assert len(index._heaps[5]["sl"]) < 4 + 64 + 1
+    assert index.crossed_ids({5: t["sl"]}) == {1}
@@ -0,0 +1,59 @@
+from managers import live_feed
+from managers.live_feed import _Channel, _merge, POSITION_FIELDS
+
+def trade(**extra):
+    t = {"id": 1, "symbol": "X", "current_ltp": 100.0, "sl": 90.0, "quantity": 50, "status": "OPEN",
+         "targets_hit_indices": [], "entry_price": 100.0, "targets": [110.0, 120.0, 130.0],
+         "target_controls": [], "trailing_sl": 0, "sl_to_entry": 0, "exit_multiplier": 1, "mode": "PAPER", "logs": []}
+    t.update(extra)
+    return t
+
+def channel(monkeypatch):
+    monkeypatch.setattr(live_feed, "decorate", lambda t: dict(t))
+    return _Channel("positions", POSITION_FIELDS, full_upserts=True)
+
+def test_new_trade_is_upserted_then_patched(monkeypatch):
+    ch, t = channel(monkeypatch), trade()
+    ch.on_upsert(t)
+    first = ch.diff()
+    assert first["upserts"][0]["id"] == 1 and first["patches"] == {}
+    t["current_ltp"] = 101.0
+    ch.on_upsert(t)
+    assert ch.diff()["patches"] == {1: {"current_ltp": 101.0}}
+    assert ch.diff() is None
+
+def test_manual_edits_reach_existing_trades(monkeypatch):
+    ch, t = channel(monkeypatch), trade()
+    ch.on_upsert(t)
+    ch.diff()
+    # ADD averaging + protection edit
+    t.update(entry_price=100.5, quantity=100, targets=[115.0, 125.0, 135.0], trailing_sl=5.0, sl_to_entry=1)
+    ch.on_upsert(t)
+    assert ch.diff()["patches"][1] == {"entry_price": 100.5, "quantity": 100, "targets": [115.0, 125.0, 135.0],
+                                      "trailing_sl": 5.0, "sl_to_entry": 1}
+    t.update(mode="LIVE", status="PROMOTED_LIVE")
+    ch.on_upsert(t)
+    assert ch.diff()["patches"][1] == {"mode": "LIVE", "status": "PROMOTED_LIVE"}
+
+def test_in_place_list_change_detected(monkeypatch):
+    ch, t = channel(monkeypatch), trade()
+    ch.on_upsert(t)
+    ch.diff()
+    t["targets_hit_indices"].append(0)
+    ch.on_upsert(t)
+    assert ch.diff()["patches"][1] == {"targets_hit_indices": [0]}
+
+def test_removed_and_sequence(monkeypatch):
+    ch, t = channel(monkeypatch), trade()
+    ch.on_upsert(t)
+    ch.diff()
+    ch.on_remove(1)
+    patch = ch.diff()
+    assert patch["removed"] == [1] and (patch["from"], patch["seq"]) == (1, 2)
+
+def test_merge_folds_patch_into_pending_upsert():
+    pending = _merge(None, {"patches": {}, "upserts": [{"id": 1, "sl": 90.0}], "removed": []})
+    pending = _merge(pending, {"patches": {1: {"sl": 95.0}}, "upserts": [], "removed": []})
+    assert pending["upserts"][1]["sl"] == 95.0 and pending["patches"] == {}
+    pending = _merge(pending, {"patches": {}, "upserts": [], "removed": [1]})
+    assert pending["upserts"] == {} and pending["removed"] == {1}
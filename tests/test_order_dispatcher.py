@@ -0,0 +1,102 @@
+import threading
+from datetime import datetime
+from managers import order_dispatcher
+from managers.order_dispatcher import OrderDispatcher
+from managers.trade_store import ActiveTradeStore, ClosedTodayTracker, IST
+
+class FakeKite:
+    VARIETY_REGULAR, PRODUCT_MIS = "regular", "MIS"
+    ORDER_TYPE_MARKET, ORDER_TYPE_SL_M = "MARKET", "SL-M"
+    TRANSACTION_TYPE_BUY, TRANSACTION_TYPE_SELL = "BUY", "SELL"
+
+    def __init__(self):
+        self.calls = []
+        self._next = 100
+
+    def place_order(self, **kw):
+        self._next += 1
+        self.calls.append(("place", kw["transaction_type"], kw["order_type"], kw["quantity"]))
+        return str(self._next)
+
+    def modify_order(self, **kw):
+        self.calls.append(("modify", kw["order_id"], kw.get("quantity"), kw.get("trigger_price")))
+
+    def cancel_order(self, **kw):
+        self.calls.append(("cancel", kw["order_id"]))
+
+class FakeWriter:
+    def __init__(self):
+        self.active, self.history, self.flushes = [], [], []
+
+    def mark_active(self, trade): self.active.append(trade['id'])
+    def mark_removed(self, trade_id): pass
+    def mark_history(self, trade): self.history.append(trade['id'])
+    def discard_history(self, trade_id): pass
+    def request_flush(self, critical=False): self.flushes.append(critical)
+
+def trade(id_):
+    return {"id": id_, "symbol": "NIFTY", "exchange": "NFO", "instrument_token": 1, "logs": []}
+
+def setup(monkeypatch):
+    """Fresh in-memory stores (no database) wired into the dispatcher module."""
+    lock, writer = threading.RLock(), FakeWriter()
+    store, closed = ActiveTradeStore(lock, writer), ClosedTodayTracker(lock, writer)
+    store._loaded = True
+    closed._day = datetime.now(IST).strftime("%Y-%m-%d")
+    monkeypatch.setattr(order_dispatcher, "store", store)
+    monkeypatch.setattr(order_dispatcher, "closed_today", closed)
+    return store, closed, writer
+
+def test_intents_of_one_trade_share_a_worker_in_order(monkeypatch):
+    setup(monkeypatch)
+    d = OrderDispatcher(4)
+    d._threads = [object()]                             # Pretend workers run: intents are queued
+    kite = FakeKite()
+    for tid in (10, 11, 14):
+        d.submit(kite, trade(tid), "ENTRY", qty=50, sl=90.0)
+        d.submit(kite, trade(tid), "FULL_EXIT", qty=50)
+    assert d.pending() == 6
+    queued = {i: [(x['trade_id'], x['action']) for x in q.queue] for i, q in enumerate(d._queues)}
+    assert queued[2] == [(10, "ENTRY"), (10, "FULL_EXIT"), (14, "ENTRY"), (14, "FULL_EXIT")]
+    assert queued[3] == [(11, "ENTRY"), (11, "FULL_EXIT")]
+    assert queued[0] == queued[1] == []
+
+def test_sl_order_id_written_back_by_entry_is_used_later(monkeypatch):
+    store, _, writer = setup(monkeypatch)
+    t = trade(1)
+    store.add(t)
+    kite = FakeKite()
+    d = OrderDispatcher(2)                              # No threads started: synchronous
+    d.submit(kite, t, "ENTRY", qty=50, sl=90.0)
+    assert t["sl_order_id"] == "102" and writer.flushes[-1] is True
+    d.submit(kite, t, "MODIFY_SL", trigger_price=95.0)
+    d.submit(kite, t, "PARTIAL_EXIT", qty=25, remaining=25)
+    d.submit(kite, t, "FULL_EXIT", qty=25)
+    assert kite.calls[2:] == [
+        ("modify", "102", None, 95.0),
+        ("modify", "102", 25, None), ("place", "SELL", "MARKET", 25),
+        ("cancel", "102"), ("place", "SELL", "MARKET", 25),
+    ]
+    assert t["sl_order_id"] is None
+
+def test_modify_without_sl_order_is_skipped(monkeypatch):
+    store, _, _ = setup(monkeypatch)
+    store.add(trade(1))
+    kite = FakeKite()
+    OrderDispatcher(1).submit(kite, trade(1), "MODIFY_SL", trigger_price=95.0)
+    assert kite.calls == []
+
+def test_write_back_finds_trade_already_closed(monkeypatch):
+    store, closed, writer = setup(monkeypatch)
+    t = dict(trade(3), sl_order_id="55", exit_time=closed._day + " 10:00:00")
+    closed.add(t)                                       # Moved to history before the worker ran
+    kite = FakeKite()
+    OrderDispatcher(1).submit(kite, t, "FULL_EXIT", qty=50)
+    assert kite.calls[0] == ("cancel", "55")
+    assert t["sl_order_id"] is None and "Broker SL Cancelled" in t["logs"][0]
+    assert writer.history == [3] and writer.active == []
+
+def test_write_back_for_unknown_trade_is_dropped(monkeypatch):
+    _, _, writer = setup(monkeypatch)
+    OrderDispatcher(1).submit(FakeKite(), trade(9), "ENTRY", qty=50, sl=90.0)
+    assert writer.active == writer.history == [] and writer.flushes == []
@@ -0,0 +1,109 @@
+import threading
+from datetime import datetime
+import pytest
+from managers import pnl_ledger
+from managers.pnl_ledger import PnlLedger
+
+class FakeStore:
+    def __init__(self, trades=()):
+        self.lock = threading.RLock()
+        self.trades = list(trades)
+
+    def all(self):
+        return list(self.trades)
+
+class Clock:
+    """Stands in for pnl_ledger.datetime; `today` is switched by the tests."""
+    today = datetime(2026, 10, 16, 10, 0)
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.today
+
+@pytest.fixture
+def env(monkeypatch):
+    seeded = {"2026-10-16": {"PAPER": 100.0}, "2026-10-17": {}}
+    calls = []
+    def history_pnl_by_mode(day):
+        calls.append(day)
+        return dict(seeded.get(day, {}))
+    store = FakeStore()
+    monkeypatch.setattr(pnl_ledger.persistence, "history_pnl_by_mode", history_pnl_by_mode)
+    monkeypatch.setattr(pnl_ledger, "store", store)
+    monkeypatch.setattr(pnl_ledger, "datetime", Clock)
+    Clock.today = datetime(2026, 10, 16, 10, 0)
+    return store, calls
+
+def trade(id_, mode="PAPER", entry=100.0, ltp=110.0, qty=10, status="OPEN", **extra):
+    return {"id": id_, "mode": mode, "entry_price": entry, "current_ltp": ltp, "quantity": qty, "status": status, **extra}
+
+def test_realized_seeded_once_and_booked(env):
+    store, calls = env
+    ledger = PnlLedger()
+    assert ledger.day_pnl("PAPER") == 100.0
+    ledger.book("PAPER", 25.0)
+    ledger.book("LIVE", -5.0)
+    assert ledger.day_pnl("PAPER") == 125.0
+    assert ledger.day_pnl("LIVE") == -5.0
+    assert calls == ["2026-10-16"]
+
+def test_unrealized_tracks_marks_and_ignores_pending(env):
+    store, _ = env
+    store.trades = [trade(1), trade(2, status="PENDING")]
+    ledger = PnlLedger()
+    assert ledger.day_pnl("PAPER") == 100.0 + 100.0
+    t = store.trades[0]
+    t["current_ltp"] = 105.0
+    ledger.mark(t)
+    assert ledger.day_pnl("PAPER") == 150.0
+
+def test_partial_exit_booked_on_open_trade_counts_at_seed(env):
+    store, _ = env
+    store.trades = [trade(1, ltp=100.0, booked_pnl=40.0)]
+    ledger = PnlLedger()
+    assert ledger.day_pnl("PAPER") == 140.0
+
+def test_mode_change_moves_contribution(env):
+    store, _ = env
+    t = trade(1)
+    store.trades = [t]
+    ledger = PnlLedger()
+    ledger.day_pnl("PAPER")
+    t["mode"] = "LIVE"
+    ledger.on_upsert(t)
+    assert ledger.day_pnl("PAPER") == 100.0
+    assert ledger.day_pnl("LIVE") == 100.0
+
+def test_remove_and_clear(env):
+    store, _ = env
+    store.trades = [trade(1), trade(2, mode="LIVE")]
+    ledger = PnlLedger()
+    ledger.day_pnl("PAPER")
+    ledger.on_remove(1)
+    assert ledger.day_pnl("PAPER") == 100.0
+    ledger.on_clear()
+    assert ledger.day_pnl("LIVE") == 0.0
+
+def test_day_roll_reseeds_realized(env):
+    store, calls = env
+    ledger = PnlLedger()
+    ledger.book("PAPER", 50.0)
+    assert ledger.day_pnl("PAPER") == 150.0
+    Clock.today = datetime(2026, 10, 17, 9, 15)
+    assert ledger.day_pnl("PAPER") == 0.0
+    assert calls == ["2026-10-16", "2026-10-17"]
+
+def test_unbook_only_for_tracked_day(env):
+    ledger = PnlLedger()
+    ledger.day_pnl("PAPER")
+    ledger.unbook("PAPER", 30.0, "2026-10-15")
+    assert ledger.day_pnl("PAPER") == 100.0
+    ledger.unbook("PAPER", 30.0, "2026-10-16")
+    assert ledger.day_pnl("PAPER") == 70.0
+
+def test_seed_failure_retried(env, monkeypatch):
+    ledger = PnlLedger()
+    monkeypatch.setattr(pnl_ledger.persistence, "history_pnl_by_mode", lambda day: None)
+    assert ledger.day_pnl("PAPER") == 0.0
+    monkeypatch.setattr(pnl_ledger.persistence, "history_pnl_by_mode", lambda day: {"PAPER": 7.0})
+    assert ledger.day_pnl("PAPER") == 7.0
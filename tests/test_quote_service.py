@@ -0,0 +1,95 @@
+import threading
+import time
+import pytest
+import config
+from managers.quote_service import QuoteService, MAX_INSTRUMENTS
+
+class FakeKite:
+    def __init__(self, delay=0.05, error=None):
+        self.calls = []
+        self.delay = delay
+        self.error = error
+
+    def quote(self, keys):
+        self.calls.append(list(keys))
+        time.sleep(self.delay)
+        if self.error: raise self.error
+        return {k: {"last_price": 100.0} for k in keys if not k.endswith("MISSING")}
+
+def run_concurrently(fn, n):
+    results, errors = [None] * n, [None] * n
+    def worker(i):
+        try: results[i] = fn(i)
+        except Exception as e: errors[i] = e
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    for t in threads: t.start()
+    for t in threads: t.join(5)
+    return results, errors
+
+def test_concurrent_same_instrument_single_call():
+    kite, service = FakeKite(), QuoteService()
+    results, errors = run_concurrently(lambda i: service.quote(kite, "NSE:INFY"), 20)
+    assert errors == [None] * 20
+    assert all(r == {"NSE:INFY": {"last_price": 100.0}} for r in results)
+    assert len(kite.calls) == 1
+
+def test_concurrent_different_instruments_batched():
+    kite, service = FakeKite(), QuoteService()
+    results, _ = run_concurrently(lambda i: service.quote(kite, [f"NSE:S{i}"]), 10)
+    assert sum(len(c) for c in kite.calls) == 10
+    assert len(kite.calls) < 10
+    assert results[3] == {"NSE:S3": {"last_price": 100.0}}
+
+def test_missing_instrument_left_out():
+    kite, service = FakeKite(delay=0), QuoteService()
+    assert service.quote(kite, ["NSE:A", "NSE:MISSING"]) == {"NSE:A": {"last_price": 100.0}}
+
+def test_error_propagates_to_every_waiter_and_slot_released():
+    kite, service = FakeKite(error=RuntimeError("rate limited")), QuoteService()
+    _, errors = run_concurrently(lambda i: service.quote(kite, "NSE:INFY"), 5)
+    assert all(isinstance(e, RuntimeError) for e in errors)
+    assert len(kite.calls) == 1
+    # Nothing left in flight: the next call fetches again
+    kite.error = None
+    assert service.quote(kite, "NSE:INFY") == {"NSE:INFY": {"last_price": 100.0}}
+    assert len(kite.calls) == 2
+
+def test_large_request_chunked():
+    kite, service = FakeKite(delay=0), QuoteService()
+    keys = [f"NFO:S{i}" for i in range(MAX_INSTRUMENTS + 10)]
+    assert len(service.quote(kite, keys)) == len(keys)
+    assert [len(c) for c in kite.calls] == [MAX_INSTRUMENTS, 10]
+
+def test_waiter_times_out(monkeypatch):
+    monkeypatch.setattr(config, "QUOTE_TIMEOUT", 0.05)
+    kite, service = FakeKite(delay=0.5), QuoteService()
+    leader = threading.Thread(target=service.quote, args=(kite, "NSE:INFY"))
+    leader.start()
+    time.sleep(0.03)
+    with pytest.raises(TimeoutError):
+        service.quote(kite, "NSE:INFY")
+    leader.join()
+
+def test_leader_returns_while_others_keep_enqueueing():
+    kite, service = FakeKite(delay=0.02), QuoteService()
+    stop, done = threading.Event(), threading.Event()
+    result = {}
+    def lead():
+        result.update(service.quote(kite, "NSE:LEAD"))
+        done.set()
+    def traffic():
+        i = 0
+        while not stop.is_set():
+            threading.Thread(target=service.quote, args=(kite, f"NSE:T{i}"), daemon=True).start()
+            i += 1
+            time.sleep(0.002)
+    threading.Thread(target=lead, daemon=True).start()   # First caller: the leader
+    feeder = threading.Thread(target=traffic, daemon=True)
+    feeder.start()
+    try:
+        # Returns after its own batch, although requests keep arriving
+        assert done.wait(0.5)
+    finally:
+        stop.set()
+        feeder.join()
+    assert result == {"NSE:LEAD": {"last_price": 100.0}}
@@ -0,0 +1,117 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from managers.scheduler import Scheduler, IST
+
+def hhmm(delta_minutes=0):
+    return (datetime.now(IST) + timedelta(minutes=delta_minutes)).strftime("%H:%M")
+
+def wait_until(predicate, timeout=2.0):
+    end = time.time() + timeout
+    while time.time() < end:
+        if predicate(): return True
+        time.sleep(0.01)
+    return False
+
+def test_interval_job_repeats(app):
+    s = Scheduler()
+    runs = []
+    s.every("tick", 0.02, lambda: runs.append(1))
+    s.start(app)
+    assert wait_until(lambda: len(runs) >= 3)
+
+def test_trigger_runs_now_and_keeps_cadence(app):
+    s = Scheduler()
+    runs = []
+    s.every("sync", 3600, lambda: runs.append(1), delay=3600)
+    s.start(app)
+    time.sleep(0.05)
+    assert runs == []
+    s.trigger("sync")
+    assert wait_until(lambda: len(runs) == 1)
+    assert s.stats()["sync"]["next"] > 3000
+
+def test_job_error_recorded_and_job_continues(app):
+    s = Scheduler()
+    runs = []
+    def boom():
+        runs.append(1)
+        raise RuntimeError("boom")
+    s.every("bad", 0.02, boom)
+    s.start(app)
+    assert wait_until(lambda: len(runs) >= 2)
+    assert s.stats()["bad"]["error"] == "boom"
+
+def test_daily_fires_within_grace_on_startup(app):
+    s = Scheduler()
+    runs = []
+    s.daily("eod", lambda: hhmm(), lambda: runs.append(1))
+    s.start(app)
+    assert wait_until(lambda: runs == [1])
+    # Next occurrence is tomorrow
+    assert s.stats()["eod"]["next"] > 23 * 3600
+
+def test_daily_skipped_after_grace():
+    s = Scheduler()
+    s.daily("eod", lambda: hhmm(-10), lambda: None, grace=60)
+    assert s.stats()["eod"]["next"] > 23 * 3600
+
+def test_daily_retried_while_not_done(app):
+    s = Scheduler()
+    results = iter([False, False, True])
+    runs = []
+    def job():
+        runs.append(1)
+        return next(results)
+    s.daily("eod", lambda: hhmm(), job, grace=120, retry=0.02)
+    s.start(app)
+    assert wait_until(lambda: len(runs) == 3)
+    time.sleep(0.1)
+    assert len(runs) == 3
+    assert s.stats()["eod"]["next"] > 23 * 3600
+
+def test_reschedule_rereads_time(app):
+    s = Scheduler()
+    at = {"time": hhmm(120)}
+    runs = []
+    s.daily("eod", lambda: at["time"], lambda: runs.append(1))
+    s.start(app)
+    time.sleep(0.05)
+    assert runs == []
+    at["time"] = hhmm(1)
+    s.reschedule("eod")
+    assert 0 < s.stats()["eod"]["next"] <= 60
+    # A time just passed still fires (within grace), once
+    at["time"] = hhmm()
+    s.reschedule("eod")
+    assert wait_until(lambda: runs == [1])
+    assert s.stats()["eod"]["next"] > 23 * 3600
+
+def test_background_job_does_not_block_timer(app):
+    s = Scheduler()
+    release = threading.Event()
+    fast = []
+    s.every("slow", 3600, lambda: release.wait(2), background=True)
+    s.every("fast", 0.02, lambda: fast.append(1))
+    s.start(app)
+    assert wait_until(lambda: len(fast) >= 3, timeout=1.0)
+    release.set()
+
+def test_background_trigger_while_running_reruns_once(app):
+    s = Scheduler()
+    release = threading.Event()
+    runs = []
+    def slow():
+        runs.append(1)
+        release.wait(2)
+    s.every("slow", 3600, slow, background=True)
+    s.start(app)
+    assert wait_until(lambda: len(runs) == 1)
+    s.trigger("slow")
+    s.trigger("slow")
+    time.sleep(0.05)
+    assert len(runs) == 1 # Not run concurrently
+    release.set()
+    assert wait_until(lambda: len(runs) == 2)
+    time.sleep(0.05)
+    assert len(runs) == 2
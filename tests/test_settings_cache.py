@@ -0,0 +1,46 @@
+import pytest
+import settings
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    loads = []
+    def load():
+        loads.append(1)
+        data = settings.get_defaults()
+        data["watchlist"] = ["NIFTY"]
+        return data
+    monkeypatch.setattr(settings, "_load_from_db", load)
+    settings.invalidate()
+    yield loads
+    settings.invalidate()
+
+def test_reads_served_from_cache(fresh_cache):
+    assert settings.get_settings()["watchlist"] == ("NIFTY",)
+    settings.get_settings()
+    settings.load_settings()
+    assert len(fresh_cache) == 1
+
+def test_snapshot_is_immutable_and_copy_is_not():
+    with pytest.raises(TypeError):
+        settings.get_settings()["watchlist"] = []
+    copy = settings.load_settings()
+    copy["watchlist"].append("BANKNIFTY")
+    assert settings.get_settings()["watchlist"] == ("NIFTY",)
+
+def test_invalidate_reloads_and_bumps_version(fresh_cache):
+    settings.get_settings()
+    version = settings.settings_version()
+    settings.invalidate()
+    assert settings.settings_version() == version + 1
+    assert settings.get_settings()["watchlist"] == ("NIFTY",)
+    assert len(fresh_cache) == 2
+
+def test_snapshot_survives_invalidate_between_reads():
+    snapshot = settings.get_settings()
+    settings.invalidate()
+    assert snapshot["modes"]["LIVE"]["max_loss"] == 0
+
+def test_db_failure_serves_defaults_without_caching(monkeypatch):
+    monkeypatch.setattr(settings, "_load_from_db", lambda: None)
+    assert settings.get_settings()["watchlist"] == ()
+    assert settings.load_settings()["watchlist"] == []
@@ -0,0 +1,72 @@
+import threading
+from unittest.mock import MagicMock
+from managers import subscriptions
+from managers.subscriptions import SubscriptionManager, _SourceListener
+from managers.trade_store import ActiveTradeStore
+
+class NullWriter:
+    def mark_active(self, trade): pass
+    def mark_removed(self, trade_id): pass
+    def request_flush(self, critical=False): pass
+
+def trade(id_, token):
+    return {"id": id_, "instrument_token": token}
+
+def setup(monkeypatch):
+    """Fresh manager fed by an in-memory store (no database), plus a mock ticker."""
+    monkeypatch.setattr(subscriptions, "closed_today", MagicMock())
+    mgr = SubscriptionManager()
+    mgr._seeded = True
+    store = ActiveTradeStore(threading.RLock(), NullWriter())
+    store._loaded = True
+    store.listeners.append(_SourceListener(mgr, "active"))
+    ws = MagicMock(MODE_FULL="full")
+    return mgr, store, ws
+
+def calls(ws):
+    out = [(c[0], c.args[-1]) for c in ws.method_calls]
+    ws.reset_mock()
+    return out
+
+def test_adds_and_removes_are_published_as_minimal_diffs(monkeypatch):
+    mgr, store, ws = setup(monkeypatch)
+    store.add(trade(1, 101))
+    store.add(trade(2, 102))
+    store.add(trade(3, 101))                            # Shares a token with trade 1
+    mgr.sync(ws)
+    assert calls(ws) == [("subscribe", [101, 102]), ("set_mode", [101, 102])]
+
+    mgr.sync(ws)
+    assert calls(ws) == []                              # Nothing changed: no gateway calls
+
+    store.remove(1)                                     # Token still wanted by trade 3
+    mgr.sync(ws)
+    assert calls(ws) == []
+
+    store.remove(3)
+    store.add(trade(4, 104))
+    mgr.sync(ws)
+    assert calls(ws) == [("subscribe", [104]), ("set_mode", [104]), ("unsubscribe", [101])]
+
+def test_token_change_moves_subscription(monkeypatch):
+    mgr, store, ws = setup(monkeypatch)
+    t = trade(1, 101)
+    store.add(t)
+    mgr.sync(ws)
+    ws.reset_mock()
+    t["instrument_token"] = 201                         # e.g. promotion to another contract
+    store.reindex(t)
+    mgr.sync(ws)
+    assert calls(ws) == [("subscribe", [201]), ("set_mode", [201]), ("unsubscribe", [101])]
+
+def test_full_sync_resends_everything_and_clear_unsubscribes(monkeypatch):
+    mgr, store, ws = setup(monkeypatch)
+    store.add(trade(1, 101))
+    store.add(trade(2, 102))
+    mgr.sync(ws)
+    ws.reset_mock()
+    mgr.sync(ws, full=True)                             # Reconnect
+    assert calls(ws) == [("subscribe", [101, 102]), ("set_mode", [101, 102])]
+    store.clear()
+    mgr.sync(ws)
+    assert calls(ws) == [("unsubscribe", [101, 102])]
@@ -0,0 +1,94 @@
+import pytest
+import config
+from database import TelegramOutbox, TelegramMessage
+from managers import telegram_manager
+from managers.telegram_manager import TelegramManager
+
+class Clock:
+    """Stands in for the time module: sleeps advance the clock instead of blocking."""
+    def __init__(self): self.now = 1000.0
+    def time(self): return self.now
+    def sleep(self, s): self.now += s
+
+class Resp:
+    def __init__(self, status_code, body):
+        self.status_code, self._body, self.text = status_code, body, str(body)
+    def json(self): return self._body
+
+def ok(msg_id): return Resp(200, {"ok": True, "result": {"message_id": msg_id}})
+
+@pytest.fixture
+def tg(app_ctx, monkeypatch):
+    """Sender with no background thread (flushes on enqueue), a scripted HTTP layer and a fake clock."""
+    bot, clock, sent, replies = TelegramManager(), Clock(), [], []
+    def post(url, json=None, timeout=None):
+        sent.append((clock.now, json["chat_id"], json["text"]))
+        r = replies.pop(0) if replies else ok(len(sent))
+        if isinstance(r, Exception): raise r
+        return r
+    monkeypatch.setattr(bot, "_get_config", lambda: {"bot_token": "T", "enable_notifications": True, "channel_id": "c1"})
+    monkeypatch.setattr(telegram_manager.requests, "post", post)
+    monkeypatch.setattr(telegram_manager, "time", clock)
+    monkeypatch.setattr(config, "TELEGRAM_GLOBAL_RATE", 0)
+    monkeypatch.setattr(config, "TELEGRAM_CHAT_INTERVAL", 1.0)
+    monkeypatch.setattr(config, "TELEGRAM_MAX_ATTEMPTS", 3)
+    return bot, clock, sent, replies
+
+def rows(): return TelegramOutbox.query.order_by(TelegramOutbox.id).all()
+
+def test_delivered_message_leaves_outbox_and_records_id(tg):
+    bot, _, sent, _ = tg
+    bot._enqueue("c1", "hi", trade_id=5, channel_key="main")
+    assert [s[1:] for s in sent] == [("c1", "hi")] and rows() == []
+    assert [(m.trade_id, m.message_id) for m in TelegramMessage.query.all()] == [("5", 1)]
+
+def test_429_waits_for_retry_after(tg):
+    bot, clock, sent, replies = tg
+    replies.append(Resp(429, {"ok": False, "parameters": {"retry_after": 7}}))
+    bot._enqueue("c1", "hi")
+    row = rows()[0]
+    assert (row.status, row.attempts, row.next_attempt) == ("PENDING", 1, 1007.0)
+    clock.now += 3
+    bot.flush()
+    assert len(sent) == 1                               # Not due yet
+    clock.now += 4
+    bot.flush()
+    assert len(sent) == 2 and rows() == []
+
+def test_errors_back_off_exponentially(tg):
+    bot, clock, sent, replies = tg
+    replies.extend([Resp(500, {}), ConnectionError("down")])
+    bot._enqueue("c1", "hi")
+    assert rows()[0].next_attempt == clock.now + 2
+    clock.now += 2
+    bot.flush()
+    assert rows()[0].next_attempt == clock.now + 4 and rows()[0].attempts == 2
+    clock.now += 4
+    bot.flush()
+    assert len(sent) == 3 and rows() == []
+
+def test_per_chat_interval_and_order(tg):
+    bot, clock, sent, _ = tg
+    bot._enqueue("c1", "a")
+    bot._enqueue("c1", "b")
+    bot._enqueue("c2", "x")                             # Other chats are not held back
+    assert [s[1:] for s in sent] == [("c1", "a"), ("c2", "x")]
+    assert bot.flush() == pytest.approx(1.0)
+    clock.now += 1.0
+    bot.flush()
+    assert sent[-1] == (clock.now, "c1", "b") and rows() == []
+
+def test_rows_marked_failed(tg):
+    bot, clock, sent, replies = tg
+    replies.append(Resp(403, {"ok": False}))            # Bot removed: no retry
+    bot._enqueue("c1", "a")
+    replies.extend([Resp(500, {})] * 3)
+    bot._enqueue("c2", "b", trade_id=9, channel_key="main", thread_start=True)
+    for _ in range(2):
+        clock.now += 10
+        bot.flush()
+    assert [(r.chat_id, r.status) for r in rows()] == [("c1", "FAILED"), ("c2", "FAILED")]
+    assert rows()[1].attempts == 3 and bot._pending_threads == set()
+    clock.now += 600
+    bot.flush()
+    assert len(sent) == 4                               # Failed rows are never retried
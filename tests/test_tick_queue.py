@@ -0,0 +1,69 @@
+import threading
+import time
+import pytest
+from managers.tick_queue import TickQueue
+
+def tick(token, price):
+    return {'instrument_token': token, 'last_price': price}
+
+def test_unknown_policy_rejected():
+    with pytest.raises(ValueError):
+        TickQueue(10, "bogus")
+
+def test_fifo_and_timeout():
+    q = TickQueue(10)
+    q.put([tick(1, 10)])
+    q.put([tick(1, 11)])
+    assert q.get(timeout=0) == ([tick(1, 10)], False)
+    assert q.get(timeout=0) == ([tick(1, 11)], False)
+    assert q.get(timeout=0.01) == (None, False)
+
+def test_drop_oldest_discards_oldest_batch():
+    q = TickQueue(2, "drop_oldest", high_water=2.0) # Never degraded
+    for p in (1, 2, 3):
+        q.put([tick(1, p)])
+    assert q.counters["dropped"] == 1
+    assert [q.get(timeout=0)[0][0]['last_price'] for _ in range(2)] == [2, 3]
+
+def test_conflate_merges_into_newest_batch():
+    q = TickQueue(2, "conflate", high_water=2.0) # Never degraded
+    q.put([tick(1, 1)])
+    q.put([tick(2, 2)])
+    q.put([tick(2, 3), tick(3, 4)])
+    assert q.depth() == 2
+    assert q.counters["conflated"] == 1
+    q.get(timeout=0)
+    ticks, _ = q.get(timeout=0)
+    assert {t['instrument_token']: t['last_price'] for t in ticks} == {2: 3, 3: 4}
+
+def test_block_waits_for_room():
+    q = TickQueue(1, "block", high_water=2.0) # Never degraded
+    q.put([tick(1, 1)])
+    done = threading.Event()
+    threading.Thread(target=lambda: (q.put([tick(1, 2)]), done.set()), daemon=True).start()
+    assert not done.wait(0.05)
+    q.get(timeout=0)
+    assert done.wait(1)
+
+def test_degraded_flag_survives_until_batch_processed():
+    q = TickQueue(10, "conflate", high_water=0.5, low_water=0.2)
+    for p in range(5):
+        q.put([tick(1, p), tick(p + 10, p)])
+    assert q.degraded
+    ticks, degraded = q.get(timeout=0)
+    # Whole backlog merged into one batch, processed in degraded mode
+    assert degraded and q.depth() == 0
+    assert {t['instrument_token']: t['last_price'] for t in ticks}[1] == 4
+    assert q.degraded
+    q.task_done()
+    assert not q.degraded
+
+def test_degraded_persists_while_backlog_above_low_water():
+    q = TickQueue(10, "conflate", high_water=0.5, low_water=0.2)
+    for p in range(5):
+        q.put([tick(1, p)])
+    q.get(timeout=0)
+    for p in range(4):
+        q.put([tick(1, p)])
+    q.task_done()
+    assert q.degraded
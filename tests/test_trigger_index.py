@@ -0,0 +1,55 @@
+from managers.trigger_index import TriggerIndex, PendingTriggerBook
+
+def test_above_triggers_at_or_over_level():
+    index = TriggerIndex()
+    index.add(1, 5, 'ABOVE', 100.0)
+    assert index.triggered(5, 99.95) == []
+    assert index.triggered(5, 100.0) == [1]
+    assert index.triggered(5, 150.0) == [1]
+
+def test_below_triggers_at_or_under_level():
+    index = TriggerIndex()
+    index.add(1, 5, 'BELOW', 100.0)
+    assert index.triggered(5, 100.05) == []
+    assert index.triggered(5, 100.0) == [1]
+    assert index.triggered(5, 50.0) == [1]
+
+def test_ladder_returns_only_crossed_levels():
+    index = TriggerIndex()
+    for i, level in enumerate([100, 101, 102, 103]):
+        index.add(i, 5, 'ABOVE', level)
+        index.add(10 + i, 5, 'BELOW', level)
+    assert sorted(index.triggered(5, 101.5)) == [0, 1, 12, 13]
+    assert index.triggered(6, 101.5) == []
+
+def test_equal_levels_and_discard():
+    index = TriggerIndex()
+    index.add(1, 5, 'ABOVE', 100.0)
+    index.add(2, 5, 'ABOVE', 100.0)
+    index.discard(1)
+    assert index.triggered(5, 100.0) == [2]
+    index.discard(2)
+    index.discard(2)                        # Unknown id: no-op
+    assert len(index) == 0 and index.triggered(5, 100.0) == []
+
+def test_readd_moves_level_and_invalid_entries_skipped():
+    index = TriggerIndex()
+    index.add(1, 5, 'ABOVE', 100.0)
+    index.add(1, 5, 'ABOVE', 110.0)
+    assert index.triggered(5, 105.0) == []
+    index.add(1, None, 'ABOVE', 100.0)
+    index.add(2, 5, 'SIDEWAYS', 100.0)
+    assert 1 not in index and 2 not in index
+
+def test_pending_book_follows_store_events():
+    trades = [{'id': 1, 'status': 'PENDING', 'instrument_token': 5, 'trigger_dir': 'ABOVE', 'entry_price': 100.0},
+              {'id': 2, 'status': 'OPEN', 'instrument_token': 5, 'trigger_dir': 'ABOVE', 'entry_price': 90.0}]
+    book = PendingTriggerBook(lambda: trades)
+    assert book.triggered_ids({5: 100.0}) == {1}
+    trades[0]['status'] = 'OPEN'
+    book.on_upsert(trades[0])
+    assert book.triggered_ids({5: 100.0}) == set()
+    book.on_upsert({'id': 3, 'status': 'PENDING', 'instrument_token': 5, 'trigger_dir': 'BELOW', 'entry_price': 95.0})
+    assert book.triggered_ids({5: 94.0}) == {3}
+    book.on_remove(3)
+    assert book.triggered_ids({5: 94.0}) == set()
@@ -0,0 +1,94 @@
+import random
+from managers.vector_risk import VectorRiskBook
+from managers.level_index import RiskLevelIndex
+from managers.trigger_index import PendingTriggerBook
+
+def trade(id_, token=5, status="OPEN", entry=100.0, sl=90.0, targets=(110.0, 120.0, 130.0), hit=(),
+          trailing=0, high=100.0, trigger_dir="ABOVE"):
+    return {"id": id_, "instrument_token": token, "status": status, "entry_price": entry, "sl": sl,
+            "targets": list(targets), "targets_hit_indices": list(hit), "trailing_sl": trailing,
+            "highest_ltp": high, "trigger_dir": trigger_dir}
+
+def book_of(*trades, capacity=1024):
+    return VectorRiskBook(lambda: list(trades), capacity=capacity)
+
+def test_activation_direction():
+    book = book_of(trade(1, status="PENDING", trigger_dir="ABOVE"),
+                   trade(2, status="PENDING", trigger_dir="BELOW"))
+    assert book.evaluate({5: 99.95}) == {2}
+    assert book.evaluate({5: 100.0}) == {1, 2}         # Both boundaries inclusive
+    assert book.evaluate({5: 100.05}) == {1}
+
+def test_pending_without_direction_never_activates():
+    book = book_of(trade(1, status="PENDING", trigger_dir=None))
+    assert book.evaluate({5: 1.0}) == set() and book.evaluate({5: 1000.0}) == set()
+
+def test_has_tick_mask():
+    book = book_of(trade(1, token=5), trade(2, token=6))
+    # Trade 2 would be an SL hit at any price, but its token has no tick in the batch
+    assert book.evaluate({5: 1.0, 7: 1.0}) == {1}
+    assert book.evaluate({}) == set()
+
+def test_sl_target_trailing_and_high():
+    book = book_of(trade(1, sl=90.0, targets=(300.0,), high=200.0), trade(2, sl=50.0, targets=(110.0,), high=200.0),
+                   trade(3, sl=50.0, hit=[0], high=200.0), trade(4, sl=50.0, trailing=5.0, targets=(300.0,), high=200.0),
+                   trade(5, token=6, high=101.0))
+    assert book.evaluate({5: 59.0}) == {1}              # SL inclusive
+    assert book.evaluate({5: 95.0}) == {4}              # Trailing: sl + 2 * step = 60
+    book.on_upsert(trade(4, sl=95.0, trailing=5.0, targets=(300.0,), high=200.0))
+    assert book.evaluate({5: 104.0}) == set()
+    assert book.evaluate({5: 110.0}) == {2, 4}          # Trade 3's T1 was hit: next is 120
+    assert book.evaluate({5: 120.0}) == {2, 3, 4}
+    assert book.evaluate({6: 101.0}) == set() and book.evaluate({6: 101.5}) == {5}
+
+def test_inactive_statuses_ignored():
+    book = book_of(trade(1, status="SL_HIT"), trade(2, status="MONITORING"))
+    assert book.evaluate({5: 1.0}) == set()
+
+def test_updates_and_removals():
+    t = trade(1)
+    book = book_of(t)
+    assert book.evaluate({5: 85.0}) == {1}
+    t["sl"] = 80.0
+    book.on_upsert(t)
+    assert book.evaluate({5: 85.0}) == set()
+    book.on_remove(1)
+    assert book.evaluate({5: 1.0}) == set()
+
+def test_slot_reuse_and_grow():
+    book = book_of(capacity=2)
+    book.evaluate({})                                   # Initial (empty) build
+    for i in range(1, 4): book.on_upsert(trade(i, token=i))
+    book.evaluate({})
+    assert len(book.ids) == 4 and book._size == 3
+    book.on_remove(2)
+    book.on_upsert(trade(9, token=9))
+    book.evaluate({})
+    assert book._size == 3                              # Freed slot reused
+    for i in range(10, 14): book.on_upsert(trade(i, token=i))
+    assert book.evaluate({t: 1.0 for t in (1, 3, 9, 10, 13, 2)}) == {1, 3, 9, 10, 13}
+    assert book._size == 7 and len(book.ids) == 8
+
+def test_clear_resets_book():
+    book = book_of(trade(1), trade(2))
+    book.evaluate({})
+    book.on_clear()
+    assert book.evaluate({5: 1.0}) == set()
+
+def test_matches_scalar_prescreen():
+    rng = random.Random(11)
+    trades = []
+    for i in range(400):
+        entry = rng.uniform(90, 110)
+        sl = entry - rng.uniform(1, 15)
+        targets = sorted(entry + rng.uniform(1, 30) for _ in range(3))
+        hit = [j for j in range(3) if rng.random() < 0.2]
+        trades.append(trade(i + 1, token=rng.choice([5, 6, 7]), status=rng.choice(["PENDING", "OPEN", "PROMOTED_LIVE", "SL_HIT"]),
+                            entry=round(entry, 2), sl=round(sl, 2), targets=[round(x, 2) for x in targets], hit=hit,
+                            trailing=rng.choice([0, 0, 2.5, 5.0]), high=round(entry + rng.uniform(0, 10), 2),
+                            trigger_dir=rng.choice(["ABOVE", "BELOW"])))
+    for _ in range(50):
+        ticks = {tok: round(rng.uniform(75, 145), 2) for tok in rng.sample([5, 6, 7, 8], 2)}
+        vector = book_of(*trades).evaluate(ticks)
+        scalar = PendingTriggerBook(lambda: trades).triggered_ids(ticks) | RiskLevelIndex(lambda: trades).crossed_ids(ticks)
+        assert vector == scalar
@@ -0,0 +1,50 @@
+from managers.versions import VersionLog
+
+def test_cursor_requires_matching_epoch():
+    log = VersionLog()
+    assert log.changes('positions', 0, 'other-epoch') is None
+    assert log.changes('positions', None, log.epoch) is None
+    assert log.changes('positions', 'junk', log.epoch) is None
+
+def test_incremental_changes_and_removals():
+    log = VersionLog()
+    log.bump('positions', 1)
+    cursor = log.version
+    log.bump('positions', 2)
+    log.bump('positions', 1)
+    log.drop('positions', 3)
+    changed, removed = log.changes('positions', cursor, log.epoch)
+    assert sorted(changed) == [1, 2] and removed == [3]
+    assert log.changes('positions', log.version, log.epoch) == ([], [])
+
+def test_kinds_are_independent():
+    log = VersionLog()
+    log.bump('closed', 7)
+    assert log.changes('positions', 0, log.epoch) == ([], [])
+    assert log.changes('closed', 0, log.epoch) == ([7], [])
+
+def test_readd_after_drop_clears_tombstone():
+    log = VersionLog()
+    log.drop('positions', 1)
+    log.bump('positions', 1)
+    assert log.changes('positions', 0, log.epoch) == ([1], [])
+
+def test_future_cursor_needs_full_reply():
+    log = VersionLog()
+    log.bump('positions', 1)
+    assert log.changes('positions', log.version + 5, log.epoch) is None
+
+def test_tombstone_trim_raises_floor():
+    log = VersionLog(max_tombstones=4)
+    for i in range(5): log.drop('closed', i)
+    assert log.changes('closed', 1, log.epoch) is None
+    changed, removed = log.changes('closed', log._floor['closed'], log.epoch)
+    assert sorted(removed) == [2, 3, 4]
+
+def test_invalidate_forces_full_reply():
+    log = VersionLog()
+    log.bump('closed', 1)
+    cursor = log.version
+    log.invalidate('closed')
+    assert log.changes('closed', cursor, log.epoch) is None
+    assert log.changes('closed', log.version, log.epoch) == ([], [])
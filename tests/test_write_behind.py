@@ -0,0 +1,89 @@
+import json
+import threading
+from managers import trade_store
+from managers.trade_store import WriteBehind
+
+class FakePersistence:
+    """Records the rows each flush writes; `fail` makes the next writes report failure."""
+    def __init__(self):
+        self.active, self.removed, self.history = [], [], []
+        self.fail = False
+
+    def write_active_trades(self, rows, removed):
+        self.active.append({k: json.loads(v) for k, v in rows.items()})
+        self.removed.append(set(removed))
+        return not self.fail
+
+    def write_history_rows(self, rows):
+        self.history.append({k: json.loads(data) for k, (data, _) in rows.items()})
+        return not self.fail
+
+    def history_columns(self, trade):
+        return {}
+
+def make_writer(monkeypatch):
+    fake = FakePersistence()
+    monkeypatch.setattr(trade_store, "persistence", fake)
+    return WriteBehind(threading.RLock(), interval=60), fake
+
+def test_flush_writes_latest_state_once(monkeypatch):
+    writer, fake = make_writer(monkeypatch)
+    t = {"id": 1, "sl": 90.0}
+    writer.mark_active(t)
+    t["sl"] = 95.0
+    writer.mark_active(t)
+    writer.flush()
+    assert fake.active == [{1: {"id": 1, "sl": 95.0}}]
+    writer.flush()                                      # Nothing pending: no write
+    assert len(fake.active) == 1
+
+def test_failed_flush_keeps_trade_dirty(monkeypatch):
+    writer, fake = make_writer(monkeypatch)
+    writer.mark_active({"id": 1})
+    writer.mark_history({"id": 2})
+    fake.fail = True
+    writer.flush()
+    fake.fail = False
+    writer.flush()
+    assert fake.active[-1] == {1: {"id": 1}} and fake.history[-1] == {2: {"id": 2}}
+
+def test_removed_trade_not_rewritten(monkeypatch):
+    writer, fake = make_writer(monkeypatch)
+    writer.mark_active({"id": 1})
+    writer.mark_removed(1)
+    writer.flush()
+    assert fake.active == [{}] and fake.removed == [{1}]
+
+def test_requeue_does_not_resurrect_removed_trade(monkeypatch):
+    writer, fake = make_writer(monkeypatch)
+    writer.mark_active({"id": 1})
+    fake.fail = True
+    # Trade removed while the failing flush was writing it
+    fake.write_history_rows = lambda rows: writer.mark_removed(1) or False
+    writer.flush()
+    fake.fail = False
+    writer.flush()
+    assert fake.active[-1] == {} and fake.removed[-1] == {1}
+
+def test_discard_history_drops_pending_write(monkeypatch):
+    writer, fake = make_writer(monkeypatch)
+    writer.mark_history({"id": 3})
+    writer.mark_history({"id": 4})
+    writer.discard_history(3)
+    writer.flush()
+    assert fake.history == [{4: {"id": 4}}]
+
+def test_request_flush_without_thread_writes_through(monkeypatch):
+    writer, fake = make_writer(monkeypatch)
+    writer.mark_active({"id": 1})
+    writer.request_flush()
+    assert fake.active == [{1: {"id": 1}}]
+
+def test_critical_flush_wakes_writer_interval_does_not(monkeypatch):
+    writer, fake = make_writer(monkeypatch)
+    writer._thread = object()                           # Background writer running
+    writer.mark_active({"id": 1})
+    writer.request_flush()
+    assert not writer._wake.is_set() and fake.active == []
+    writer.request_flush(critical=True)
+    assert writer._wake.is_set() and fake.active == []